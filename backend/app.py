@@ -30,8 +30,11 @@ def _patch_importlib_metadata_for_py39() -> None:
 _patch_importlib_metadata_for_py39()
 
 from services.model_loader import load_disease_models, load_nlp_models
+from services.advice_snapshot import load_advice_snapshot
 from routes.predict_routes import predict_bp
 from routes.chat_routes import chat_bp
+from routes.metrics_routes import metrics_bp
+from routes.admin_routes import admin_bp
 
 
 def create_app() -> Flask:
@@ -43,7 +46,8 @@ def create_app() -> Flask:
     # CORS: allow Next.js dev server (localhost:3000) + generic for now
     CORS(app, resources={r"/api/*": {"origins": "*"}})
 
-    # Load ML models at startup (avoid per-request loading overhead)
+    # Model handles load on first use by default; SDP_MODEL_LOADING=eager loads
+    # everything here and "warmup" loads it on a background thread.
     disease_models = load_disease_models()
     nlp_models = load_nlp_models()
 
@@ -52,9 +56,14 @@ def create_app() -> Flask:
     app.config["NLP_MODELS"] = nlp_models
     app.config["ADVICE_GENERATOR"] = nlp_models.get("advice_generator")
 
+    # Advice pre-generated by warm_advice.py, so a fresh worker skips Gemini for common keys.
+    load_advice_snapshot(models_dir=disease_models.models_dir, model_files=disease_models.model_files)
+
     # Register blueprints
     app.register_blueprint(predict_bp, url_prefix="/api")
     app.register_blueprint(chat_bp, url_prefix="/api")
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(admin_bp)
 
     @app.route("/health", methods=["GET"])
     def health_check():
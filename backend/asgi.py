@@ -0,0 +1,245 @@
+"""
+ASGI entry point: serve the API from an asyncio event loop.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5001 --workers 4
+
+/api/predict, /api/chat, /api/chat/status and /health keep the contracts
+of the Flask routes, but a request waiting on Gemini only holds a coroutine,
+not a thread, so hundreds of slow LLM calls can be in flight per worker.
+Feature encoding, scoring, SHAP and sentiment analysis run on a bounded
+thread pool (SDP_ASGI_CPU_WORKERS threads). Every other route (batch,
+sweep, assess, advice tokens, chat streaming, metrics, admin) is passed to
+the Flask app on that same pool.
+
+No ASGI framework is needed; any ASGI server (uvicorn, hypercorn) can run it.
+"""
+
+import asyncio
+import io
+import json
+import os
+import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app import app as flask_app
+from services.nlp_service import analyze_and_respond_async, get_llm_status
+from services.prediction_service import predict_disease_risk_async
+
+CPU_WORKERS = int(os.getenv("SDP_ASGI_CPU_WORKERS", "0")) or (os.cpu_count() or 1) * 2
+MAX_BODY_BYTES = int(os.getenv("SDP_ASGI_MAX_BODY_BYTES", str(16 * 1024 * 1024)))
+
+Handler = Callable[[Any], Awaitable[Tuple[int, Dict[str, Any]]]]
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+async def _read_body(receive) -> Optional[bytes]:
+    """The request body, or None if the client disconnected."""
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        body += message.get("body", b"")
+        if len(body) > MAX_BODY_BYTES:
+            raise _BodyTooLarge()
+        if not message.get("more_body", False):
+            return bytes(body)
+
+
+def _wsgi_environ(scope: Dict[str, Any], body: bytes) -> Dict[str, Any]:
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        value = raw_value.decode("latin-1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[name] = value
+            continue
+        key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    # The body is already buffered (chunked uploads have no Content-Length header).
+    environ["CONTENT_LENGTH"] = str(len(body))
+    return environ
+
+
+class AsyncApp:
+    """ASGI application over the same models and services as flask_app."""
+
+    def __init__(self, wsgi_app: Any = flask_app, cpu_workers: int = CPU_WORKERS):
+        self.wsgi_app = wsgi_app
+        self.cpu_workers = cpu_workers
+        self.executor = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix="asgi-cpu")
+        self.routes: Dict[Tuple[str, str], Handler] = {
+            ("GET", "/health"): self.health,
+            ("GET", "/api/chat/status"): self.chat_status,
+            ("POST", "/api/predict"): self.predict,
+            ("POST", "/api/chat"): self.chat,
+        }
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        # Read per request, so models swapped into the Flask config are picked up.
+        return self.wsgi_app.config
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        try:
+            body = await _read_body(receive)
+        except _BodyTooLarge:
+            await self._send_json(send, 413, {"error": "Request body too large"})
+            return
+        if body is None:
+            return
+
+        handler = self.routes.get((scope["method"], scope["path"]))
+        if handler is None:
+            await self._call_wsgi(scope, body, send)
+            return
+
+        status, payload = await handler(body)
+        await self._send_json(send, status, payload, cors=scope["path"].startswith("/api/"))
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                print(f"[INFO] ASGI app ready ({self.cpu_workers} CPU threads)")
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _send_json(self, send, status: int, payload: Dict[str, Any], cors: bool = False) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        if cors:
+            # Same policy as CORS(app, resources={r"/api/*": {"origins": "*"}}) in app.py.
+            headers.append((b"access-control-allow-origin", b"*"))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _call_wsgi(self, scope, body: bytes, send) -> None:
+        """Run the Flask app for this request on the executor, streaming its body."""
+        loop = asyncio.get_running_loop()
+        started: Dict[str, Any] = {}
+
+        def start_response(status: str, headers: List[Tuple[str, str]], exc_info=None):
+            started["status"] = int(status.split(" ", 1)[0])
+            started["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+            return lambda data: None
+
+        environ = _wsgi_environ(scope, body)
+        iterable = await loop.run_in_executor(self.executor, self.wsgi_app, environ, start_response)
+        chunks = iter(iterable)
+        try:
+            await send({"type": "http.response.start", "status": started["status"], "headers": started["headers"]})
+            while True:
+                # Chunks of streamed responses (/api/chat/stream) are forwarded as they come.
+                chunk = await loop.run_in_executor(self.executor, next, chunks, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            close = getattr(iterable, "close", None)
+            if close is not None:
+                await loop.run_in_executor(self.executor, close)
+
+    # -- routes ------------------------------------------------------------
+
+    async def health(self, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        return 200, {"status": "ok", "message": "Smart Disease API running"}
+
+    async def chat_status(self, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        try:
+            return 200, await asyncio.get_running_loop().run_in_executor(self.executor, get_llm_status)
+        except Exception:
+            return 200, {"provider": "unknown", "gemini_enabled": False, "model": None}
+
+    async def predict(self, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        try:
+            payload = json.loads(body or b"null")
+            if not isinstance(payload, dict):
+                return 400, {"error": "Request body must be a JSON object"}
+            disease = payload.get("disease", "diabetes").lower()
+
+            if disease == "heart":
+                return 400, {"error": "Heart disease model is not available right now"}
+
+            if disease not in {"diabetes", "hypertension", "stroke"}:
+                return 400, {"error": "Unsupported disease type. Use: diabetes, hypertension, or stroke"}
+
+            prediction_result = await predict_disease_risk_async(
+                disease=disease,
+                payload=payload,
+                models=self.config["DISEASE_MODELS"],
+                advice_generator=self.config.get("ADVICE_GENERATOR"),
+                advice_mode=payload.get("advice_mode"),
+                executor=self.executor,
+            )
+            return 200, prediction_result
+
+        except (KeyError, ValueError, AssertionError) as e:
+            # Input/validation errors should be 4xx so the frontend can show a proper message.
+            return 400, {"error": str(e)}
+        except Exception as e:
+            print(f"[ERROR] /api/predict failed: {e}")
+            traceback.print_exc()
+            return 500, {"error": "Internal server error"}
+
+    async def chat(self, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        try:
+            data = json.loads(body or b"null")
+            if not isinstance(data, dict):
+                return 400, {"error": "Request body must be a JSON object"}
+            message = data.get("message", "").strip()
+
+            if not message:
+                return 400, {"error": "Message cannot be empty"}
+
+            response_payload = await analyze_and_respond_async(
+                message, self.config["NLP_MODELS"], executor=self.executor
+            )
+
+            # Format response to match frontend expectations
+            return 200, {
+                "response": response_payload.get("bot_reply", ""),
+                "sentiment": response_payload.get("sentiment", {}).get("label", "").lower(),
+                "confidence": response_payload.get("sentiment", {}).get("score", 0),
+            }
+
+        except Exception as e:
+            print(f"[ERROR] /api/chat failed: {e}")
+            return 500, {"error": "Internal server error"}
+
+
+app = AsyncApp()
@@ -0,0 +1,7 @@
+"""
+Offline benchmarks for the backend hot paths.
+
+Run from the backend directory, e.g.:
+
+    python -m benchmarks.bench_shap_explainer
+"""
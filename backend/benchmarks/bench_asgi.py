@@ -0,0 +1,146 @@
+"""
+Load test: a few hundred concurrent /api/predict and /api/chat requests, each
+waiting on a slow LLM (an offline stub), against the threaded Flask app and
+the ASGI app in asgi.py.
+
+Both apps are driven in-process (Flask through its test client on a pool of
+--flask-threads threads, like gunicorn workers x threads; ASGI by calling the
+app coroutine directly), so the numbers compare the concurrency models, not
+HTTP servers.
+
+    python -m benchmarks.bench_asgi [--concurrency 100 300] [--llm-latency 1.0] [--flask-threads 16]
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from services.cache_service import advice_cache, chatbot_cache, prediction_cache
+
+from .common import StubGenerator, report, synthetic_payloads, train_synthetic_models
+from .suite import DISEASES, _chat_generator, _stub_sentiment
+
+
+def _requests(n: int) -> List[Tuple[str, Dict[str, Any]]]:
+    """n distinct requests (no cache hits), alternating predict and chat."""
+    payloads = [p for disease in DISEASES for p in synthetic_payloads(disease, n, seed=11)]
+    requests = []
+    for i in range(n):
+        if i % 2 == 0:
+            requests.append(("/api/predict", payloads[i % len(payloads)]))
+        else:
+            requests.append(("/api/chat", {"message": f"feeling anxious about topic{i:05d} lately"}))
+    return requests
+
+
+def _stats(latencies: List[float], elapsed: float, statuses: List[int]) -> Dict[str, float]:
+    latencies = sorted(latencies)
+    return {
+        "requests_per_s": len(latencies) / elapsed,
+        "wall_s": elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000.0,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000.0,
+        "errors": sum(1 for s in statuses if s != 200),
+    }
+
+
+def _run_flask(flask_app, requests, threads: int) -> Dict[str, float]:
+    clients = threading.local()
+
+    def call(request) -> Tuple[float, int]:
+        if not hasattr(clients, "c"):
+            clients.c = flask_app.test_client()
+        response = clients.c.post(request[0], json=request[1])
+        # Latency counts from submission: requests queued behind busy threads wait too.
+        return time.perf_counter() - start, response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(call, requests))
+    elapsed = time.perf_counter() - start
+    return _stats([r[0] for r in results], elapsed, [r[1] for r in results])
+
+
+async def _asgi_request(app, path: str, payload: Dict[str, Any]) -> Tuple[float, int]:
+    body = json.dumps(payload).encode()
+    scope = {
+        "type": "http", "method": "POST", "path": path, "query_string": b"", "http_version": "1.1",
+        "headers": [(b"content-type", b"application/json")],
+    }
+    sent = False
+    status = 0
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            await asyncio.sleep(3600)
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return time.perf_counter(), status
+
+
+def _run_asgi(app, requests) -> Dict[str, float]:
+    async def main():
+        start = time.perf_counter()
+        results = await asyncio.gather(*(_asgi_request(app, path, payload) for path, payload in requests))
+        return [(end - start, status) for end, status in results], time.perf_counter() - start
+
+    results, elapsed = asyncio.run(main())
+    return _stats([r[0] for r in results], elapsed, [r[1] for r in results])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[100, 300])
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    parser.add_argument("--flask-threads", type=int, default=16)
+    parser.add_argument("--cpu-workers", type=int, default=4)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    import app as app_module
+    from asgi import AsyncApp
+
+    generator = StubGenerator(latency_s=args.llm_latency)
+    flask_app = app_module.create_app()
+    flask_app.config["DISEASE_MODELS"] = train_synthetic_models()
+    flask_app.config["NLP_MODELS"] = {"sentiment_analyzer": _stub_sentiment, "advice_generator": generator}
+    flask_app.config["ADVICE_GENERATOR"] = generator
+    asgi_app = AsyncApp(flask_app, cpu_workers=args.cpu_workers)
+
+    results: Dict[str, Any] = {
+        "llm_latency_s": args.llm_latency,
+        "flask_threads": args.flask_threads,
+        "asgi_cpu_workers": args.cpu_workers,
+    }
+    with _chat_generator(generator):
+        for n in args.concurrency:
+            requests = _requests(n)
+            row = {}
+            for name, run in (
+                ("flask", lambda: _run_flask(flask_app, requests, args.flask_threads)),
+                ("asgi", lambda: _run_asgi(asgi_app, requests)),
+            ):
+                advice_cache.clear()
+                chatbot_cache.clear()
+                prediction_cache.clear()
+                row[name] = run()
+            row["speedup"] = row["asgi"]["requests_per_s"] / row["flask"]["requests_per_s"]
+            results[str(n)] = row
+
+    report("asgi", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Hit rate and lookup latency of the advice cache backends with N worker
+processes. A fixed amount of skewed (Zipf-like) traffic is split across the
+workers, the way gunicorn spreads requests.
+
+    python -m benchmarks.bench_cache_backends [--workers 1 2 4 8] [--requests 8000]
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from services.cache_service import AdviceCache, InMemoryCacheBackend, SQLiteCacheBackend
+
+from .common import report
+
+
+def _make_backend(kind: str, path: str):
+    if kind == "sqlite":
+        return SQLiteCacheBackend(path, "advice")
+    return InMemoryCacheBackend()
+
+
+def _worker(kind: str, path: str, seed: int, lookups: int, n_keys: int, queue) -> None:
+    cache = AdviceCache(backend=_make_backend(kind, path))
+    rng = np.random.default_rng(seed)
+    keys = np.minimum(rng.zipf(1.3, size=lookups), n_keys)
+
+    latencies = []
+    for key in keys:
+        explanation = [{"feature": "BMI", "value": float(key)}]
+        start = time.perf_counter()
+        advice = cache.get("diabetes", "High", explanation)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        if advice is None:
+            # Stand-in for the Gemini call every miss pays for.
+            cache.set("diabetes", "High", explanation, "Generated advice " * 20)
+
+    stats = cache.get_stats()
+    queue.put((stats["hit_count"], stats["miss_count"], latencies))
+
+
+def run(kind: str, workers: int, requests: int, n_keys: int) -> dict:
+    path = os.path.join(tempfile.mkdtemp(prefix="sdp-cache-bench-"), "cache.sqlite3")
+    if kind == "sqlite":
+        SQLiteCacheBackend(path, "advice")  # create the schema once up front
+
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    procs = [
+        ctx.Process(target=_worker, args=(kind, path, seed, requests // workers, n_keys, queue))
+        for seed in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+    results = [queue.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+
+    hits = sum(r[0] for r in results)
+    misses = sum(r[1] for r in results)
+    latencies = sorted(l for r in results for l in r[2])
+    return {
+        "hit_rate": hits / max(hits + misses, 1),
+        "upstream_calls": misses,
+        "lookup_p50_ms": latencies[len(latencies) // 2],
+        "lookup_p95_ms": latencies[int(len(latencies) * 0.95)],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--requests", type=int, default=8000)
+    parser.add_argument("--keys", type=int, default=500)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    results = {}
+    for kind in ("memory", "sqlite"):
+        results[kind] = {
+            str(n): run(kind, n, args.requests, args.keys) for n in args.workers
+        }
+    report("cache_backends", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
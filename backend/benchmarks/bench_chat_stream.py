@@ -0,0 +1,87 @@
+"""
+Time to first byte of a chat reply: /api/chat (waits for the whole Gemini
+response) versus /api/chat/stream (Server-Sent Events as chunks arrive),
+with an offline streaming stub standing in for Gemini.
+
+    python -m benchmarks.bench_chat_stream [--llm-latency 1.0] [--chunks 8] [--repeat 5]
+"""
+
+import argparse
+import time
+
+from flask import Flask
+
+from routes.chat_routes import chat_bp
+from services.cache_service import chatbot_cache
+
+from .common import StubGenerator, report
+from .suite import _chat_generator, _stub_sentiment
+
+MESSAGES = [
+    "I feel anxious about my exams tomorrow",
+    "Today was a really good day with friends",
+    "I can't stop worrying about work",
+]
+
+
+def _time_request(client, path: str, message: str) -> dict:
+    start = time.perf_counter()
+    response = client.post(path, json={"message": message}, buffered=False)
+    first_byte = first_text = None
+    events = []
+    for data in response.response:
+        now = time.perf_counter() - start
+        if first_byte is None and data:
+            first_byte = now
+        for line in data.decode().splitlines():
+            if line.startswith("event: "):
+                events.append(line[len("event: "):])
+                if first_text is None and events[-1] == "chunk":
+                    first_text = now
+    total = time.perf_counter() - start
+    response.close()
+    # /api/chat has no events: its reply text arrives with its first byte.
+    first_text = first_text if first_text is not None else first_byte
+    return {
+        "first_byte_ms": first_byte * 1000.0,
+        "first_text_ms": first_text * 1000.0,
+        "total_ms": total * 1000.0,
+        "events": events,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    parser.add_argument("--chunks", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config["NLP_MODELS"] = {"sentiment_analyzer": _stub_sentiment, "advice_generator": None}
+    app.register_blueprint(chat_bp, url_prefix="/api")
+    client = app.test_client()
+
+    results = {"llm_latency_s": args.llm_latency, "chunks": args.chunks}
+    generator = StubGenerator(latency_s=args.llm_latency, chunks=args.chunks)
+    with _chat_generator(generator):
+        for name, path in (("blocking", "/api/chat"), ("stream", "/api/chat/stream")):
+            runs = []
+            for i in range(args.repeat):
+                chatbot_cache.clear()
+                runs.append(_time_request(client, path, MESSAGES[i % len(MESSAGES)]))
+            results[name] = {
+                key: sum(r[key] for r in runs) / len(runs)
+                for key in ("first_byte_ms", "first_text_ms", "total_ms")
+            }
+        # The last streamed reply is cached now; it is replayed as one chunk event.
+        results["stream_cache_hit"] = _time_request(client, "/api/chat/stream", MESSAGES[(args.repeat - 1) % len(MESSAGES)])
+
+    results["first_text_speedup"] = results["blocking"]["first_text_ms"] / results["stream"]["first_text_ms"]
+    chatbot_cache.clear()
+    report("chat_stream", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
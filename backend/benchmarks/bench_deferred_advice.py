@@ -0,0 +1,60 @@
+"""
+/api/predict latency with inline versus deferred advice against a stub LLM
+that simulates upstream latency, plus the time until deferred advice is ready.
+
+    python -m benchmarks.bench_deferred_advice [--latency 1.0] [--requests 5]
+"""
+
+import argparse
+import time
+
+from flask import Flask
+
+from routes.predict_routes import predict_bp
+from services.cache_service import advice_cache, prediction_cache
+
+from .common import StubGenerator, report, synthetic_payloads, train_synthetic_models
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    generator = StubGenerator(latency_s=args.latency)
+    app = Flask(__name__)
+    app.config["DISEASE_MODELS"] = train_synthetic_models(n_estimators=50)
+    app.config["ADVICE_GENERATOR"] = generator
+    app.register_blueprint(predict_bp, url_prefix="/api")
+    client = app.test_client()
+
+    payloads = synthetic_payloads("stroke", args.requests, seed=3)
+    results = {}
+    for mode in ("inline", "deferred"):
+        advice_cache.clear()
+        prediction_cache.clear()
+        latencies, ready_after = [], []
+        for payload in payloads:
+            start = time.perf_counter()
+            body = client.post("/api/predict", json=dict(payload, advice_mode=mode)).get_json()
+            latencies.append(time.perf_counter() - start)
+
+            token = body.get("advice_token")
+            if token:
+                status = client.get(f"/api/advice/{token}?wait=10").get_json()
+                ready_after.append(time.perf_counter() - start)
+                assert status["status"] in ("ready", "fallback"), status
+
+        results[mode] = {
+            "predict_mean_s": sum(latencies) / len(latencies),
+            "advice_ready_mean_s": sum(ready_after) / len(ready_after) if ready_after else None,
+        }
+
+    results["upstream_calls"] = generator.calls
+    report("deferred_advice", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
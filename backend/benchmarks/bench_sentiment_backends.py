@@ -0,0 +1,88 @@
+"""
+Load time, resident memory, latency and accuracy parity of the sentiment
+inference backends (fp32, int8, onnx). Each backend is loaded in a fresh
+Python process so its memory is measured on its own. Needs transformers and
+torch (and onnxruntime for "onnx"); the first onnx run exports the graph.
+
+    python -m benchmarks.bench_sentiment_backends [--backends fp32 int8 onnx] [--threads 1]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from .common import report
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CHILD = """
+import json, time
+from benchmarks.common import time_call
+from services.sentiment_backends import PARITY_SAMPLES, build_sentiment_pipeline
+
+def rss_kb():
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+
+before = rss_kb()
+start = time.perf_counter()
+analyzer = build_sentiment_pipeline({backend!r}, num_threads={threads!r}, parity=False)
+load_seconds = time.perf_counter() - start
+after_load = rss_kb()
+
+samples = list(PARITY_SAMPLES)
+single = time_call(lambda: analyzer(samples[0]), repeat={repeat})
+batch = time_call(lambda: analyzer(samples[:16], batch_size=16), repeat=max(5, {repeat} // 4))
+print(json.dumps({{
+    "load_seconds": load_seconds,
+    "rss_load_mb": (after_load - before) / 1024.0,
+    "rss_total_mb": rss_kb() / 1024.0,
+    "single": single,
+    "batch16": batch,
+    "predictions": analyzer(samples),
+}}))
+"""
+
+
+def _measure(backend: str, threads, repeat: int) -> dict:
+    code = _CHILD.format(backend=backend, threads=threads, repeat=repeat)
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+    # Loader logs go to stdout too; the result is the last line.
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backends", nargs="+", default=["fp32", "int8", "onnx"])
+    parser.add_argument("--threads", type=int, default=None, help="intra-op threads per process")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    backends = args.backends if "fp32" in args.backends else ["fp32"] + args.backends
+    results = {backend: _measure(backend, args.threads, args.repeat) for backend in backends}
+
+    reference = results["fp32"].get("predictions")
+    for backend, result in results.items():
+        predictions = result.pop("predictions", None)
+        if reference is None or predictions is None:
+            continue
+        agree = [r["label"] == p["label"] for r, p in zip(reference, predictions)]
+        result["parity"] = {
+            "label_agreement": sum(agree) / len(agree),
+            "max_score_diff": max(abs(r["score"] - p["score"]) for r, p in zip(reference, predictions)),
+        }
+
+    report("sentiment_backends", {"threads": args.threads, "backends": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
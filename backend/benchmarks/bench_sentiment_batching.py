@@ -0,0 +1,97 @@
+"""
+Throughput and latency of sentiment analysis at 1, 8 and 64 concurrent
+clients, calling the pipeline directly versus through the micro-batcher.
+
+By default a fake pipeline is used: each call costs a fixed forward-pass
+overhead plus a per-item cost and runs one at a time (like torch threads
+competing for the same cores). --real uses the HuggingFace pipeline.
+
+    python -m benchmarks.bench_sentiment_batching [--clients 1 8 64] [--real]
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.micro_batcher import BatchedSentimentAnalyzer
+
+from .common import report
+
+MESSAGES = [
+    "I feel anxious about my exams",
+    "Today was a really good day",
+    "I can't sleep and everything feels heavy",
+    "Just checking in, nothing special",
+]
+
+
+class FakeSentimentPipeline:
+    def __init__(self, call_overhead_ms: float = 8.0, per_item_ms: float = 1.0):
+        self.call_overhead_s = call_overhead_ms / 1000.0
+        self.per_item_s = per_item_ms / 1000.0
+        self._cpu = threading.Lock()
+
+    def __call__(self, inputs, batch_size=None):
+        items = [inputs] if isinstance(inputs, str) else list(inputs)
+        with self._cpu:
+            time.sleep(self.call_overhead_s + self.per_item_s * len(items))
+        return [{"label": "NEGATIVE", "score": 0.9} for _ in items]
+
+
+def _run(analyzer, clients: int, requests_per_client: int) -> dict:
+    latencies = []
+    lock = threading.Lock()
+
+    def client(i: int) -> None:
+        for j in range(requests_per_client):
+            start = time.perf_counter()
+            analyzer(MESSAGES[(i + j) % len(MESSAGES)])[0]
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000.0)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, range(clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests_per_s": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[int(len(latencies) * 0.95)],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--requests", type=int, default=256, help="total requests per run")
+    parser.add_argument("--max-batch", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--real", action="store_true")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    if args.real:
+        from transformers import pipeline
+
+        base = pipeline("sentiment-analysis")
+    else:
+        base = FakeSentimentPipeline()
+
+    results = {}
+    for clients in args.clients:
+        per_client = max(1, args.requests // clients)
+        batched = BatchedSentimentAnalyzer(base, max_batch_size=args.max_batch, max_wait_ms=args.max_wait_ms)
+        results[str(clients)] = {
+            "direct": _run(base, clients, per_client),
+            "micro_batched": _run(batched, clients, per_client),
+            "batcher": batched.batcher.get_stats(),
+        }
+
+    report("sentiment_batching", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Per-request SHAP cost with a fresh TreeExplainer (the old behaviour) versus
+the cached explainer registry in xai_service.
+
+    python -m benchmarks.bench_shap_explainer [--repeat 50] [--output shap.json]
+"""
+
+import argparse
+
+import shap
+
+from services.xai_service import _unwrap_for_tree_explainer, explain_with_shap, invalidate_explainers
+
+from .common import report, synthetic_frame, time_call, train_synthetic_models
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--n-estimators", type=int, default=200)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    models = train_synthetic_models(n_estimators=args.n_estimators)
+    results = {}
+
+    for disease, model in models.items():
+        if model is None:
+            continue
+        row = synthetic_frame(disease, 1, seed=42)
+
+        def uncached():
+            explainer = shap.TreeExplainer(_unwrap_for_tree_explainer(model))
+            explainer.shap_values(row)
+
+        def cached():
+            explain_with_shap(model, row, top_k=5)
+
+        invalidate_explainers()
+        before = time_call(uncached, repeat=args.repeat)
+        after = time_call(cached, repeat=args.repeat)
+        results[disease] = {
+            "rebuild_per_request": before,
+            "cached_explainer": after,
+            "speedup_p50": before["p50_ms"] / max(after["p50_ms"], 1e-9),
+        }
+
+    report("shap_explainer", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+SHAP explanation throughput under concurrent requests: inline on the request
+threads versus the warm process pool (SDP_SHAP_MODE=process) at increasing
+worker counts. Inline SHAP mostly holds the GIL, so it stays flat however
+many threads call it; the pool should scale with the number of cores.
+
+    python -m benchmarks.bench_shap_pool [--clients 16] [--workers 1 2 4 8] [--requests 400]
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+
+from services.model_loader import _safe_load_model
+from services.prediction_service import get_feature_schema
+from services.shap_pool import ShapProcessPool
+from services.xai_service import _explain_inline
+
+from .common import report, synthetic_frame, train_synthetic_models
+
+
+def _run(explain, rows, clients: int, total_requests: int) -> dict:
+    latencies = []
+    lock = threading.Lock()
+    counter = iter(range(total_requests))
+
+    def client(_: int) -> None:
+        for i in counter:
+            start = time.perf_counter()
+            explain(rows[i % len(rows)])
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000.0)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, range(clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "explanations_per_s": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+    }
+
+
+def main() -> None:
+    cpus = os.cpu_count() or 1
+    default_workers = sorted({1, 2, 4, cpus} if cpus >= 4 else {1, cpus})
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--disease", default="hypertension", choices=("diabetes", "stroke", "hypertension"))
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--n-estimators", type=int, default=200)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    trained = train_synthetic_models(n_estimators=args.n_estimators)[args.disease]
+    with tempfile.TemporaryDirectory() as tmp:
+        # The pool loads models by file path, like MODELS_DIR in the app.
+        path = os.path.join(tmp, f"{args.disease}.pkl")
+        joblib.dump(trained, path)
+        model = _safe_load_model(path, mmap_mode=None)
+
+        schema = get_feature_schema(args.disease, model)
+        frame = synthetic_frame(args.disease, 64, seed=7)
+        matrix, _, _ = schema.encode_frame(frame)
+        rows = [matrix[i:i + 1] for i in range(len(matrix))]
+        names = list(schema.columns)
+
+        results = {"cpus": cpus, "clients": args.clients}
+        results["inline"] = _run(
+            lambda row: _explain_inline(model, row, 5, names), rows, args.clients, args.requests
+        )
+
+        for workers in args.workers:
+            pool = ShapProcessPool(max_workers=workers, timeout_ms=60000)
+            pool.start([path])
+            pool.ready.wait(120)
+            # Warm every worker before timing.
+            _run(lambda row: pool.explain(model, row, names, 5), rows, workers, workers * 4)
+            result = _run(lambda row: pool.explain(model, row, names, 5), rows, args.clients, args.requests)
+            result["speedup_vs_inline"] = result["explanations_per_s"] / results["inline"]["explanations_per_s"]
+            result["fallbacks"] = pool.get_stats()["timeouts"] + pool.get_stats()["errors"]
+            results[f"process_{workers}"] = result
+            pool.reset()
+
+    report("shap_pool", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
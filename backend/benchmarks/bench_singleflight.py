@@ -0,0 +1,57 @@
+"""
+Upstream LLM calls and latency when many identical requests miss the cache at
+the same moment, with single-flight coalescing in the advice/chat caches.
+
+    python -m benchmarks.bench_singleflight [--clients 32] [--latency 0.2]
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.cache_service import advice_cache, chatbot_cache
+from services.nlp_service import generate_ai_response
+from services.prediction_service import predict_disease_risk
+
+from .common import StubGenerator, report, synthetic_payloads, train_synthetic_models
+
+
+def _burst(clients: int, fn) -> dict:
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        start = time.perf_counter()
+        list(pool.map(lambda _: fn(), range(clients)))
+        elapsed = time.perf_counter() - start
+    return {"clients": clients, "wall_s": elapsed}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    models = train_synthetic_models(n_estimators=50)
+    payload = synthetic_payloads("diabetes", 1, seed=7)[0]
+
+    advice_cache.clear()
+    advice_generator = StubGenerator(latency_s=args.latency)
+    advice = _burst(
+        args.clients,
+        lambda: predict_disease_risk("diabetes", payload, models, advice_generator=advice_generator),
+    )
+    advice["upstream_calls"] = advice_generator.calls
+
+    chatbot_cache.clear()
+    chat_generator = StubGenerator(latency_s=args.latency)
+    chat = _burst(
+        args.clients,
+        lambda: generate_ai_response("I feel anxious about my exams", "NEGATIVE", generator=chat_generator),
+    )
+    chat["upstream_calls"] = chat_generator.calls
+
+    report("singleflight", {"advice": advice, "chat": chat}, args.output)
+
+
+if __name__ == "__main__":
+    main()
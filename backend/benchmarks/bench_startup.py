@@ -0,0 +1,101 @@
+"""
+Cold-start cost of each backend component, each measured in a fresh Python
+process: heavy imports, loading every joblib model, building its SHAP
+explainer, the sentiment pipeline, and create_app in lazy vs eager mode.
+
+Synthetic models are written to a temporary SDP_MODELS_DIR so this runs
+offline.
+
+    python -m benchmarks.bench_startup [--output startup.json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import joblib
+
+from services.model_loader import MODEL_FILES
+
+from .common import report, train_synthetic_models
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_TIMED = """
+import json, time
+start = time.perf_counter()
+{setup}
+{body}
+print(json.dumps({{"seconds": time.perf_counter() - start}}))
+"""
+
+
+def _measure(body: str, env: dict, setup: str = "") -> dict:
+    code = _TIMED.format(setup=setup, body=body)
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        return {"error": (proc.stderr.strip().splitlines() or ["failed"])[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    models_dir = tempfile.mkdtemp(prefix="sdp-models-")
+    for disease, model in train_synthetic_models().items():
+        if MODEL_FILES.get(disease):
+            joblib.dump(model, os.path.join(models_dir, MODEL_FILES[disease]))
+
+    env = dict(os.environ, SDP_MODELS_DIR=models_dir, PYTHONDONTWRITEBYTECODE="1")
+    results = {}
+
+    for module in ("flask", "pandas", "sklearn", "xgboost", "shap", "transformers", "google.generativeai"):
+        results[f"import {module}"] = _measure(f"import {module}", env)
+
+    for disease, filename in MODEL_FILES.items():
+        if not filename:
+            continue
+        path = os.path.join(models_dir, filename)
+        results[f"load {disease}"] = _measure(
+            f"_safe_load_model({path!r})",
+            env,
+            setup="from services.model_loader import _safe_load_model",
+        )
+        results[f"explainer {disease}"] = _measure(
+            "get_tree_explainer(model)",
+            env,
+            setup=(
+                "from services.model_loader import _safe_load_model\n"
+                "from services.xai_service import get_tree_explainer\n"
+                f"model = _safe_load_model({path!r})\n"
+                "start = time.perf_counter()"
+            ),
+        )
+
+    results["sentiment pipeline"] = _measure(
+        "load_nlp_models(mode='lazy')['sentiment_analyzer'].load()",
+        env,
+        setup="from services.model_loader import load_nlp_models",
+    )
+
+    for mode in ("lazy", "eager"):
+        results[f"create_app ({mode})"] = _measure(
+            "import app", dict(env, SDP_MODEL_LOADING=mode)
+        )
+
+    report("startup", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Parity and latency of the compiled NumPy tree engine against the original
+predict_proba, for single rows and batches.
+
+    python -m benchmarks.bench_tree_engine [--n-estimators 200] [--batch 1000 10000]
+"""
+
+import argparse
+import warnings
+
+import numpy as np
+
+from services.tree_engine import CompiledModel, PARITY_TOLERANCE
+
+from .common import report, synthetic_frame, time_call, train_synthetic_models
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n-estimators", type=int, default=200)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    models = train_synthetic_models(n_estimators=args.n_estimators)
+    results = {}
+
+    for disease, model in models.items():
+        if model is None:
+            continue
+        compiled = CompiledModel(model)
+
+        X = np.vstack([
+            compiled.probe_rows(5000),
+            synthetic_frame(disease, 5000, seed=5).to_numpy(dtype=float),
+        ])
+        max_error = float(np.max(np.abs(compiled.predict_proba(X) - model.predict_proba(X))))
+
+        row = X[:1]
+        entry = {
+            "max_abs_error": max_error,
+            "parity_ok": max_error <= PARITY_TOLERANCE,
+            "single_row": {
+                "predict_proba": time_call(lambda: model.predict_proba(row), repeat=args.repeat),
+                "compiled": time_call(lambda: compiled.predict_proba(row), repeat=args.repeat),
+            },
+        }
+        for n in args.batch:
+            batch = synthetic_frame(disease, n, seed=9).to_numpy(dtype=float)
+            entry[f"batch_{n}"] = {
+                "predict_proba": time_call(lambda: model.predict_proba(batch), repeat=5, warmup=1),
+                "compiled": time_call(lambda: compiled.predict_proba(batch), repeat=5, warmup=1),
+            }
+        results[disease] = entry
+
+    report("tree_engine", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
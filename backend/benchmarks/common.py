@@ -0,0 +1,184 @@
+"""
+Shared helpers for the benchmark scripts: small synthetic models that use the
+same feature schemas as the production models, and simple timing/reporting.
+"""
+
+import asyncio
+import json
+import statistics
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# (feature name, payload field, low, high, is_integer) in training column order.
+SYNTHETIC_SCHEMAS: Dict[str, List[tuple]] = {
+    "diabetes": [
+        ("Age", "age", 18, 80, True),
+        ("BMI", "bmi", 15.0, 50.0, False),
+        ("HighBP", "highbp", 0, 1, True),
+        ("HighChol", "highchol", 0, 1, True),
+        ("GenHlth", "genhlth", 1, 5, True),
+        ("DiffWalk", "diffwalk", 0, 1, True),
+    ],
+    "hypertension": [
+        ("age", "age", 25.0, 80.0, False),
+        ("sex", "sex", 0, 1, True),
+        ("trestbps", "trestbps", 90.0, 200.0, False),
+        ("chol", "chol", 120.0, 400.0, False),
+        ("fbs", "fbs", 0, 1, True),
+        ("restecg", "restecg", 0, 2, True),
+        ("exang", "exang", 0, 1, True),
+        ("slope", "slope", 0, 2, True),
+    ],
+    "stroke": [
+        ("age", "age", 1.0, 90.0, False),
+        ("hypertension", "hypertension", 0, 1, True),
+        ("heart_disease", "heart_disease", 0, 1, True),
+        ("avg_glucose_level", "avg_glucose_level", 55.0, 280.0, False),
+        ("bmi", "bmi", 15.0, 50.0, False),
+        ("smoking_status", "smoking_status", 0, 3, True),
+        ("ever_married", "ever_married", 0, 1, True),
+    ],
+}
+
+
+def synthetic_frame(disease: str, n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Random feature rows with the model's column names and value ranges."""
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, _field, low, high, is_int in SYNTHETIC_SCHEMAS[disease]:
+        if is_int:
+            columns[name] = rng.integers(low, high + 1, size=n_rows)
+        else:
+            columns[name] = np.round(rng.uniform(low, high, size=n_rows), 1)
+    return pd.DataFrame(columns)
+
+
+def synthetic_payloads(disease: str, n_rows: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Random /api/predict payloads for disease."""
+    frame = synthetic_frame(disease, n_rows, seed=seed)
+    fields = {name: field for name, field, *_ in SYNTHETIC_SCHEMAS[disease]}
+    payloads = []
+    for record in frame.to_dict(orient="records"):
+        payload = {"disease": disease}
+        payload.update({fields[name]: value for name, value in record.items()})
+        payloads.append(payload)
+    return payloads
+
+
+def _synthetic_labels(frame: pd.DataFrame, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed + 1)
+    scaled = (frame - frame.mean()) / (frame.std() + 1e-9)
+    weights = rng.normal(size=scaled.shape[1])
+    logits = scaled.to_numpy() @ weights + rng.normal(scale=0.5, size=len(frame))
+    return (logits > 0).astype(int)
+
+
+def train_synthetic_models(n_rows: int = 2000, n_estimators: int = 100, seed: int = 0) -> Dict[str, Any]:
+    """Train small stand-ins for the production models, entirely offline.
+
+    Diabetes and stroke are XGBoost classifiers; hypertension is a RandomForest
+    wrapped in CalibratedClassifierCV, matching the shipped artifacts.
+    """
+    from sklearn.calibration import CalibratedClassifierCV
+    from sklearn.ensemble import RandomForestClassifier
+    from xgboost import XGBClassifier
+
+    models: Dict[str, Any] = {}
+    for disease in ("diabetes", "stroke"):
+        frame = synthetic_frame(disease, n_rows, seed=seed)
+        model = XGBClassifier(n_estimators=n_estimators, max_depth=4, n_jobs=1, random_state=seed)
+        model.fit(frame, _synthetic_labels(frame, seed))
+        models[disease] = model
+
+    frame = synthetic_frame("hypertension", n_rows, seed=seed)
+    forest = RandomForestClassifier(n_estimators=n_estimators, max_depth=8, n_jobs=1, random_state=seed)
+    model = CalibratedClassifierCV(forest, method="sigmoid", cv=3)
+    model.fit(frame, _synthetic_labels(frame, seed))
+    models["hypertension"] = model
+
+    models["heart"] = None
+    return models
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubGenerator:
+    """
+    Offline stand-in for a Gemini GenerativeModel.
+
+    generate_content sleeps for latency_s to simulate the upstream round trip
+    and counts how many times it was called (generate_content_async awaits
+    instead of sleeping). With stream=True it returns an
+    iterator of `chunks` partial responses instead, with latency_s spread
+    evenly across them.
+    """
+
+    def __init__(self, latency_s: float = 0.2, text: Optional[str] = None, chunks: int = 8):
+        self.latency_s = latency_s
+        self.text = text or (
+            "Keep active with 30 minutes of brisk walking most days, favour whole "
+            "grains and vegetables, and book a check-up to review your numbers."
+        )
+        self.chunks = max(1, chunks)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        with self._lock:
+            self.calls += 1
+        if stream:
+            return self._stream()
+        time.sleep(self.latency_s)
+        return StubResponse(self.text)
+
+    async def generate_content_async(self, prompt: str) -> StubResponse:
+        with self._lock:
+            self.calls += 1
+        await asyncio.sleep(self.latency_s)
+        return StubResponse(self.text)
+
+    def _stream(self) -> Iterator[StubResponse]:
+        words = self.text.split(" ")
+        step = -(-len(words) // self.chunks)
+        pieces = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+        for i, piece in enumerate(pieces):
+            time.sleep(self.latency_s / len(pieces))
+            yield StubResponse(piece if i == len(pieces) - 1 else piece + " ")
+
+
+def time_call(fn: Callable[[], Any], repeat: int = 50, warmup: int = 3) -> Dict[str, float]:
+    """Time fn() repeat times and return latency stats in milliseconds."""
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+
+    samples.sort()
+    return {
+        "repeat": repeat,
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "max_ms": samples[-1],
+    }
+
+
+def report(name: str, results: Dict[str, Any], output: Optional[str] = None) -> None:
+    """Print results as JSON and optionally write them to output."""
+    document = {"benchmark": name, "results": results}
+    text = json.dumps(document, indent=2, default=float)
+    print(text)
+    if output:
+        with open(output, "w") as fh:
+            fh.write(text + "\n")
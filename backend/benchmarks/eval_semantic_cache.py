@@ -0,0 +1,172 @@
+"""
+Hit quality of the chatbot cache: the keyword key versus the semantic tier
+at several similarity thresholds.
+
+One message per intent is cached; the other paraphrases of that intent
+should hit and get that intent's reply, while the distractors (messages
+that share words with a cached one but mean something else) should miss.
+Reported per setting:
+
+- paraphrase_hit_rate: paraphrases served from the cache
+- precision: served replies that belonged to the query's intent
+- false_hit_rate: distractors served someone else's reply
+
+Also times the top-1 search on a full label index and, unless --index-only,
+one message encoding. Needs transformers and torch (and the encoder
+weights, SDP_SEMANTIC_MODEL) except with --index-only.
+
+    python -m benchmarks.eval_semantic_cache [--thresholds 0.8 0.85 0.9 0.95] [--index-only]
+"""
+
+import argparse
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from services.cache_service import ChatbotResponseCache, InMemoryCacheBackend
+from services.semantic_cache import SEMANTIC_MAX_ENTRIES, SentenceEncoder, SemanticResponseCache, _LabelIndex
+
+from .common import report, time_call
+
+# intent -> (sentiment label, messages); the first message is the one cached.
+INTENTS: Dict[str, tuple] = {
+    "exam_anxiety": ("NEGATIVE", [
+        "I feel really anxious about my exams tomorrow",
+        "I'm so nervous about tomorrow's exams",
+        "My exams are tomorrow and my anxiety is through the roof",
+        "Really worried about the tests I have tomorrow",
+    ]),
+    "insomnia": ("NEGATIVE", [
+        "I can't sleep at night and I feel exhausted",
+        "I haven't been able to sleep properly for days",
+        "Insomnia is wrecking me, I lie awake every night",
+        "Every night I stay awake for hours and can't fall asleep",
+    ]),
+    "loneliness": ("NEGATIVE", [
+        "I feel lonely even when I'm around people",
+        "Even surrounded by friends I feel completely alone",
+        "I feel isolated and like nobody really gets me",
+        "I'm lonely all the time, even in a crowd",
+    ]),
+    "family_conflict": ("NEGATIVE", [
+        "I had an argument with my parents again",
+        "Another fight with my mom and dad today",
+        "My parents and I keep arguing about everything",
+        "We had yet another argument at home with my parents",
+    ]),
+    "work_stress": ("NEGATIVE", [
+        "I keep making mistakes at work and my boss is angry",
+        "My manager is upset because I keep messing up at my job",
+        "Work is going badly, I make errors and my boss yells at me",
+        "I keep screwing up at work and my supervisor is furious",
+    ]),
+    "money_worries": ("NEGATIVE", [
+        "I'm stressed about money and my rent is due",
+        "Rent is due soon and I don't have enough money",
+        "Financial stress is killing me, I can't pay my rent",
+        "I'm worried I won't be able to afford rent this month",
+    ]),
+    "job_offer": ("POSITIVE", [
+        "I got the job offer I was hoping for!",
+        "I just landed my dream job!",
+        "They offered me the position I really wanted",
+        "Great news, I was hired for the job I applied to",
+    ]),
+    "exam_success": ("POSITIVE", [
+        "My exam results came back better than expected",
+        "I did way better on my exams than I thought I would",
+        "Got my test scores back and they're great",
+        "My grades turned out much better than I expected",
+    ]),
+    "grateful_friends": ("POSITIVE", [
+        "My friends surprised me with dinner, I'm so grateful",
+        "My friends threw me a surprise dinner and I feel so thankful",
+        "I'm so grateful, my friends took me out for a surprise meal",
+        "Feeling thankful, my friends organized a dinner for me",
+    ]),
+    "meditation": ("POSITIVE", [
+        "Meditation has been helping me stay calm",
+        "Meditating every day keeps me much calmer",
+        "I've started meditating and I feel more peaceful",
+        "Daily meditation is really helping my stress",
+    ]),
+}
+
+# Same label and shared words with a cached message, different meaning.
+DISTRACTORS: List[tuple] = [
+    ("NEGATIVE", "I feel really anxious about my exams results being published"),
+    ("NEGATIVE", "I can't eat anything at night and I feel sick"),
+    ("NEGATIVE", "My parents are getting divorced and I'm heartbroken"),
+    ("NEGATIVE", "I keep making mistakes in my relationship and my partner is angry"),
+    ("NEGATIVE", "I'm stressed about my health and my doctor's appointment is due"),
+    ("NEGATIVE", "I feel lonely since my dog died last week"),
+    ("POSITIVE", "I got the apartment I was hoping for!"),
+    ("POSITIVE", "My exam for the driving license is next week, I'm excited"),
+    ("POSITIVE", "My friends surprised me with a trip to the beach"),
+    ("POSITIVE", "Yoga has been helping me stay flexible"),
+]
+
+
+def _evaluate(cache: ChatbotResponseCache) -> Dict[str, float]:
+    for intent, (label, messages) in INTENTS.items():
+        cache.set(label, messages[0], f"reply:{intent}")
+
+    paraphrases = correct = served = false_hits = 0
+    for intent, (label, messages) in INTENTS.items():
+        for message in messages[1:]:
+            paraphrases += 1
+            reply: Optional[str] = cache.get(label, message)
+            if reply is not None:
+                served += 1
+                correct += reply == f"reply:{intent}"
+    for label, message in DISTRACTORS:
+        if cache.get(label, message) is not None:
+            served += 1
+            false_hits += 1
+
+    return {
+        "paraphrase_hit_rate": correct / paraphrases,
+        "precision": correct / served if served else 1.0,
+        "false_hit_rate": false_hits / len(DISTRACTORS),
+    }
+
+
+def _index_latency(max_entries: int, dim: int = 384) -> Dict[str, float]:
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((max_entries, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    index = _LabelIndex(dim, max_entries)
+    for vector in vectors:
+        row, _ = index.slot_for_new(0.0)
+        index.write(row, vector, "", "", 1.0)
+    query = vectors[max_entries // 2]
+    return time_call(lambda: index.search(query, 0.0), repeat=500)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.8, 0.85, 0.9, 0.95])
+    parser.add_argument("--max-entries", type=int, default=SEMANTIC_MAX_ENTRIES)
+    parser.add_argument("--index-only", action="store_true", help="only time the vector search")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    results = {f"search_{args.max_entries}_rows": _index_latency(args.max_entries)}
+
+    if not args.index_only:
+        results["keywords"] = _evaluate(ChatbotResponseCache(backend=InMemoryCacheBackend()))
+
+        encoder = SentenceEncoder(memo_size=0)
+        results["encode_one"] = time_call(lambda: encoder(["I can't sleep and everything feels heavy"]), repeat=30)
+        for threshold in args.thresholds:
+            semantic = SemanticResponseCache(encoder=encoder, threshold=threshold)
+            cache = ChatbotResponseCache(backend=InMemoryCacheBackend(), semantic=semantic)
+            result = _evaluate(cache)
+            result["mean_hit_similarity"] = semantic.get_stats()["semantic_mean_hit_similarity"]
+            results[f"semantic_{threshold:g}"] = result
+
+    report("semantic_cache", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
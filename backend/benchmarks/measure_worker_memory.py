@@ -0,0 +1,132 @@
+"""
+Resident (RSS) and proportional (PSS) memory per forked worker for the model
+loading strategies gunicorn can use. Linux only (reads /proc/<pid>/smaps_rollup).
+
+  per-worker          each worker loads its own copy after fork (preload off)
+  per-worker+mmap     same, with joblib mmap_mode="r"
+  preload             the master loads once before fork, then gc.freeze()
+  preload+mmap        same, with joblib mmap_mode="r"
+
+Synthetic models are written uncompressed to a temporary directory, and each
+worker scores a few requests so the measurement reflects a serving worker.
+
+    python -m benchmarks.measure_worker_memory [--workers 4] [--n-estimators 300]
+"""
+
+import argparse
+import gc
+import json
+import os
+import tempfile
+
+import joblib
+
+from services.model_loader import MODEL_FILES, LazyModelRegistry
+from services.prediction_service import predict_disease_risk
+
+from .common import report, synthetic_payloads, train_synthetic_models
+
+
+def _memory_kb(pid: int) -> dict:
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as fh:
+        for line in fh:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:"):
+                values[parts[0][:-1].lower() + "_kb"] = int(parts[1])
+    return values
+
+
+def _serve(models) -> None:
+    for disease in ("diabetes", "hypertension", "stroke"):
+        for payload in synthetic_payloads(disease, 5, seed=11):
+            predict_disease_risk(disease, payload, models)
+
+
+def run(mode: str, models_dir: str, workers: int) -> dict:
+    mmap_mode = "r" if mode.endswith("+mmap") else None
+    preload = mode.startswith("preload")
+
+    models = LazyModelRegistry(MODEL_FILES, models_dir=models_dir, mmap_mode=mmap_mode)
+    if preload:
+        models.load_all()
+        gc.freeze()
+
+    children = []
+    for _ in range(workers):
+        read_fd, write_fd = os.pipe()
+        go_read, go_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            os.close(go_write)
+            worker_models = models if preload else LazyModelRegistry(
+                MODEL_FILES, models_dir=models_dir, mmap_mode=mmap_mode
+            )
+            _serve(worker_models)
+            os.write(write_fd, b"ready")
+            os.read(go_read, 1)  # stay alive until the parent has measured everyone
+            os._exit(0)
+        os.close(write_fd)
+        os.close(go_read)
+        children.append((pid, read_fd, go_write))
+
+    for _, read_fd, _ in children:
+        os.read(read_fd, 5)
+
+    per_worker = [_memory_kb(pid) for pid, _, _ in children]
+
+    for pid, read_fd, go_write in children:
+        os.write(go_write, b"x")
+        os.waitpid(pid, 0)
+        os.close(read_fd)
+        os.close(go_write)
+
+    if preload:
+        gc.unfreeze()
+
+    return {
+        "workers": per_worker,
+        "total_pss_mb": sum(w["pss_kb"] for w in per_worker) / 1024.0,
+        "mean_rss_mb": sum(w["rss_kb"] for w in per_worker) / len(per_worker) / 1024.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--n-estimators", type=int, default=300)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    models_dir = tempfile.mkdtemp(prefix="sdp-models-")
+    for disease, model in train_synthetic_models(n_estimators=args.n_estimators).items():
+        if MODEL_FILES.get(disease):
+            # Uncompressed, so joblib can memory-map the arrays.
+            joblib.dump(model, os.path.join(models_dir, MODEL_FILES[disease]))
+
+    results = {}
+    for mode in ("per-worker", "per-worker+mmap", "preload", "preload+mmap"):
+        # Each mode runs in its own child so earlier modes don't pollute the parent.
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            os.write(write_fd, json.dumps(run(mode, models_dir, args.workers)).encode())
+            os._exit(0)
+        os.close(write_fd)
+        chunks = []
+        while True:
+            chunk = os.read(read_fd, 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        os.close(read_fd)
+        os.waitpid(pid, 0)
+        results[mode] = json.loads(b"".join(chunks))
+
+    report("worker_memory", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+"""
+Benchmark suite for the backend hot paths, offline and reproducible.
+
+Cases (all on small synthetic models with the production feature schemas,
+fixed seeds, and stub LLM/sentiment models):
+
+  features        get_disease_features / FeatureSchema.encode per disease
+  predict         predict_disease_risk with a stub advice generator: cold caches, warm
+                  advice cache, warm prediction result cache
+  shap            explain_with_shap per disease
+  cache           AdviceCache / ChatbotResponseCache get+set under thread contention
+  chat            analyze_and_respond with stub sentiment and chat generators
+  e2e             Flask test-client load on /api/predict and /api/chat
+
+Results are one JSON document with run metadata (versions, CPU count, git
+revision) so runs can be compared; --compare prints per-metric ratios
+against an earlier document.
+
+    python -m benchmarks.suite [--cases predict shap] [--quick] [--output run.json]
+    python -m benchmarks.suite --compare baseline.json --output run.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from services import nlp_service
+from services.cache_service import (
+    AdviceCache,
+    ChatbotResponseCache,
+    advice_cache,
+    chatbot_cache,
+    prediction_cache,
+)
+from services.prediction_service import get_disease_features, get_feature_schema, predict_disease_risk
+from services.xai_service import explain_with_shap
+
+from .common import StubGenerator, report, synthetic_payloads, time_call, train_synthetic_models
+
+DISEASES = ("diabetes", "hypertension", "stroke")
+CHAT_MESSAGES = [
+    "I feel anxious about my exams",
+    "Today was a really good day with friends",
+    "I can't sleep and everything feels heavy",
+    "Work has been stressful but manageable this week",
+]
+
+
+def _stub_sentiment(message, **kwargs):
+    label = "NEGATIVE" if any(w in message.lower() for w in ("anxious", "can't", "stress")) else "POSITIVE"
+    return [{"label": label, "score": 0.9}]
+
+
+@contextlib.contextmanager
+def _chat_generator(generator):
+    """Route analyze_and_respond's Gemini calls to generator for the duration."""
+    saved = nlp_service._gemini_initialized, nlp_service._gemini_model
+    nlp_service._gemini_initialized, nlp_service._gemini_model = True, generator
+    try:
+        yield
+    finally:
+        nlp_service._gemini_initialized, nlp_service._gemini_model = saved
+
+
+def _latency_stats(samples_ms: List[float]) -> Dict[str, float]:
+    samples = np.sort(np.asarray(samples_ms))
+    return {
+        "count": int(len(samples)),
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "p99_ms": float(np.percentile(samples, 99)),
+    }
+
+
+def _concurrent(fn: Callable[[int], Any], threads: int, ops_per_thread: int) -> Dict[str, float]:
+    """Run fn(i) ops_per_thread times on each of threads threads; throughput and latency."""
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def worker(t: int) -> None:
+        local = []
+        for i in range(ops_per_thread):
+            start = time.perf_counter()
+            fn(t * ops_per_thread + i)
+            local.append((time.perf_counter() - start) * 1000.0)
+        with lock:
+            latencies.extend(local)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(threads)))
+    elapsed = time.perf_counter() - start
+
+    stats = _latency_stats(latencies)
+    stats.update({"threads": threads, "ops_per_s": len(latencies) / elapsed})
+    return stats
+
+
+# -----------------------------------------------------------------------------
+# Cases
+# -----------------------------------------------------------------------------
+
+def bench_features(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    results = {}
+    for disease in DISEASES:
+        payloads = ctx["payloads"][disease]
+        schema = get_feature_schema(disease, ctx["models"][disease])
+        it = iter(range(10 ** 9))
+        results[disease] = {
+            "dataframe": time_call(lambda: get_disease_features(disease, payloads[next(it) % len(payloads)]),
+                                   repeat=ctx["repeat"]),
+            "encode": time_call(lambda: schema.encode(payloads[next(it) % len(payloads)]), repeat=ctx["repeat"]),
+        }
+    return results
+
+
+def bench_predict(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    results = {}
+    generator = StubGenerator(latency_s=0.0)
+    for disease in DISEASES:
+        payloads = ctx["payloads"][disease]
+        it = iter(range(10 ** 9))
+
+        def cold():
+            advice_cache.clear()
+            prediction_cache.clear()
+            predict_disease_risk(disease, payloads[next(it) % len(payloads)], ctx["models"], generator)
+
+        def warm_advice():
+            prediction_cache.clear()
+            predict_disease_risk(disease, payloads[0], ctx["models"], generator)
+
+        def warm():
+            predict_disease_risk(disease, payloads[0], ctx["models"], generator)
+
+        results[disease] = {
+            "cold_advice_cache": time_call(cold, repeat=ctx["repeat"]),
+            "warm_advice_cache": time_call(warm_advice, repeat=ctx["repeat"]),
+        }
+        # The result cache is opt-in (SDP_RESULT_CACHE=1); time it switched on.
+        enabled, prediction_cache.enabled = prediction_cache.enabled, True
+        try:
+            results[disease]["warm_result_cache"] = time_call(warm, repeat=ctx["repeat"])
+        finally:
+            prediction_cache.enabled = enabled
+    advice_cache.clear()
+    prediction_cache.clear()
+    return results
+
+
+def bench_shap(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    results = {}
+    for disease in DISEASES:
+        model = ctx["models"][disease]
+        schema = get_feature_schema(disease, model)
+        rows = [schema.encode(p) for p in ctx["payloads"][disease]]
+        it = iter(range(10 ** 9))
+        results[disease] = time_call(
+            lambda: explain_with_shap(model, rows[next(it) % len(rows)], top_k=5, feature_names=schema.columns),
+            repeat=ctx["repeat"],
+        )
+    return results
+
+
+def bench_cache(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """80% reads / 20% writes over a fixed key space, per thread count."""
+    rng = np.random.default_rng(ctx["seed"])
+    explanations = [
+        [{"feature": f"f{j}", "value": float(v)} for j, v in enumerate(rng.integers(0, 50, size=3))]
+        for _ in range(512)
+    ]
+    messages = [f"{CHAT_MESSAGES[i % len(CHAT_MESSAGES)]} {i}" for i in range(512)]
+    ops = max(50, ctx["repeat"] * 10)
+
+    results: Dict[str, Any] = {"advice": {}, "chatbot": {}}
+    for threads in ctx["threads"]:
+        advice = AdviceCache()
+
+        def advice_op(i: int) -> None:
+            explanation = explanations[(i * 7919) % len(explanations)]
+            if i % 5 == 0:
+                advice.set("diabetes", "High", explanation, "advice text " * 20)
+            else:
+                advice.get("diabetes", "High", explanation)
+
+        chat = ChatbotResponseCache()
+
+        def chat_op(i: int) -> None:
+            message = messages[(i * 7919) % len(messages)]
+            if i % 5 == 0:
+                chat.set("NEGATIVE", message, "reply text " * 20)
+            else:
+                chat.get("NEGATIVE", message)
+
+        results["advice"][str(threads)] = _concurrent(advice_op, threads, ops)
+        results["chatbot"][str(threads)] = _concurrent(chat_op, threads, ops)
+    return results
+
+
+def bench_chat(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    nlp_models = {"sentiment_analyzer": _stub_sentiment, "advice_generator": None}
+    it = iter(range(10 ** 9))
+    with _chat_generator(StubGenerator(latency_s=0.0)):
+        def cold():
+            chatbot_cache.clear()
+            nlp_service.analyze_and_respond(CHAT_MESSAGES[next(it) % len(CHAT_MESSAGES)], nlp_models)
+
+        def warm():
+            nlp_service.analyze_and_respond(CHAT_MESSAGES[0], nlp_models)
+
+        results = {
+            "cold_chat_cache": time_call(cold, repeat=ctx["repeat"]),
+            "warm_chat_cache": time_call(warm, repeat=ctx["repeat"]),
+        }
+    chatbot_cache.clear()
+    return results
+
+
+def bench_e2e(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """Concurrent Flask test-client requests against the real routes."""
+    import app as app_module
+
+    flask_app = app_module.create_app()
+    generator = StubGenerator(latency_s=ctx["llm_latency"])
+    flask_app.config["DISEASE_MODELS"] = ctx["models"]
+    flask_app.config["NLP_MODELS"] = {"sentiment_analyzer": _stub_sentiment, "advice_generator": generator}
+    flask_app.config["ADVICE_GENERATOR"] = generator
+
+    payloads = [p for disease in DISEASES for p in ctx["payloads"][disease]]
+    clients = threading.local()
+
+    def client():
+        if not hasattr(clients, "c"):
+            clients.c = flask_app.test_client()
+        return clients.c
+
+    errors = {"predict": 0, "chat": 0}
+
+    def predict_op(i: int) -> None:
+        response = client().post("/api/predict", json=payloads[i % len(payloads)])
+        if response.status_code != 200:
+            errors["predict"] += 1
+
+    def chat_op(i: int) -> None:
+        response = client().post("/api/chat", json={"message": CHAT_MESSAGES[i % len(CHAT_MESSAGES)]})
+        if response.status_code != 200:
+            errors["chat"] += 1
+
+    ops = max(20, ctx["repeat"] * 2)
+    results: Dict[str, Any] = {"llm_latency_s": ctx["llm_latency"], "predict": {}, "chat": {}}
+    with _chat_generator(StubGenerator(latency_s=ctx["llm_latency"])):
+        for threads in ctx["threads"]:
+            advice_cache.clear()
+            chatbot_cache.clear()
+            prediction_cache.clear()
+            results["predict"][str(threads)] = _concurrent(predict_op, threads, ops)
+            results["chat"][str(threads)] = _concurrent(chat_op, threads, ops)
+    results["errors"] = errors
+    advice_cache.clear()
+    chatbot_cache.clear()
+    return results
+
+
+CASES = {
+    "features": bench_features,
+    "predict": bench_predict,
+    "shap": bench_shap,
+    "cache": bench_cache,
+    "chat": bench_chat,
+    "e2e": bench_e2e,
+}
+
+
+# -----------------------------------------------------------------------------
+# Metadata and comparison
+# -----------------------------------------------------------------------------
+
+def _metadata(args) -> Dict[str, Any]:
+    versions = {}
+    for name in ("numpy", "pandas", "sklearn", "xgboost", "shap", "flask"):
+        try:
+            versions[name] = __import__(name).__version__
+        except Exception:
+            versions[name] = None
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        revision = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "versions": versions,
+        "config": {
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "threads": args.threads,
+            "n_estimators": args.n_estimators,
+            "llm_latency": args.llm_latency,
+        },
+    }
+
+
+def _flatten(node: Any, prefix: str = "") -> Dict[str, float]:
+    if isinstance(node, dict):
+        flat = {}
+        for key, value in node.items():
+            flat.update(_flatten(value, f"{prefix}.{key}" if prefix else key))
+        return flat
+    if isinstance(node, (int, float)) and not isinstance(node, bool):
+        return {prefix: float(node)}
+    return {}
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> None:
+    """Print current/baseline ratios for the latency and throughput metrics both runs have."""
+    old = _flatten(baseline["results"]["cases"])
+    new = _flatten(current["results"]["cases"])
+    print(f"{'metric':70s} {'baseline':>12s} {'current':>12s} {'ratio':>8s}")
+    for key in sorted(old.keys() & new.keys()):
+        if not key.endswith(("p50_ms", "p95_ms", "ops_per_s")) or not old[key]:
+            continue
+        print(f"{key:70s} {old[key]:12.3f} {new[key]:12.3f} {new[key] / old[key]:8.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="stub Gemini latency for e2e (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quick", action="store_true", help="repeat=30, threads 1 4")
+    parser.add_argument("--compare", help="earlier suite JSON to compare against")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    if args.quick:
+        args.repeat, args.threads = 30, [1, 4]
+
+    models = train_synthetic_models(n_estimators=args.n_estimators, seed=args.seed)
+    ctx = {
+        "models": models,
+        "payloads": {d: synthetic_payloads(d, 64, seed=args.seed + 1) for d in DISEASES},
+        "repeat": args.repeat,
+        "threads": args.threads,
+        "llm_latency": args.llm_latency,
+        "seed": args.seed,
+    }
+
+    cases = {}
+    for name in args.cases:
+        print(f"[INFO] Running benchmark case: {name}")
+        cases[name] = CASES[name](ctx)
+
+    document = {"metadata": _metadata(args), "cases": cases}
+    report("suite", document, args.output)
+
+    if args.compare:
+        with open(args.compare) as fh:
+            compare(json.load(fh), {"results": document})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Bulk risk scoring for large CSV/Parquet patient files, offline.
+
+    python bulk_score.py --disease diabetes --input brfss.csv --output scores.csv
+    python bulk_score.py --disease stroke --input rows.parquet --output scores.parquet \\
+        --workers 8 --chunk-size 50000 --explain --top-k 3
+
+Rows are read in fixed-size chunks and scored with the same feature schemas
+and models as the API (load_disease_models / get_feature_schema). Feature
+columns may be named like the API payload fields (e.g. "highbp") or like the
+model columns (e.g. "HighBP"). Chunks are scored in a process pool with a
+bounded number in flight and written in input order as they finish, so memory
+stays constant however large the input is.
+
+Output columns: row, [id column], risk_score, risk_label, error, and with
+--explain top{i}_feature / top{i}_value / top{i}_shap for i in 1..top-k.
+Parquet input/output needs pyarrow.
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from services.model_loader import load_disease_models
+from services.prediction_service import SUPPORTED_DISEASES, get_feature_schema, score_features
+
+_worker_models: Any = None
+
+
+def _file_format(path: str, override: Optional[str]) -> str:
+    if override:
+        return override
+    return "parquet" if path.lower().endswith((".parquet", ".pq")) else "csv"
+
+
+def read_chunks(path: str, chunk_size: int, fmt: str) -> Iterator[pd.DataFrame]:
+    if fmt == "csv":
+        yield from pd.read_csv(path, chunksize=chunk_size)
+        return
+
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("[ERROR] Reading Parquet needs pyarrow (pip install pyarrow)")
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+        yield batch.to_pandas()
+
+
+class ChunkWriter:
+    """Appends scored chunks to a CSV or Parquet file."""
+
+    def __init__(self, path: str, fmt: str):
+        self.path = path
+        self.fmt = fmt
+        self._parquet = None
+        self._started = False
+
+    def write(self, frame: pd.DataFrame) -> None:
+        if self.fmt == "csv":
+            frame.to_csv(self.path, mode="a" if self._started else "w", header=not self._started, index=False)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+        self._started = True
+
+    def close(self) -> None:
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def _init_worker(threads: int) -> None:
+    global _worker_models
+    try:
+        from threadpoolctl import threadpool_limits
+
+        threadpool_limits(threads)
+    except ImportError:
+        pass
+    # Forked workers inherit the parent's loaded models; others load them
+    # once here. Chunks then only carry data.
+    if _worker_models is None:
+        _worker_models = load_disease_models(mode="lazy")
+
+
+def score_chunk(disease: str, chunk: pd.DataFrame, start_row: int, explain: bool, top_k: int,
+                id_column: Optional[str] = None, models: Any = None) -> pd.DataFrame:
+    """Score one chunk and return its output frame (one row per input row)."""
+    models = models if models is not None else _worker_models
+    model = models[disease]
+    schema = get_feature_schema(disease, model)
+    features, positions, errors = schema.encode_frame(chunk)
+
+    n = len(chunk)
+    out: Dict[str, Any] = {"row": np.arange(start_row, start_row + n)}
+    if id_column:
+        out[id_column] = chunk[id_column].to_numpy()
+
+    risk_score = np.full(n, np.nan)
+    risk_label = np.full(n, None, dtype=object)
+    error = np.full(n, None, dtype=object)
+    for pos, message in errors.items():
+        error[pos] = message
+
+    explanations = []
+    if len(positions):
+        scores, labels, explanations = score_features(
+            disease, model, features, explain=explain, top_k=top_k, feature_names=schema.columns
+        )
+        risk_score[positions] = scores
+        risk_label[positions] = labels
+
+    out["risk_score"] = risk_score
+    out["risk_label"] = risk_label
+    out["error"] = error
+
+    if explain:
+        for i in range(top_k):
+            feature = np.full(n, None, dtype=object)
+            value = np.full(n, np.nan)
+            shap_value = np.full(n, np.nan)
+            for row, explanation in zip(positions, explanations):
+                if i < len(explanation):
+                    feature[row] = explanation[i]["feature"]
+                    value[row] = explanation[i]["value"]
+                    shap_value[row] = explanation[i].get("shap_value", np.nan)
+            out[f"top{i + 1}_feature"] = feature
+            out[f"top{i + 1}_value"] = value
+            out[f"top{i + 1}_shap"] = shap_value
+
+    return pd.DataFrame(out)
+
+
+def _score_in_worker(args) -> pd.DataFrame:
+    return score_chunk(*args)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    in_fmt = _file_format(args.input, args.input_format)
+    out_fmt = _file_format(args.output, args.output_format)
+    writer = ChunkWriter(args.output, out_fmt)
+
+    global _worker_models
+    _worker_models = load_disease_models(mode="lazy")
+    if _worker_models[args.disease] is None:
+        raise SystemExit(f"[ERROR] Model for '{args.disease}' not loaded")
+
+    rows = errors = chunks = 0
+    start = time.perf_counter()
+
+    def _consume(frame: pd.DataFrame) -> None:
+        nonlocal rows, errors, chunks
+        writer.write(frame)
+        rows += len(frame)
+        errors += int(frame["error"].notna().sum())
+        chunks += 1
+        if chunks % args.log_every == 0:
+            elapsed = time.perf_counter() - start
+            print(f"[INFO] {rows} rows scored ({rows / elapsed:,.0f} rows/s)", file=sys.stderr)
+
+    try:
+        source = read_chunks(args.input, args.chunk_size, in_fmt)
+        offset = 0
+        if args.workers <= 1:
+            for chunk in source:
+                _consume(score_chunk(args.disease, chunk, offset, args.explain, args.top_k, args.id_column))
+                offset += len(chunk)
+        else:
+            threads = max(1, (os.cpu_count() or 1) // args.workers)
+            # At most max_in_flight chunks are read but not yet written.
+            max_in_flight = args.workers * 2
+            pending: deque = deque()
+            with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(threads,)) as pool:
+                for chunk in source:
+                    task = (args.disease, chunk, offset, args.explain, args.top_k, args.id_column)
+                    pending.append(pool.submit(_score_in_worker, task))
+                    offset += len(chunk)
+                    while len(pending) >= max_in_flight:
+                        _consume(pending.popleft().result())
+                while pending:
+                    _consume(pending.popleft().result())
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": rows,
+        "errors": errors,
+        "chunks": chunks,
+        "seconds": elapsed,
+        "rows_per_s": rows / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--disease", required=True, choices=SUPPORTED_DISEASES)
+    parser.add_argument("--input", required=True)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--input-format", choices=("csv", "parquet"))
+    parser.add_argument("--output-format", choices=("csv", "parquet"))
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--explain", action="store_true", help="attach top-k SHAP contributions per row")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--id-column", help="input column copied to the output")
+    parser.add_argument("--log-every", type=int, default=10, help="progress line every N chunks")
+    args = parser.parse_args()
+
+    summary = run(args)
+    print(
+        f"[INFO] Scored {summary['rows']} rows ({summary['errors']} invalid) in "
+        f"{summary['seconds']:.1f}s: {summary['rows_per_s']:,.0f} rows/s -> {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+gunicorn settings for the backend:
+
+    gunicorn -c gunicorn.conf.py app:app
+
+With SDP_PRELOAD=1 (default) the app, and with it every disease model and
+SHAP explainer, is loaded once in the master before workers are forked, so
+the workers share those pages copy-on-write instead of each holding a copy.
+"""
+
+import gc
+import os
+
+bind = os.getenv("SDP_BIND", "0.0.0.0:5001")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+threads = int(os.getenv("SDP_THREADS", "4"))
+preload_app = os.getenv("SDP_PRELOAD", "1") == "1"
+
+# Per-process limits (SHAP pool size, LLM rate) are divided by the worker count.
+os.environ.setdefault("WEB_CONCURRENCY", str(workers))
+
+# Each worker writes its metrics snapshot here so /metrics can merge them.
+os.environ.setdefault(
+    "SDP_METRICS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "metrics")
+)
+
+if preload_app:
+    # Load disease models in the master; lazy loading would defer it to each worker.
+    os.environ.setdefault("SDP_MODEL_LOADING", "eager")
+    # torch's thread pools are not fork-safe, so the sentiment pipeline is
+    # still built in each worker.
+    os.environ.setdefault("SDP_NLP_LOADING", "lazy")
+
+
+def on_starting(server):
+    # Snapshots from a previous run would otherwise be merged into this one.
+    from services.metrics_service import clear_snapshots
+
+    clear_snapshots(os.environ["SDP_METRICS_DIR"])
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far out of the cyclic GC's reach. Otherwise
+    # the first collection in each worker writes to the GC headers of the
+    # model objects and un-shares their pages.
+    gc.freeze()
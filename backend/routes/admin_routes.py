@@ -0,0 +1,59 @@
+import hmac
+import os
+
+from flask import Blueprint, current_app, request, jsonify
+
+admin_bp = Blueprint("admin_bp", __name__)
+
+# Admin endpoints are disabled unless a token is configured.
+ADMIN_TOKEN = os.getenv("SDP_ADMIN_TOKEN", "")
+
+
+def _authorized() -> bool:
+    token = request.headers.get("X-Admin-Token", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+@admin_bp.route("/admin/models", methods=["GET"])
+def models():
+    """
+    GET /admin/models
+
+    Version of every loaded disease model in this worker.
+    """
+    if not _authorized():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify({"pid": os.getpid(), "versions": current_app.config["DISEASE_MODELS"].versions()}), 200
+
+
+@admin_bp.route("/admin/reload", methods=["POST"])
+def reload_models():
+    """
+    POST /admin/reload
+
+    Optional JSON: {"disease": "stroke", "force": false}
+
+    Reloads changed model files in the worker that serves the request and
+    swaps them in once they pass validation; other workers pick the change up
+    through SDP_MODEL_WATCH_SECONDS. Header: X-Admin-Token.
+    """
+    if not _authorized():
+        return jsonify({"error": "Forbidden"}), 403
+
+    try:
+        payload = request.get_json(silent=True) or {}
+        disease = payload.get("disease")
+        results = current_app.config["DISEASE_MODELS"].reload(
+            disease=disease.lower() if isinstance(disease, str) else None,
+            force=bool(payload.get("force", False)),
+        )
+        status = 200 if all(r["status"] != "failed" for r in results.values()) else 409
+        return jsonify({"pid": os.getpid(), "results": results}), status
+
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"[ERROR] /admin/reload failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": "Internal server error"}), 500
@@ -1,6 +1,8 @@
-from flask import Blueprint, current_app, request, jsonify
+import json
 
-from services.nlp_service import analyze_and_respond, get_llm_status
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+
+from services.nlp_service import analyze_and_respond, analyze_and_respond_stream, get_llm_status
 
 chat_bp = Blueprint("chat_bp", __name__)
 
@@ -49,3 +51,63 @@ def chat():
     except Exception as e:
         print(f"[ERROR] /api/chat failed: {e}")
         return jsonify({"error": "Internal server error"}), 500
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@chat_bp.route("/chat/stream", methods=["POST"])
+def chat_stream():
+    """
+    POST /api/chat/stream
+
+    Same body as /api/chat. Replies with Server-Sent Events:
+
+      event: sentiment  {"sentiment": "negative", "confidence": 0.98}
+      event: crisis     {"guidance": "..."}          (only for crisis language)
+      event: chunk      {"text": "..."}              (repeated; cached replies come as one)
+      event: done       same body as /api/chat
+      event: error      {"error": "..."}             (instead of done if streaming fails)
+    """
+    try:
+        data = request.get_json(force=True)
+        message = data.get("message", "").strip()
+    except Exception:
+        return jsonify({"error": "Invalid JSON body"}), 400
+
+    if not message:
+        return jsonify({"error": "Message cannot be empty"}), 400
+
+    events = analyze_and_respond_stream(message, current_app.config["NLP_MODELS"])
+
+    def _generate():
+        try:
+            for event, payload in events:
+                if event == "sentiment":
+                    payload = {
+                        "sentiment": payload["label"].lower(),
+                        "confidence": payload["score"],
+                    }
+                elif event == "done":
+                    # Format response to match /api/chat
+                    payload = {
+                        "response": payload.get("bot_reply", ""),
+                        "sentiment": payload.get("sentiment", {}).get("label", "").lower(),
+                        "confidence": payload.get("sentiment", {}).get("score", 0),
+                    }
+                yield _sse(event, payload)
+        except Exception as e:
+            print(f"[ERROR] /api/chat/stream failed: {e}")
+            yield _sse("error", {"error": "Internal server error"})
+        finally:
+            # On a client disconnect, end the upstream stream now (releasing its
+            # llm_guard admission) rather than whenever the generator is collected.
+            events.close()
+
+    return Response(
+        stream_with_context(_generate()),
+        mimetype="text/event-stream",
+        # Proxies (e.g. nginx) must pass chunks through instead of buffering the reply.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
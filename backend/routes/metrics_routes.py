@@ -0,0 +1,18 @@
+from flask import Blueprint, Response, jsonify, request
+
+from services.metrics_service import metrics
+
+metrics_bp = Blueprint("metrics_bp", __name__)
+
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """
+    GET /metrics
+
+    Per-stage latency histograms and cache gauges, merged across workers, in
+    the Prometheus text format. ?format=json returns p50/p95/p99 per stage.
+    """
+    if request.args.get("format") == "json":
+        return jsonify(metrics.summary()), 200
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
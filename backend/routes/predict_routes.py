@@ -1,10 +1,21 @@
+import math
+import os
+
 from flask import Blueprint, current_app, request, jsonify
 
-from services.prediction_service import predict_disease_risk
+from services.prediction_service import (
+    assess_patient,
+    predict_disease_risk,
+    predict_disease_risk_batch,
+    sweep_disease_risk,
+)
 from services.cache_service import advice_cache, chatbot_cache
+from services.advice_service import deferred_advice
 
 predict_bp = Blueprint("predict_bp", __name__)
 
+MAX_BATCH_RECORDS = int(os.getenv("SDP_MAX_BATCH_RECORDS", "10000"))
+
 
 @predict_bp.route("/predict", methods=["POST"])
 def predict():
@@ -47,6 +58,9 @@ def predict():
       "smoking_status": 1,
       "ever_married": 1
     }
+
+    Optional: "advice_mode": "deferred" returns immediately with the static
+    advice and an "advice_token"; fetch the LLM advice from /api/advice/<token>.
     """
     try:
         payload = request.get_json(force=True)
@@ -66,6 +80,7 @@ def predict():
             payload=payload,
             models=disease_models,
             advice_generator=advice_generator,
+            advice_mode=payload.get("advice_mode"),
         )
 
         return jsonify(prediction_result), 200
@@ -78,3 +93,196 @@ def predict():
         import traceback
         traceback.print_exc()
         return jsonify({"error": "Internal server error"}), 500
+
+
+@predict_bp.route("/advice/<token>", methods=["GET"])
+def advice(token: str):
+    """
+    GET /api/advice/<token>?wait=5
+
+    Returns the deferred advice for a token from /api/predict:
+      200 {"status": "ready", "advice": "..."}      LLM advice is available
+      200 {"status": "fallback", "advice": "..."}   generation failed; static advice
+      202 {"status": "pending", "advice": "..."}    still generating; static advice for now
+      404                                           unknown or expired token
+    "wait" long-polls for up to 10 seconds. Any worker can answer for a token.
+    """
+    try:
+        wait = float(request.args.get("wait", 0))
+    except ValueError:
+        wait = math.nan
+    if not math.isfinite(wait):
+        return jsonify({"error": "'wait' must be a number of seconds"}), 400
+    wait = min(max(wait, 0.0), 10.0)
+
+    status = deferred_advice.status(token, wait_seconds=wait)
+    if status is None:
+        return jsonify({"error": "Unknown or expired advice token"}), 404
+
+    return jsonify(status), 202 if status["status"] == "pending" else 200
+
+
+@predict_bp.route("/predict/batch", methods=["POST"])
+def predict_batch():
+    """
+    POST /api/predict/batch
+
+    Scores many patients in one call. Records may mix diseases; each record
+    uses the same fields as /api/predict and defaults to the top-level
+    "disease" when it has none.
+
+    Expected JSON body:
+    {
+      "disease": "diabetes",
+      "explain": true,
+      "top_k": 5,
+      "records": [
+        {"age": 45, "bmi": 27.3, "highbp": 1, "highchol": 1, "genhlth": 3, "diffwalk": 0},
+        {"disease": "stroke", "age": 50, "hypertension": 1, ...}
+      ]
+    }
+
+    Results are returned in input order; invalid records get
+    {"index": i, "error": "..."} instead of a prediction.
+    """
+    try:
+        payload = request.get_json(force=True)
+        if not isinstance(payload, dict):
+            return jsonify({"error": "Body must be a JSON object"}), 400
+        records = payload.get("records")
+
+        if not isinstance(records, list) or not records:
+            return jsonify({"error": "'records' must be a non-empty list"}), 400
+
+        if len(records) > MAX_BATCH_RECORDS:
+            return jsonify({"error": f"Too many records (max {MAX_BATCH_RECORDS})"}), 400
+
+        explain = payload.get("explain", True)
+        if not isinstance(explain, bool):
+            return jsonify({"error": "'explain' must be true or false"}), 400
+
+        top_k = payload.get("top_k", 5)
+        if isinstance(top_k, bool) or not isinstance(top_k, int) or top_k < 1:
+            return jsonify({"error": "'top_k' must be an integer of at least 1"}), 400
+
+        results = predict_disease_risk_batch(
+            records=records,
+            models=current_app.config["DISEASE_MODELS"],
+            default_disease=str(payload.get("disease", "diabetes")).lower(),
+            explain=explain,
+            top_k=top_k,
+        )
+
+        error_count = sum(1 for r in results if "error" in r)
+        return jsonify({"count": len(results), "error_count": error_count, "results": results}), 200
+
+    except (KeyError, ValueError, AssertionError) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"[ERROR] /api/predict/batch failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": "Internal server error"}), 500
+
+
+@predict_bp.route("/predict/sweep", methods=["POST"])
+def predict_sweep():
+    """
+    POST /api/predict/sweep
+
+    Risk curve (one axis) or surface (two axes) around a base payload, scored
+    in one model call without SHAP or advice.
+
+    Expected JSON body:
+    {
+      "disease": "stroke",
+      "payload": {"age": 50, "hypertension": 1, "heart_disease": 0,
+                  "avg_glucose_level": 150, "bmi": 28.5,
+                  "smoking_status": 1, "ever_married": 1},
+      "sweep": [
+        {"feature": "bmi", "start": 18, "stop": 40, "steps": 100},
+        {"feature": "avg_glucose_level", "values": [80, 120, 160, 200]}
+      ]
+    }
+
+    Returns {"base": {...}, "axes": [...], "shape": [n1, n2],
+    "risk_scores": [[...]], "risk_labels": [[...]], "risk_levels": [...]};
+    risk_labels are indices into risk_levels.
+    """
+    try:
+        body = request.get_json(force=True)
+        if not isinstance(body, dict):
+            return jsonify({"error": "Body must be a JSON object"}), 400
+        disease = str(body.get("disease", "diabetes")).lower()
+        payload = body.get("payload")
+        if not isinstance(payload, dict):
+            return jsonify({"error": "'payload' must be an object"}), 400
+
+        result = sweep_disease_risk(
+            disease=disease,
+            payload=payload,
+            sweep=body.get("sweep"),
+            models=current_app.config["DISEASE_MODELS"],
+        )
+        return jsonify(result), 200
+
+    except (KeyError, ValueError, AssertionError) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"[ERROR] /api/predict/sweep failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": "Internal server error"}), 500
+
+
+@predict_bp.route("/assess", methods=["POST"])
+def assess():
+    """
+    POST /api/assess
+
+    Diabetes, hypertension and stroke risk for one patient in one call.
+    Shared fields are given once; "highbp", "hypertension" and
+    "high_blood_pressure" are interchangeable.
+
+    Expected JSON body:
+    {
+      "age": 50, "bmi": 28.5, "highbp": 1, "highchol": 1, "genhlth": 3,
+      "diffwalk": 0, "sex": 1, "trestbps": 140, "chol": 250, "fbs": 0,
+      "restecg": 1, "exang": 0, "slope": 2, "heart_disease": 0,
+      "avg_glucose_level": 150, "smoking_status": 1, "ever_married": 1,
+      "diseases": ["diabetes", "stroke"],      (optional, default: all that fit)
+      "advice_mode": "deferred"                (optional, as for /api/predict)
+    }
+
+    Returns {"results": {disease: /api/predict result}, "errors": {...},
+    "skipped": {disease: reason}}. Without "diseases", diseases whose fields
+    are missing are skipped; requested ones are reported under "errors".
+    """
+    try:
+        payload = request.get_json(force=True)
+        if not isinstance(payload, dict):
+            return jsonify({"error": "Body must be a JSON object"}), 400
+
+        diseases = payload.get("diseases")
+        if diseases is not None and (not isinstance(diseases, list) or not diseases):
+            return jsonify({"error": "'diseases' must be a non-empty list"}), 400
+
+        assessment = assess_patient(
+            profile=payload,
+            models=current_app.config["DISEASE_MODELS"],
+            advice_generator=current_app.config.get("ADVICE_GENERATOR"),
+            advice_mode=payload.get("advice_mode"),
+            diseases=diseases,
+        )
+
+        if not assessment["results"]:
+            return jsonify(dict(assessment, error="No disease could be assessed from this profile")), 400
+        return jsonify(assessment), 200
+
+    except (KeyError, ValueError, AssertionError) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"[ERROR] /api/assess failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": "Internal server error"}), 500
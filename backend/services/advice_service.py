@@ -0,0 +1,174 @@
+"""
+Deferred advice generation.
+
+In deferred mode /api/predict returns the risk score with the static advice
+and an advice token right away; the LLM advice is generated on a bounded
+background executor and fetched later from /api/advice/<token>.
+
+The poll can land on any gunicorn worker, so job state is kept in the
+SQLite store at SDP_CACHE_PATH (namespace "advice_jobs") shared by every
+worker on the node, whatever SDP_CACHE_BACKEND is.
+"""
+
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from .cache_service import DEFAULT_SQLITE_PATH, CacheBackend, InMemoryCacheBackend, SQLiteCacheBackend
+
+ADVICE_MODE = os.getenv("SDP_ADVICE_MODE", "inline").strip().lower()  # "inline" or "deferred"
+
+# How often a long poll re-reads a job issued by another worker.
+POLL_INTERVAL_S = 0.05
+
+
+def create_job_store(max_results: int) -> CacheBackend:
+    """The shared SQLite job store, or a per-process one if it can't be opened."""
+    path = os.getenv("SDP_CACHE_PATH", DEFAULT_SQLITE_PATH)
+    try:
+        return SQLiteCacheBackend(path, "advice_jobs", max_entries=max_results)
+    except sqlite3.Error as e:
+        print(f"[WARN] Could not open advice job store at {path}: {e}. "
+              "Advice tokens will only resolve on the worker that issued them.")
+        return InMemoryCacheBackend(max_entries=max_results)
+
+
+class DeferredAdviceJobs:
+    """
+    Runs advice generation off the request thread and tracks results by token.
+
+    At most max_pending jobs may be queued or running in this process; beyond
+    that submit() returns None and the caller keeps the static advice. Job
+    state ({"status", "advice"}) is written to store when the job is queued
+    and again when it finishes, kept for ttl_seconds, and at most max_results
+    tokens are remembered.
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 64,
+                 ttl_seconds: float = 900.0, max_results: int = 10000,
+                 store: Optional[CacheBackend] = None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self.max_results = max_results
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.rejected = 0
+        # Jobs running in this process, so a long poll on the issuing worker wakes at once.
+        self._done: Dict[str, threading.Event] = {}
+        self._store = store
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="advice"
+            )
+        return self._executor
+
+    def _get_store(self) -> CacheBackend:
+        if self._store is None:
+            with self.lock:
+                if self._store is None:
+                    self._store = create_job_store(self.max_results)
+        return self._store
+
+    def _write(self, token: str, status: str, advice: str) -> None:
+        self._get_store().set(token, json.dumps({"status": status, "advice": advice}), self.ttl_seconds)
+
+    def _read(self, token: str) -> Optional[Dict[str, Any]]:
+        try:
+            value = self._get_store().get(token)
+        except Exception as e:
+            print(f"[WARN] Advice job store read failed: {e}")
+            return None
+        return json.loads(value) if value is not None else None
+
+    def submit(self, generate: Callable[[], Optional[str]], fallback: str) -> Optional[str]:
+        """Queue generate() and return its token, or None if the queue is full."""
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                return None
+            self.pending += 1
+
+        token = secrets.token_urlsafe(16)
+        try:
+            self._write(token, "pending", fallback)
+        except Exception as e:
+            print(f"[WARN] Advice job store write failed, keeping static advice: {e}")
+            with self.lock:
+                self.pending -= 1
+            return None
+
+        done = threading.Event()
+        with self.lock:
+            self._done[token] = done
+            executor = self._get_executor()
+        executor.submit(self._run, token, done, generate, fallback)
+        return token
+
+    def _run(self, token: str, done: threading.Event, generate: Callable[[], Optional[str]],
+             fallback: str) -> None:
+        advice = None
+        try:
+            advice = generate()
+        except Exception as e:
+            print(f"[WARN] Deferred advice generation failed: {e}")
+        finally:
+            try:
+                if advice is None:
+                    self._write(token, "fallback", fallback)
+                else:
+                    self._write(token, "ready", advice)
+            except Exception as e:
+                print(f"[WARN] Advice job store write failed: {e}")
+            with self.lock:
+                self.pending -= 1
+                self._done.pop(token, None)
+            done.set()
+
+    def status(self, token: str, wait_seconds: float = 0.0) -> Optional[Dict[str, Any]]:
+        """
+        Return {"status": "pending"|"ready"|"fallback", "advice": ...} for token,
+        waiting up to wait_seconds for a pending job. None if token is unknown.
+        """
+        job = self._read(token)
+        if job is None or job["status"] != "pending" or wait_seconds <= 0:
+            return job
+
+        with self.lock:
+            done = self._done.get(token)
+        if done is not None:
+            done.wait(wait_seconds)
+            return self._read(token) or job
+
+        # Issued by another worker: poll the shared store.
+        deadline = time.monotonic() + wait_seconds
+        while job["status"] == "pending":
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(POLL_INTERVAL_S, remaining))
+            job = self._read(token) or job
+        return job
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "pending": self.pending,
+                "rejected": self.rejected,
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+            }
+
+# Global instance
+deferred_advice = DeferredAdviceJobs(
+    max_workers=int(os.getenv("SDP_ADVICE_WORKERS", "4")),
+    max_pending=int(os.getenv("SDP_ADVICE_MAX_PENDING", "64")),
+)
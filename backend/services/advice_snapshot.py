@@ -0,0 +1,122 @@
+"""
+Advice cache snapshots.
+
+warm_advice.py generates advice offline for the most common advice cache
+keys (disease, risk label, top-3 SHAP features) and writes them to a JSON
+snapshot; create_app loads it into advice_cache, so a fresh worker serves
+those keys without calling Gemini.
+
+A snapshot is tagged with the advice prompt version and the version
+(modification time and size, as for hot reloads) of every model file it was
+generated against. Checking it costs one stat() per model, so a worker
+start still doesn't read the model files. A snapshot for a different prompt
+is ignored, and entries for a disease whose model file has changed (or was
+copied without keeping its mtime) are skipped as stale; re-run
+warm_advice.py after either changes.
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from .cache_service import AdviceCache, advice_cache
+from .model_loader import MODEL_FILES, MODELS_DIR, _file_version
+from .prediction_service import _build_advice_prompt
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNAPSHOT_PATH = os.getenv("SDP_ADVICE_SNAPSHOT", os.path.join(BASE_DIR, "cache", "advice_snapshot.json"))
+SNAPSHOT_FORMAT = 2
+
+
+def advice_prompt_version() -> str:
+    """Changes whenever the wording of the advice prompt changes."""
+    template = _build_advice_prompt("{disease}", "{risk}", 0.0, [{"feature": "{feature}", "value": 0.0}])
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:12]
+
+
+def model_versions(models_dir: str = MODELS_DIR,
+                   model_files: Dict[str, Optional[str]] = MODEL_FILES) -> Dict[str, Optional[str]]:
+    """Version of each disease's model file (None if there is none); see model_loader._file_version."""
+    return {
+        disease: _file_version(os.path.join(models_dir, filename)) if filename else None
+        for disease, filename in model_files.items()
+    }
+
+
+def write_snapshot(path: str, entries: List[Dict[str, Any]], versions: Dict[str, Optional[str]]) -> None:
+    """
+    Atomically write entries ({"disease", "risk_label", "factors":
+    [[feature, value], ...], "advice", ...}) with the current version tag.
+    """
+    document = {
+        "format": SNAPSHOT_FORMAT,
+        "created_at": time.time(),
+        "prompt_version": advice_prompt_version(),
+        "model_versions": versions,
+        "entries": entries,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as fh:
+        json.dump(document, fh, indent=1)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path: str) -> Optional[Dict[str, Any]]:
+    """The snapshot document at path, or None if it is missing, unreadable or of another format."""
+    try:
+        with open(path) as fh:
+            document = json.load(fh)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"[WARN] Advice snapshot {path} unreadable: {e}")
+        return None
+    if not isinstance(document, dict) or document.get("format") != SNAPSHOT_FORMAT:
+        print(f"[WARN] Advice snapshot {path} has an unsupported format, ignoring it")
+        return None
+    return document
+
+
+def current_entries(document: Optional[Dict[str, Any]],
+                    versions: Dict[str, Optional[str]]) -> List[Dict[str, Any]]:
+    """Entries of document that are still valid for this prompt and these model files."""
+    if document is None or document.get("prompt_version") != advice_prompt_version():
+        return []
+    generated_for = document.get("model_versions", {})
+    return [
+        entry for entry in document.get("entries", [])
+        if versions.get(entry.get("disease")) is not None
+        and generated_for.get(entry.get("disease")) == versions[entry["disease"]]
+    ]
+
+
+def factors_to_explanation(factors: List[List[Any]]) -> List[Dict[str, Any]]:
+    """Snapshot factors back to the explanation shape advice_cache keys on."""
+    return [{"feature": feature, "value": float(value)} for feature, value in factors]
+
+
+def load_advice_snapshot(cache: AdviceCache = advice_cache, path: str = SNAPSHOT_PATH,
+                         models_dir: str = MODELS_DIR,
+                         model_files: Dict[str, Optional[str]] = MODEL_FILES) -> Dict[str, int]:
+    """Put the snapshot's current entries into cache; returns loaded/stale counts."""
+    document = read_snapshot(path)
+    if document is None:
+        return {"loaded": 0, "stale": 0}
+
+    if document.get("prompt_version") != advice_prompt_version():
+        print(f"[WARN] Advice snapshot {path} was generated for another advice prompt, ignoring it")
+        return {"loaded": 0, "stale": len(document.get("entries", []))}
+
+    entries = current_entries(document, model_versions(models_dir, model_files))
+    for entry in entries:
+        cache.set(entry["disease"], entry["risk_label"], factors_to_explanation(entry["factors"]), entry["advice"])
+
+    stale = len(document.get("entries", [])) - len(entries)
+    if stale:
+        print(f"[WARN] Advice snapshot: skipped {stale} entries generated for other model files")
+    print(f"[INFO] Advice snapshot: loaded {len(entries)} entries from {path}")
+    return {"loaded": len(entries), "stale": stale}
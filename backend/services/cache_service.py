@@ -1,116 +1,633 @@
 """
 Simple in-memory caching service to reduce Gemini API calls.
 Caches advice and responses to avoid hitting quota limits.
+
+Both caches are bounded: entries are kept in LRU order, capped by entry count
+and by an approximate byte budget, and expired entries are swept out
+periodically instead of only when the same key is read again.
+
+Storage is pluggable (SDP_CACHE_BACKEND): "memory" keeps a per-process LRU,
+"sqlite" keeps one WAL-mode SQLite file (SDP_CACHE_PATH) shared by every
+gunicorn worker on the node that also survives restarts.
+
+With SDP_CHAT_SEMANTIC_CACHE=1 the chatbot cache keys on the whole
+normalized message and falls back to a per-process nearest-neighbour
+tier (semantic_cache) for paraphrases.
+
+PredictionResultCache is separate: an optional per-process LRU of model
+outputs for exact repeat inputs, keyed on the model version. It is off
+unless SDP_RESULT_CACHE=1.
 """
 
+import asyncio
 import hashlib
-import json
-from typing import Optional, Dict, Any
-from datetime import datetime, timedelta
+import os
+import sqlite3
+import sys
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Dict, Any
 import threading
 
+from .semantic_cache import SEMANTIC_CACHE, SemanticResponseCache, normalize_message
+
+DEFAULT_SQLITE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "llm_cache.sqlite3"
+)
+
 
 class CacheEntry:
-    """Single cache entry with TTL."""
-    
-    def __init__(self, value: str, ttl_minutes: int = 60):
+    """Single cache entry with TTL, timed on the monotonic clock."""
+
+    __slots__ = ("value", "expires_at", "size")
+
+    def __init__(self, value: str, ttl_seconds: float, size: int):
         self.value = value
-        self.created_at = datetime.now()
-        self.ttl_minutes = ttl_minutes
-    
-    def is_expired(self) -> bool:
+        self.expires_at = time.monotonic() + ttl_seconds
+        self.size = size
+
+    def is_expired(self, now: Optional[float] = None) -> bool:
         """Check if cache entry has expired."""
-        expiry = self.created_at + timedelta(minutes=self.ttl_minutes)
-        return datetime.now() > expiry
+        return (time.monotonic() if now is None else now) > self.expires_at
 
 
-class AdviceCache:
+class CacheBackend(ABC):
     """
-    Thread-safe cache for disease advice.
-    
-    Cache key is generated from: disease + risk_level + top_3_features
-    This way, similar inputs get cached responses.
+    Storage interface behind AdviceCache and ChatbotResponseCache.
+
+    Backends store string values under string keys with a TTL and decide
+    their own eviction; hit/miss accounting stays in the cache front-ends.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """Return the live value for key, or None if missing or expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        """Store value under key for ttl_seconds."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove key if present."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every entry."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Size and eviction counters, reported by the cache front-ends."""
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """
+    Per-process LRU store with TTL expiry, an entry cap and a byte budget.
+    """
+
+    name = "memory"
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        max_bytes: int = 32 * 1024 * 1024,
+        sweep_interval_seconds: float = 60.0,
+    ):
+        self.cache: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self.lock = threading.Lock()
+        self.eviction_count = 0
+        self.expiration_count = 0
+        self.current_bytes = 0
+        self._next_sweep = time.monotonic() + sweep_interval_seconds
+
+    def _remove(self, key: str) -> None:
+        entry = self.cache.pop(key)
+        self.current_bytes -= entry.size
+
+    def _sweep_expired(self, now: float) -> None:
+        """Drop every expired entry. Caller holds the lock."""
+        expired = [k for k, entry in self.cache.items() if entry.is_expired(now)]
+        for key in expired:
+            self._remove(key)
+        self.expiration_count += len(expired)
+        self._next_sweep = now + self.sweep_interval_seconds
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                return None
+            if entry.is_expired():
+                # Remove expired entry
+                self._remove(key)
+                self.expiration_count += 1
+                return None
+            self.cache.move_to_end(key)
+            return entry.value
+
+    def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        size = sys.getsizeof(key) + sys.getsizeof(value)
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            if now >= self._next_sweep:
+                self._sweep_expired(now)
+
+            if key in self.cache:
+                self._remove(key)
+            self.cache[key] = CacheEntry(value, ttl_seconds, size)
+            self.current_bytes += size
+
+            while len(self.cache) > self.max_entries or self.current_bytes > self.max_bytes:
+                oldest = next(iter(self.cache))
+                self._remove(oldest)
+                self.eviction_count += 1
+
+    def delete(self, key: str) -> None:
+        with self.lock:
+            if key in self.cache:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.cache.clear()
+            self.current_bytes = 0
+            self.eviction_count = 0
+            self.expiration_count = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "backend": self.name,
+                "cache_size": len(self.cache),
+                "evictions": self.eviction_count,
+                "expirations": self.expiration_count,
+                "current_bytes": self.current_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    On-disk store shared by every worker process on a node.
+
+    Uses SQLite in WAL mode so readers never block each other or the writer.
+    Entries survive restarts; expiry uses wall-clock time because monotonic
+    clocks are not comparable across processes. Recency is refreshed at most
+    once per touch interval, and expiry/size limits are enforced by an
+    amortized sweep every sweep_every writes.
     """
-    
-    def __init__(self, ttl_minutes: int = 120):
-        self.cache: Dict[str, CacheEntry] = {}
+
+    name = "sqlite"
+
+    def __init__(
+        self,
+        path: str,
+        namespace: str,
+        max_entries: int = 10000,
+        max_bytes: int = 32 * 1024 * 1024,
+        sweep_every: int = 100,
+        touch_interval_seconds: float = 30.0,
+    ):
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_every = sweep_every
+        self.touch_interval_seconds = touch_interval_seconds
+        self.lock = threading.Lock()
+        self.eviction_count = 0
+        self.expiration_count = 0
+        self._writes_since_sweep = 0
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS cache_entries_lru"
+                " ON cache_entries (namespace, accessed_at)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread, reopened after fork."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, expires_at, accessed_at FROM cache_entries"
+            " WHERE namespace = ? AND key = ?",
+            (self.namespace, key),
+        ).fetchone()
+        if row is None:
+            return None
+
+        value, expires_at, accessed_at = row
+        now = time.time()
+        if now > expires_at:
+            conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            )
+            with self.lock:
+                self.expiration_count += 1
+            return None
+
+        if now - accessed_at > self.touch_interval_seconds:
+            conn.execute(
+                "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key),
+            )
+        return value
+
+    def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        size = len(key) + len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries"
+            " (namespace, key, value, size, expires_at, accessed_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (self.namespace, key, value, size, now + ttl_seconds, now),
+        )
+
+        with self.lock:
+            self._writes_since_sweep += 1
+            due = self._writes_since_sweep >= self.sweep_every
+            if due:
+                self._writes_since_sweep = 0
+        if due:
+            self._sweep(conn, now)
+
+    def _sweep(self, conn: sqlite3.Connection, now: float) -> None:
+        """Drop expired entries, then least recently used ones over the limits."""
+        expired = conn.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND expires_at < ?",
+            (self.namespace, now),
+        ).rowcount
+
+        count, total_bytes = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries WHERE namespace = ?",
+            (self.namespace,),
+        ).fetchone()
+
+        evicted = 0
+        if count > self.max_entries or total_bytes > self.max_bytes:
+            rows = conn.execute(
+                "SELECT key, size FROM cache_entries WHERE namespace = ? ORDER BY accessed_at",
+                (self.namespace,),
+            )
+            victims = []
+            for key, size in rows:
+                if count <= self.max_entries and total_bytes <= self.max_bytes:
+                    break
+                victims.append((self.namespace, key))
+                count -= 1
+                total_bytes -= size
+            conn.executemany(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", victims
+            )
+            evicted = len(victims)
+
+        with self.lock:
+            self.expiration_count += expired
+            self.eviction_count += evicted
+
+    def delete(self, key: str) -> None:
+        self._connect().execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+        )
+
+    def clear(self) -> None:
+        self._connect().execute(
+            "DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        )
+        with self.lock:
+            self.eviction_count = 0
+            self.expiration_count = 0
+
+    def stats(self) -> Dict[str, Any]:
+        count, total_bytes = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries WHERE namespace = ?",
+            (self.namespace,),
+        ).fetchone()
+        with self.lock:
+            return {
+                "backend": self.name,
+                "path": self.path,
+                "cache_size": count,
+                "evictions": self.eviction_count,
+                "expirations": self.expiration_count,
+                "current_bytes": total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def create_cache_backend(namespace: str, max_entries: int, max_bytes: int) -> CacheBackend:
+    """
+    Build the backend selected by SDP_CACHE_BACKEND ("memory" or "sqlite").
+
+    The sqlite backend stores every namespace in one file at SDP_CACHE_PATH,
+    shared by all workers on the node.
+    """
+    backend = os.getenv("SDP_CACHE_BACKEND", "memory").strip().lower()
+
+    if backend == "sqlite":
+        path = os.getenv("SDP_CACHE_PATH", DEFAULT_SQLITE_PATH)
+        try:
+            return SQLiteCacheBackend(path, namespace, max_entries=max_entries, max_bytes=max_bytes)
+        except sqlite3.Error as e:
+            print(f"[WARN] Could not open shared cache at {path}: {e}. Using in-memory cache.")
+    elif backend != "memory":
+        print(f"[WARN] Unknown SDP_CACHE_BACKEND '{backend}'. Using in-memory cache.")
+
+    return InMemoryCacheBackend(max_entries=max_entries, max_bytes=max_bytes)
+
+
+class _Flight:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key into one upstream call.
+
+    The first caller for a key runs fn; callers that arrive while it is in
+    flight wait for and share its result (or its exception).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._tasks: Dict[str, "asyncio.Future[Optional[str]]"] = {}
+        self.shared_count = 0
+
+    def do(self, key: str, fn: Callable[[], Optional[str]]) -> Optional[str]:
+        with self.lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.shared_count += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.value
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        """do() for coroutines: concurrent awaits of key on one event loop share one fn() call."""
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        else:
+            with self.lock:
+                self.shared_count += 1
+        # A caller that is cancelled (client gone) doesn't cancel the shared call.
+        return await asyncio.shield(task)
+
+
+class _LLMResponseCache:
+    """
+    Hit/miss accounting in front of a CacheBackend.
+
+    Subclasses only decide how keys are built.
+    """
+
+    def __init__(self, namespace: str, ttl_minutes: int, max_entries: int, max_bytes: int,
+                 backend: Optional[CacheBackend] = None):
         self.ttl_minutes = ttl_minutes
+        self.backend = backend or create_cache_backend(namespace, max_entries, max_bytes)
         self.lock = threading.Lock()
         self.hit_count = 0
         self.miss_count = 0
-    
+        self._flight = SingleFlight()
+
+    def _get_key(self, key: str) -> Optional[str]:
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            print(f"[WARN] Cache backend read failed: {e}")
+            value = None
+
+        with self.lock:
+            if value is not None:
+                self.hit_count += 1
+            else:
+                self.miss_count += 1
+        return value
+
+    def _set_key(self, key: str, value: str) -> None:
+        try:
+            self.backend.set(key, value, self.ttl_minutes * 60.0)
+        except Exception as e:
+            print(f"[WARN] Cache backend write failed: {e}")
+
+    def _get_or_generate_key(self, key: str, generate: Callable[[], Optional[str]],
+                             similar: Optional[Callable[[], Optional[str]]] = None,
+                             on_generated: Optional[Callable[[str], None]] = None) -> Optional[str]:
+        """
+        Return the cached value for key, or generate and cache it.
+
+        Concurrent misses on the same key share one generate() call. A None
+        result is not cached; exceptions from generate() reach every waiter.
+        similar() is consulted after an exact miss (its hit is copied under
+        key); on_generated() sees every newly generated value.
+        """
+        cached = self._get_key(key)
+        if cached is None and similar is not None:
+            cached = similar()
+            if cached is not None:
+                self._set_key(key, cached)
+        if cached is not None:
+            return cached
+
+        def _load() -> Optional[str]:
+            value = generate()
+            if value is not None:
+                self._set_key(key, value)
+                if on_generated is not None:
+                    on_generated(value)
+            return value
+
+        return self._flight.do(key, _load)
+
+    async def _get_or_generate_key_async(
+        self, key: str, generate: Callable[[], Awaitable[Optional[str]]],
+        similar: Optional[Callable[[], Optional[str]]] = None,
+        on_generated: Optional[Callable[[str], None]] = None,
+    ) -> Optional[str]:
+        """
+        _get_or_generate_key for asyncio callers: generate() is awaited, not
+        run on a thread. Backend reads and writes (SQLite I/O with
+        SDP_CACHE_BACKEND=sqlite), similar() and on_generated() (CPU-bound)
+        run on the default executor.
+        """
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(None, self._get_key, key)
+        if cached is None and similar is not None:
+            cached = await loop.run_in_executor(None, similar)
+            if cached is not None:
+                await loop.run_in_executor(None, self._set_key, key, cached)
+        if cached is not None:
+            return cached
+
+        async def _load() -> Optional[str]:
+            value = await generate()
+            if value is not None:
+                await loop.run_in_executor(None, self._set_key, key, value)
+                if on_generated is not None:
+                    await loop.run_in_executor(None, on_generated, value)
+            return value
+
+        return await self._flight.do_async(key, _load)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        with self.lock:
+            hits, misses = self.hit_count, self.miss_count
+        total = hits + misses
+        hit_rate = (hits / total * 100) if total > 0 else 0
+
+        stats = {
+            "hit_count": hits,
+            "miss_count": misses,
+            "hit_rate": f"{hit_rate:.1f}%",
+            "total_requests": total,
+            "coalesced_requests": self._flight.shared_count,
+        }
+        stats.update(self.backend.stats())
+        return stats
+
+    def clear(self) -> None:
+        """Clear all cache entries."""
+        self.backend.clear()
+        with self.lock:
+            self.hit_count = 0
+            self.miss_count = 0
+        self._flight.shared_count = 0
+
+
+class AdviceCache(_LLMResponseCache):
+    """
+    Thread-safe cache for disease advice.
+
+    Cache key is generated from: disease + risk_level + top_3_features
+    This way, similar inputs get cached responses.
+    """
+
+    def __init__(self, ttl_minutes: int = 120, max_entries: int = 5000, max_bytes: int = 16 * 1024 * 1024,
+                 backend: Optional[CacheBackend] = None):
+        super().__init__("advice", ttl_minutes, max_entries, max_bytes, backend=backend)
+
     def _generate_key(self, disease: str, risk_level: str, explanation: list) -> str:
         """Generate cache key from disease, risk level, and top features."""
         # Use only top 3 features for consistency
         features_str = "|".join([
-            f"{e['feature']}:{e['value']:.1f}" 
+            f"{e['feature']}:{e['value']:.1f}"
             for e in explanation[:3]
         ])
-        
+
         key_str = f"{disease}_{risk_level}_{features_str}"
         # Hash to keep key reasonable length
         return hashlib.md5(key_str.encode()).hexdigest()
-    
+
     def get(self, disease: str, risk_level: str, explanation: list) -> Optional[str]:
         """Retrieve cached advice if exists and not expired."""
-        key = self._generate_key(disease, risk_level, explanation)
-        
-        with self.lock:
-            if key in self.cache:
-                entry = self.cache[key]
-                if not entry.is_expired():
-                    self.hit_count += 1
-                    return entry.value
-                else:
-                    # Remove expired entry
-                    del self.cache[key]
-            
-            self.miss_count += 1
-            return None
-    
+        return self._get_key(self._generate_key(disease, risk_level, explanation))
+
     def set(self, disease: str, risk_level: str, explanation: list, value: str) -> None:
         """Store advice in cache."""
-        key = self._generate_key(disease, risk_level, explanation)
-        
-        with self.lock:
-            self.cache[key] = CacheEntry(value, self.ttl_minutes)
-    
-    def get_stats(self) -> Dict[str, Any]:
-        """Get cache statistics."""
-        total = self.hit_count + self.miss_count
-        hit_rate = (self.hit_count / total * 100) if total > 0 else 0
-        
-        return {
-            "cache_size": len(self.cache),
-            "hit_count": self.hit_count,
-            "miss_count": self.miss_count,
-            "hit_rate": f"{hit_rate:.1f}%",
-            "total_requests": total
-        }
-    
-    def clear(self) -> None:
-        """Clear all cache entries."""
-        with self.lock:
-            self.cache.clear()
-            self.hit_count = 0
-            self.miss_count = 0
+        self._set_key(self._generate_key(disease, risk_level, explanation), value)
 
+    def get_or_generate(
+        self, disease: str, risk_level: str, explanation: list, generate: Callable[[], Optional[str]]
+    ) -> Optional[str]:
+        """Cached advice, or generate() it once for all concurrent callers with this key."""
+        return self._get_or_generate_key(self._generate_key(disease, risk_level, explanation), generate)
 
-class ChatbotResponseCache:
+    async def get_or_generate_async(
+        self, disease: str, risk_level: str, explanation: list,
+        generate: Callable[[], Awaitable[Optional[str]]],
+    ) -> Optional[str]:
+        """get_or_generate with an async generate()."""
+        return await self._get_or_generate_key_async(
+            self._generate_key(disease, risk_level, explanation), generate
+        )
+
+
+class ChatbotResponseCache(_LLMResponseCache):
     """
     Thread-safe cache for chatbot responses.
-    
+
     Cache key is generated from: sentiment + message_keywords
     Similar conversations get similar responses.
+
+    With a semantic tier the key is sentiment + the whole normalized message
+    instead (no keyword collisions between unrelated messages), and an exact
+    miss is looked up by embedding similarity within the same sentiment.
+    Callers pass similar=False for messages whose reply must not be shared
+    (crisis language).
     """
-    
-    def __init__(self, ttl_minutes: int = 240):
-        self.cache: Dict[str, CacheEntry] = {}
-        self.ttl_minutes = ttl_minutes
-        self.lock = threading.Lock()
-        self.hit_count = 0
-        self.miss_count = 0
-    
+
+    def __init__(self, ttl_minutes: int = 240, max_entries: int = 10000, max_bytes: int = 32 * 1024 * 1024,
+                 backend: Optional[CacheBackend] = None, semantic: Optional[SemanticResponseCache] = None):
+        super().__init__("chatbot", ttl_minutes, max_entries, max_bytes, backend=backend)
+        self.semantic = semantic
+
     def _get_keywords(self, text: str) -> str:
         """Extract keywords for fuzzy matching."""
         # Convert to lowercase and get words
@@ -119,57 +636,204 @@ class ChatbotResponseCache:
         keywords = [w for w in words if len(w) > 3]
         # Sort for consistency
         return "|".join(sorted(keywords[:5]))
-    
+
     def _generate_key(self, sentiment: str, message: str) -> str:
-        """Generate cache key from sentiment and message keywords."""
-        keywords = self._get_keywords(message)
-        key_str = f"{sentiment}_{keywords}"
+        """Generate cache key from sentiment and message keywords (or the whole message)."""
+        if self.semantic is not None:
+            key_str = f"{sentiment}_{normalize_message(message)}"
+        else:
+            keywords = self._get_keywords(message)
+            key_str = f"{sentiment}_{keywords}"
         return hashlib.md5(key_str.encode()).hexdigest()
-    
-    def get(self, sentiment: str, message: str) -> Optional[str]:
+
+    def _semantic_hooks(self, sentiment: str, message: str, similar: bool):
+        if self.semantic is None or not similar:
+            return None, None
+        return (
+            lambda: self.semantic.lookup(sentiment, message),
+            lambda value: self.semantic.store(sentiment, message, value),
+        )
+
+    def get(self, sentiment: str, message: str, similar: bool = True) -> Optional[str]:
         """Retrieve cached response if exists and not expired."""
         key = self._generate_key(sentiment, message)
-        
+        value = self._get_key(key)
+        lookup, _ = self._semantic_hooks(sentiment, message, similar)
+        if value is None and lookup is not None:
+            value = lookup()
+            if value is not None:
+                self._set_key(key, value)
+        return value
+
+    def set(self, sentiment: str, message: str, value: str, similar: bool = True) -> None:
+        """Store response in cache."""
+        self._set_key(self._generate_key(sentiment, message), value)
+        _, store = self._semantic_hooks(sentiment, message, similar)
+        if store is not None:
+            store(value)
+
+    def get_or_generate(
+        self, sentiment: str, message: str, generate: Callable[[], Optional[str]], similar: bool = True
+    ) -> Optional[str]:
+        """Cached response, or generate() it once for all concurrent callers with this key."""
+        lookup, store = self._semantic_hooks(sentiment, message, similar)
+        return self._get_or_generate_key(self._generate_key(sentiment, message), generate, lookup, store)
+
+    async def get_or_generate_async(
+        self, sentiment: str, message: str, generate: Callable[[], Awaitable[Optional[str]]],
+        similar: bool = True,
+    ) -> Optional[str]:
+        """get_or_generate with an async generate()."""
+        lookup, store = self._semantic_hooks(sentiment, message, similar)
+        return await self._get_or_generate_key_async(
+            self._generate_key(sentiment, message), generate, lookup, store
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        if self.semantic is not None:
+            stats.update(self.semantic.get_stats())
+        return stats
+
+    def clear(self) -> None:
+        super().clear()
+        if self.semantic is not None:
+            self.semantic.clear()
+
+
+def model_version(model: Any) -> str:
+    """
+    Version tag of a loaded model: the file stamp model_loader records at load,
+    or the object's identity for models that were not loaded from a file.
+    """
+    version = getattr(model, "_sdp_model_version", None)
+    return version if version is not None else f"id-{id(model):x}"
+
+
+def _version_mtime(version: Optional[str]) -> Optional[int]:
+    # File versions are "<mtime_ns hex>-<size hex>" (model_loader._file_version).
+    try:
+        return int(version.split("-", 1)[0], 16)
+    except (AttributeError, ValueError):
+        return None
+
+
+def is_newer_version(candidate: Optional[str], current: Optional[str]) -> bool:
+    """
+    Whether candidate should replace current. File versions compare by
+    modification time, so a model that was swapped out never counts as newer
+    than its replacement; any other change of version counts as newer.
+    """
+    if candidate == current:
+        return False
+    if current is None:
+        return True
+    candidate_mtime, current_mtime = _version_mtime(candidate), _version_mtime(current)
+    if candidate_mtime is None or current_mtime is None:
+        return True
+    return candidate_mtime >= current_mtime
+
+
+class PredictionResultCache:
+    """
+    Per-process LRU of (risk_score, risk_label, explanation) keyed on disease,
+    model version and the exact encoded feature vector.
+
+    Predictions are deterministic for a given model and input, so entries
+    never expire; they are evicted by LRU, and a disease's entries are dropped
+    as soon as a newer model version is seen for it. Requests still running on
+    an older model after a hot swap bypass the cache.
+    """
+
+    def __init__(self, max_entries: int = 10000, enabled: bool = True):
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.versions: Dict[str, str] = {}
+        self.lock = threading.Lock()
+        self.hit_count = 0
+        self.miss_count = 0
+        self.eviction_count = 0
+        self.invalidation_count = 0
+
+    def _key(self, disease: str, model: Any, features) -> Optional[tuple]:
+        """Key for this input, or None if model is older than the disease's current version."""
+        version = model_version(model)
         with self.lock:
-            if key in self.cache:
-                entry = self.cache[key]
-                if not entry.is_expired():
-                    self.hit_count += 1
-                    return entry.value
-                else:
+            current = self.versions.get(disease)
+            if version != current:
+                if not is_newer_version(version, current):
+                    return None
+                stale = [key for key in self.cache if key[0] == disease]
+                for key in stale:
                     del self.cache[key]
-            
-            self.miss_count += 1
+                self.invalidation_count += len(stale)
+                self.versions[disease] = version
+        return (disease, version, features.dtype.str, features.tobytes())
+
+    def get(self, disease: str, model: Any, features) -> Optional[tuple]:
+        """Cached (risk_score, risk_label, explanation) for this input, or None."""
+        if not self.enabled:
             return None
-    
-    def set(self, sentiment: str, message: str, value: str) -> None:
-        """Store response in cache."""
-        key = self._generate_key(sentiment, message)
-        
+        key = self._key(disease, model, features)
         with self.lock:
-            self.cache[key] = CacheEntry(value, self.ttl_minutes)
-    
-    def get_stats(self) -> Dict[str, Any]:
-        """Get cache statistics."""
-        total = self.hit_count + self.miss_count
-        hit_rate = (self.hit_count / total * 100) if total > 0 else 0
-        
-        return {
-            "cache_size": len(self.cache),
-            "hit_count": self.hit_count,
-            "miss_count": self.miss_count,
-            "hit_rate": f"{hit_rate:.1f}%",
-            "total_requests": total
-        }
-    
+            entry = self.cache.get(key) if key is not None else None
+            if entry is None:
+                self.miss_count += 1
+                return None
+            self.cache.move_to_end(key)
+            self.hit_count += 1
+        risk_score, risk_label, explanation = entry
+        # Callers may mutate the explanation dicts; hand out copies.
+        return risk_score, risk_label, [dict(e) for e in explanation]
+
+    def set(self, disease: str, model: Any, features, risk_score: float, risk_label: str,
+            explanation: list) -> None:
+        if not self.enabled:
+            return
+        key = self._key(disease, model, features)
+        if key is None:
+            return
+        with self.lock:
+            self.cache[key] = (risk_score, risk_label, [dict(e) for e in explanation])
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+                self.eviction_count += 1
+
     def clear(self) -> None:
-        """Clear all cache entries."""
         with self.lock:
             self.cache.clear()
+            self.versions.clear()
             self.hit_count = 0
             self.miss_count = 0
+            self.eviction_count = 0
+            self.invalidation_count = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            hits, misses = self.hit_count, self.miss_count
+            total = hits + misses
+            return {
+                "enabled": self.enabled,
+                "hit_count": hits,
+                "miss_count": misses,
+                "hit_rate": f"{(hits / total * 100) if total > 0 else 0:.1f}%",
+                "total_requests": total,
+                "cache_size": len(self.cache),
+                "evictions": self.eviction_count,
+                "invalidations": self.invalidation_count,
+                "max_entries": self.max_entries,
+            }
 
 
 # Global cache instances
 advice_cache = AdviceCache(ttl_minutes=120)  # 2 hours for advice
-chatbot_cache = ChatbotResponseCache(ttl_minutes=240)  # 4 hours for chatbot
+chatbot_cache = ChatbotResponseCache(
+    ttl_minutes=240,  # 4 hours for chatbot
+    semantic=SemanticResponseCache(ttl_seconds=240 * 60.0) if SEMANTIC_CACHE else None,
+)
+prediction_cache = PredictionResultCache(
+    max_entries=int(os.getenv("SDP_RESULT_CACHE_SIZE", "10000")),
+    enabled=os.getenv("SDP_RESULT_CACHE", "0") == "1",  # opt-in
+)
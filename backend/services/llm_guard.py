@@ -0,0 +1,267 @@
+"""
+Guard in front of every upstream LLM (Gemini) call: advice generation in
+prediction_service and chat replies in nlp_service share one instance.
+
+- Token bucket: at most SDP_LLM_RATE_PER_MIN calls per minute, with bursts
+  of SDP_LLM_BURST, across the deployment: each of the WEB_CONCURRENCY web
+  workers gets its share. A call without a token fails at once instead of
+  queueing, so it gets the fallback immediately.
+- Deadlines: each call gets a timeout adapted to recent latencies (a
+  multiple of their p95, between SDP_LLM_TIMEOUT_MIN_S and
+  SDP_LLM_TIMEOUT_MAX_S).
+- Circuit breaker: after SDP_LLM_BREAKER_FAILURES consecutive failures, or
+  one quota error, calls skip the upstream entirely for
+  SDP_LLM_BREAKER_COOLDOWN_S; then a single probe call is let through
+  (half-open) and its outcome closes or re-opens the circuit.
+
+Callers catch LLMUnavailable and take their fallback path.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import numpy as np
+
+# The bucket lives in one process; split the configured quota between the
+# web workers (WEB_CONCURRENCY, exported by gunicorn.conf.py).
+WEB_WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+RATE_PER_MIN = float(os.getenv("SDP_LLM_RATE_PER_MIN", "60")) / WEB_WORKERS  # 0 = no limit
+BURST = max(1, int(os.getenv("SDP_LLM_BURST", "10")) // WEB_WORKERS)
+TIMEOUT_MIN_S = float(os.getenv("SDP_LLM_TIMEOUT_MIN_S", "2"))
+TIMEOUT_MAX_S = float(os.getenv("SDP_LLM_TIMEOUT_MAX_S", "15"))
+TIMEOUT_P95_FACTOR = float(os.getenv("SDP_LLM_TIMEOUT_P95_FACTOR", "2"))
+BREAKER_FAILURES = int(os.getenv("SDP_LLM_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN_S = float(os.getenv("SDP_LLM_BREAKER_COOLDOWN_S", "30"))
+MAX_CONCURRENCY = int(os.getenv("SDP_LLM_MAX_CONCURRENCY", "32"))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Error text of quota / rate-limit responses (google.api_core ResourceExhausted, HTTP 429).
+_QUOTA_MARKERS = ("429", "quota", "resource exhausted", "resourceexhausted", "rate limit")
+
+T = TypeVar("T")
+
+
+class LLMUnavailable(Exception):
+    """The call was not made, or was abandoned: reason is rate_limited, circuit_open or timeout."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"LLM unavailable: {reason}")
+        self.reason = reason
+
+
+def _is_quota_error(error: BaseException) -> bool:
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in _QUOTA_MARKERS)
+
+
+class LLMGuard:
+    """Rate limit, deadline and circuit breaker for one upstream."""
+
+    def __init__(
+        self,
+        rate_per_min: float = RATE_PER_MIN,
+        burst: int = BURST,
+        timeout_min_s: float = TIMEOUT_MIN_S,
+        timeout_max_s: float = TIMEOUT_MAX_S,
+        timeout_p95_factor: float = TIMEOUT_P95_FACTOR,
+        breaker_failures: int = BREAKER_FAILURES,
+        breaker_cooldown_s: float = BREAKER_COOLDOWN_S,
+        max_concurrency: int = MAX_CONCURRENCY,
+    ):
+        self.rate_per_s = max(0.0, rate_per_min) / 60.0
+        self.burst = max(1, burst)
+        self.timeout_min_s = timeout_min_s
+        self.timeout_max_s = max(timeout_min_s, timeout_max_s)
+        self.timeout_p95_factor = timeout_p95_factor
+        self.breaker_failures = max(1, breaker_failures)
+        self.breaker_cooldown_s = breaker_cooldown_s
+        self.max_concurrency = max(1, max_concurrency)
+        self.lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.tokens = float(self.burst)
+            self._refilled_at = time.monotonic()
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = 0.0
+            self._probe_in_flight = False
+            self._latencies: "deque[float]" = deque(maxlen=100)
+            self.calls = 0
+            self.successes = 0
+            self.failures = 0
+            self.timeouts = 0
+            self.rate_limited = 0
+            self.short_circuited = 0
+            self.last_error: Optional[str] = None
+
+    # -- admission ---------------------------------------------------------
+
+    def timeout_s(self) -> float:
+        """Deadline for the next call: a multiple of recent p95 latency, clamped."""
+        with self.lock:
+            samples = list(self._latencies)
+        if len(samples) < 10:
+            return self.timeout_max_s
+        p95 = float(np.percentile(samples, 95))
+        return min(self.timeout_max_s, max(self.timeout_min_s, p95 * self.timeout_p95_factor))
+
+    def acquire(self) -> bool:
+        """
+        Admit one call or raise LLMUnavailable. Returns True if the call is
+        the half-open probe. Every admitted call must be followed by
+        record_success() or record_failure().
+        """
+        now = time.monotonic()
+        with self.lock:
+            probe = False
+            if self.state == OPEN:
+                if now - self.opened_at < self.breaker_cooldown_s:
+                    self.short_circuited += 1
+                    raise LLMUnavailable("circuit_open")
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN:
+                if self._probe_in_flight:
+                    self.short_circuited += 1
+                    raise LLMUnavailable("circuit_open")
+                probe = True
+
+            if self.rate_per_s > 0:
+                self.tokens = min(float(self.burst), self.tokens + (now - self._refilled_at) * self.rate_per_s)
+                self._refilled_at = now
+                if self.tokens < 1.0:
+                    self.rate_limited += 1
+                    raise LLMUnavailable("rate_limited")
+                self.tokens -= 1.0
+
+            if probe:
+                self._probe_in_flight = True
+            self.calls += 1
+            return probe
+
+    def record_success(self, latency_s: float) -> None:
+        with self.lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self._latencies.append(latency_s)
+            if self.state != CLOSED:
+                print("[INFO] LLM circuit closed: probe call succeeded")
+            self.state = CLOSED
+            self._probe_in_flight = False
+
+    def record_failure(self, error: BaseException) -> None:
+        with self.lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = f"{type(error).__name__}: {str(error)[:200]}"
+            trip = (
+                self.state == HALF_OPEN
+                or self.consecutive_failures >= self.breaker_failures
+                or _is_quota_error(error)
+            )
+            if trip and self.state != OPEN:
+                print(f"[WARN] LLM circuit open for {self.breaker_cooldown_s:g}s after: {self.last_error}")
+            if trip:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def release(self) -> None:
+        """End an admitted call without an outcome (e.g. the client went away mid-stream)."""
+        with self.lock:
+            self._probe_in_flight = False
+
+    # -- calls -------------------------------------------------------------
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self.lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_concurrency, thread_name_prefix="llm-call"
+                    )
+        return self._executor
+
+    def call(self, fn: Callable[[], T]) -> T:
+        """
+        Run fn() under the guard. Raises LLMUnavailable when not admitted or
+        past the deadline (fn keeps running on its thread but its result is
+        dropped), and re-raises fn's own exceptions.
+        """
+        self.acquire()
+        timeout = self.timeout_s()
+        started = time.perf_counter()
+        future = self._get_executor().submit(fn)
+        try:
+            result = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            with self.lock:
+                self.timeouts += 1
+            self.record_failure(TimeoutError(f"no response within {timeout:.1f}s"))
+            raise LLMUnavailable("timeout")
+        except BaseException as e:
+            self.record_failure(e)
+            raise
+        self.record_success(time.perf_counter() - started)
+        return result
+
+    async def call_async(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """call() for coroutines: the deadline cancels the awaited call."""
+        self.acquire()
+        timeout = self.timeout_s()
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(fn(), timeout)
+        except asyncio.TimeoutError:
+            with self.lock:
+                self.timeouts += 1
+            self.record_failure(TimeoutError(f"no response within {timeout:.1f}s"))
+            raise LLMUnavailable("timeout")
+        except asyncio.CancelledError:
+            # The caller went away (client disconnect, shutdown); not the upstream's fault.
+            self.release()
+            raise
+        except BaseException as e:
+            self.record_failure(e)
+            raise
+        self.record_success(time.perf_counter() - started)
+        return result
+
+    # -- reporting ---------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        timeout = self.timeout_s()
+        with self.lock:
+            state = self.state
+            if state == OPEN and time.monotonic() - self.opened_at >= self.breaker_cooldown_s:
+                state = HALF_OPEN
+            return {
+                "state": state,
+                "state_code": _STATE_CODES[state],
+                "consecutive_failures": self.consecutive_failures,
+                "tokens": round(min(float(self.burst), self.tokens + (time.monotonic() - self._refilled_at) * self.rate_per_s), 2)
+                if self.rate_per_s > 0 else None,
+                "rate_per_min": self.rate_per_s * 60.0,
+                "timeout_s": round(timeout, 3),
+                "calls": self.calls,
+                "successes": self.successes,
+                "failures": self.failures,
+                "timeouts": self.timeouts,
+                "rate_limited": self.rate_limited,
+                "short_circuited": self.short_circuited,
+                "last_error": self.last_error,
+            }
+
+
+# Global instance
+llm_guard = LLMGuard()
@@ -0,0 +1,390 @@
+"""
+In-process latency metrics for the prediction and chat pipelines.
+
+Each stage (features, predict, explain, advice, llm, ...) is timed into a
+fixed-bucket histogram keyed by (pipeline, disease, stage). Fixed buckets
+make histograms from different gunicorn workers mergeable by summing them:
+with SDP_METRICS_DIR set, every process periodically writes a JSON snapshot
+there and /metrics merges all of them. Quantiles (p50/p95/p99) are estimated
+from the merged buckets.
+
+Cache, advice-queue and LLM-guard stats are folded in as gauges through collectors.
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+METRICS_ENABLED = os.getenv("SDP_METRICS", "1") == "1"
+# Shared directory for per-worker snapshots; unset means single-process metrics.
+METRICS_DIR = os.getenv("SDP_METRICS_DIR", "").strip() or None
+METRICS_FLUSH_SECONDS = float(os.getenv("SDP_METRICS_FLUSH_SECONDS", "5"))
+
+# Upper bounds in seconds, from sub-millisecond feature encoding up to LLM calls.
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+QUANTILES = (0.5, 0.95, 0.99)
+
+HistogramKey = Tuple[str, str, str]  # (pipeline, disease, stage)
+
+
+class LatencyHistogram:
+    """Bucket counts (the last one is +Inf), sum and count of observations."""
+
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, counts: Optional[List[int]] = None, total: float = 0.0, count: int = 0):
+        self.counts = counts if counts is not None else [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = total
+        self.count = count
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.total += other.total
+        self.count += other.count
+
+    def quantile(self, q: float) -> float:
+        """Estimate the q-quantile by linear interpolation inside its bucket."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            if n and cumulative + n >= rank:
+                if i == len(LATENCY_BUCKETS):
+                    return LATENCY_BUCKETS[-1]
+                lower = LATENCY_BUCKETS[i - 1] if i > 0 else 0.0
+                return lower + (LATENCY_BUCKETS[i] - lower) * (rank - cumulative) / n
+            cumulative += n
+        return LATENCY_BUCKETS[-1]
+
+    def to_list(self) -> List[Any]:
+        return [list(self.counts), self.total, self.count]
+
+    @classmethod
+    def from_list(cls, data: List[Any]) -> "LatencyHistogram":
+        return cls(list(data[0]), float(data[1]), int(data[2]))
+
+
+class _StageTimer:
+    __slots__ = ("registry", "key", "start")
+
+    def __init__(self, registry: "MetricsRegistry", key: HistogramKey):
+        self.registry = registry
+        self.key = key
+
+    def __enter__(self) -> "_StageTimer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.registry.observe(*self.key, time.perf_counter() - self.start)
+
+
+class _Collector:
+    __slots__ = ("prefix", "labels", "fn", "max_keys")
+
+    def __init__(self, prefix: str, labels: Dict[str, str], fn: Callable[[], Dict[str, Any]],
+                 max_keys: Iterable[str]):
+        self.prefix = prefix
+        self.labels = labels
+        self.fn = fn
+        self.max_keys = set(max_keys)
+
+
+class MetricsRegistry:
+    """
+    Stage histograms and gauge collectors for this process.
+
+    observe()/timer() take a single lock around a few integer updates, so
+    they are cheap enough to leave on in production.
+    """
+
+    def __init__(self, enabled: bool = METRICS_ENABLED, metrics_dir: Optional[str] = METRICS_DIR,
+                 flush_seconds: float = METRICS_FLUSH_SECONDS):
+        self.enabled = enabled
+        self.metrics_dir = metrics_dir
+        self.flush_seconds = flush_seconds
+        self.lock = threading.Lock()
+        self._histograms: Dict[HistogramKey, LatencyHistogram] = {}
+        self._collectors: List[_Collector] = []
+        self._flusher_pid: Optional[int] = None
+
+    # -- recording ---------------------------------------------------------
+
+    def observe(self, pipeline: str, disease: str, stage: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        key = (pipeline, disease, stage)
+        with self.lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.observe(seconds)
+        if self.metrics_dir and self._flusher_pid != os.getpid():
+            self._start_flusher()
+
+    def timer(self, pipeline: str, disease: str, stage: str) -> _StageTimer:
+        """Context manager that records the duration of its block."""
+        return _StageTimer(self, (pipeline, disease, stage))
+
+    def register_collector(self, prefix: str, labels: Dict[str, str],
+                           fn: Callable[[], Dict[str, Any]], max_keys: Iterable[str] = ()) -> None:
+        """
+        Export the numeric values of fn() as gauges named <prefix>_<key>.
+
+        Across workers values are summed, except max_keys, which take the max
+        (limits, or sizes of a store every worker shares).
+        """
+        self._collectors.append(_Collector(prefix, dict(labels), fn, max_keys))
+
+    def reset(self) -> None:
+        with self.lock:
+            self._histograms.clear()
+
+    # -- snapshots ---------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serializable state of this process."""
+        with self.lock:
+            histograms = [list(key) + [h.to_list()] for key, h in self._histograms.items()]
+
+        collectors = []
+        for collector in self._collectors:
+            try:
+                stats = collector.fn()
+            except Exception as e:
+                print(f"[WARN] Metrics collector {collector.prefix} failed: {e}")
+                continue
+            values = {
+                key: float(value) for key, value in stats.items()
+                if isinstance(value, (int, float))
+            }
+            collectors.append({
+                "prefix": collector.prefix,
+                "labels": collector.labels,
+                "values": values,
+                "max_keys": sorted(collector.max_keys),
+            })
+
+        return {"pid": os.getpid(), "written_at": time.time(),
+                "histograms": histograms, "collectors": collectors}
+
+    def write_snapshot(self) -> None:
+        if not self.metrics_dir:
+            return
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        path = os.path.join(self.metrics_dir, f"{os.getpid()}.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as fh:
+            json.dump(self.snapshot(), fh)
+        os.replace(tmp_path, path)
+
+    def _start_flusher(self) -> None:
+        # One flusher thread per process; threads don't survive fork.
+        with self.lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+
+        def _run():
+            while True:
+                time.sleep(self.flush_seconds)
+                try:
+                    self.write_snapshot()
+                except Exception as e:
+                    print(f"[WARN] Could not write metrics snapshot: {e}")
+
+        threading.Thread(target=_run, name="metrics-flush", daemon=True).start()
+
+    def _snapshots(self) -> List[Dict[str, Any]]:
+        """This process's live snapshot plus every other worker's last one."""
+        snapshots = [self.snapshot()]
+        if not self.metrics_dir or not os.path.isdir(self.metrics_dir):
+            return snapshots
+
+        for name in os.listdir(self.metrics_dir):
+            if not name.endswith(".json") or name == f"{os.getpid()}.json":
+                continue
+            try:
+                with open(os.path.join(self.metrics_dir, name)) as fh:
+                    snapshots.append(json.load(fh))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    # -- aggregation -------------------------------------------------------
+
+    def aggregate(self) -> Dict[str, Any]:
+        """
+        Merge all snapshots. Histograms of exited workers are kept so counts
+        stay monotonic; collector gauges only come from live processes.
+        """
+        histograms: Dict[HistogramKey, LatencyHistogram] = {}
+        gauges: Dict[Tuple[str, Tuple[Tuple[str, str], ...], str], float] = {}
+        workers = 0
+
+        for snapshot in self._snapshots():
+            for pipeline, disease, stage, data in snapshot["histograms"]:
+                key = (pipeline, disease, stage)
+                histogram = histograms.setdefault(key, LatencyHistogram())
+                histogram.merge(LatencyHistogram.from_list(data))
+
+            if not _pid_alive(snapshot["pid"]):
+                continue
+            workers += 1
+            for collector in snapshot["collectors"]:
+                labels = tuple(sorted(collector["labels"].items()))
+                for name, value in collector["values"].items():
+                    key = (f"{collector['prefix']}_{name}", labels, name)
+                    if key not in gauges:
+                        gauges[key] = value
+                    elif name in collector["max_keys"]:
+                        gauges[key] = max(gauges[key], value)
+                    else:
+                        gauges[key] += value
+
+        return {"histograms": histograms, "gauges": gauges, "workers": workers}
+
+    def summary(self) -> Dict[str, Any]:
+        """Merged per-stage count/mean/p50/p95/p99 (milliseconds) and gauges, as JSON."""
+        merged = self.aggregate()
+        stages = []
+        for (pipeline, disease, stage), h in sorted(merged["histograms"].items()):
+            entry = {
+                "pipeline": pipeline,
+                "disease": disease,
+                "stage": stage,
+                "count": h.count,
+                "mean_ms": (h.total / h.count * 1000.0) if h.count else 0.0,
+            }
+            for q in QUANTILES:
+                entry[f"p{int(q * 100)}_ms"] = h.quantile(q) * 1000.0
+            stages.append(entry)
+
+        gauges = [
+            {"name": metric, "labels": dict(labels), "value": value}
+            for (metric, labels, _), value in sorted(merged["gauges"].items())
+        ]
+        return {"workers": merged["workers"], "stages": stages, "gauges": gauges}
+
+    def render_prometheus(self) -> str:
+        """Merged metrics in the Prometheus text exposition format (0.0.4)."""
+        merged = self.aggregate()
+        lines = [
+            "# HELP sdp_stage_duration_seconds Latency of each pipeline stage.",
+            "# TYPE sdp_stage_duration_seconds histogram",
+        ]
+        ordered = sorted(merged["histograms"].items())
+        for (pipeline, disease, stage), h in ordered:
+            labels = _format_labels(pipeline=pipeline, disease=disease, stage=stage)
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS, h.counts):
+                cumulative += n
+                lines.append(f'sdp_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'sdp_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {h.count}')
+            lines.append(f"sdp_stage_duration_seconds_sum{{{labels}}} {h.total}")
+            lines.append(f"sdp_stage_duration_seconds_count{{{labels}}} {h.count}")
+
+        lines += [
+            "# HELP sdp_stage_duration_quantile_seconds Quantiles estimated from the merged histogram buckets.",
+            "# TYPE sdp_stage_duration_quantile_seconds gauge",
+        ]
+        for (pipeline, disease, stage), h in ordered:
+            labels = _format_labels(pipeline=pipeline, disease=disease, stage=stage)
+            for q in QUANTILES:
+                lines.append(f'sdp_stage_duration_quantile_seconds{{{labels},quantile="{q}"}} {h.quantile(q)}')
+
+        lines += [
+            "# HELP sdp_metrics_workers Live processes contributing to these metrics.",
+            "# TYPE sdp_metrics_workers gauge",
+            f"sdp_metrics_workers {merged['workers']}",
+        ]
+
+        typed = set()
+        for (metric, labels, _), value in sorted(merged["gauges"].items()):
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} gauge")
+                typed.add(metric)
+            rendered = _format_labels(**dict(labels))
+            lines.append(f"{metric}{{{rendered}}} {value}" if rendered else f"{metric} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(**labels: str) -> str:
+    def _escape(value: str) -> str:
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def clear_snapshots(metrics_dir: Optional[str] = METRICS_DIR) -> None:
+    """Remove snapshots left by a previous server run (called by the gunicorn master)."""
+    if not metrics_dir or not os.path.isdir(metrics_dir):
+        return
+    for name in os.listdir(metrics_dir):
+        if name.endswith(".json") or name.endswith(".tmp"):
+            try:
+                os.remove(os.path.join(metrics_dir, name))
+            except OSError:
+                pass
+
+
+# Global instance
+metrics = MetricsRegistry()
+
+
+def _register_builtin_collectors() -> None:
+    from .advice_service import deferred_advice
+    from .cache_service import advice_cache, chatbot_cache, prediction_cache
+    from .llm_guard import llm_guard
+    from .xai_service import SHAP_MODE
+
+    for name, cache in (("advice", advice_cache), ("chatbot", chatbot_cache)):
+        max_keys = ["max_entries", "max_bytes", "semantic_threshold", "semantic_max_entries",
+                    "semantic_mean_hit_similarity"]
+        if cache.backend.name == "sqlite":
+            # One store shared by every worker: don't add up its size per worker.
+            max_keys += ["cache_size", "current_bytes"]
+        metrics.register_collector("sdp_cache", {"cache": name}, cache.get_stats, max_keys)
+
+    metrics.register_collector(
+        "sdp_cache", {"cache": "prediction"}, prediction_cache.get_stats, ["enabled", "max_entries"]
+    )
+    metrics.register_collector(
+        "sdp_deferred_advice", {}, deferred_advice.get_stats, ["max_workers", "max_pending"]
+    )
+    metrics.register_collector(
+        "sdp_llm_guard", {}, llm_guard.get_stats, ["state_code", "rate_per_min", "timeout_s"]
+    )
+    if SHAP_MODE == "process":
+        from .shap_pool import shap_pool
+
+        metrics.register_collector("sdp_shap_pool", {}, shap_pool.get_stats, ["max_workers"])
+
+
+_register_builtin_collectors()
@@ -0,0 +1,130 @@
+"""
+Dynamic micro-batching for model calls that are cheaper per item in batches.
+
+Concurrent callers submit single items; a background thread collects them
+for up to max_batch_size items or max_wait_ms, runs one batched call, and
+hands each result back to the caller waiting for it.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class MicroBatcher:
+    """
+    Turns concurrent single-item calls into batched calls of fn.
+
+    fn takes a list of items and returns a list of results in the same order.
+    If fn raises, every caller in that batch gets the exception.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        name: str = "micro-batcher",
+    ):
+        self.fn = fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_s = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+        self._queue: "queue.Queue[Tuple[Any, Future]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self.batch_count = 0
+        self.item_count = 0
+
+    def _ensure_worker(self) -> None:
+        # Threads don't survive fork; start a fresh worker in each process.
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, item: Any) -> Any:
+        """Run item through fn as part of a batch and return its result."""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future.result()
+
+    def _collect(self) -> List[Tuple[Any, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self.fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"{self.name}: expected {len(items)} results, got {len(results)}")
+            except BaseException as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batch_count += 1
+            self.item_count += len(items)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batch_count,
+            "items": self.item_count,
+            "mean_batch_size": self.item_count / self.batch_count if self.batch_count else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_s * 1000.0,
+        }
+
+
+class BatchedSentimentAnalyzer:
+    """
+    Drop-in wrapper for a HuggingFace sentiment pipeline.
+
+    A single string is micro-batched with other concurrent requests and
+    returned as a one-element list, like pipeline(str). Lists pass straight
+    through to the pipeline.
+    """
+
+    def __init__(self, analyzer: Callable, max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        self.analyzer = analyzer
+        self.batcher = MicroBatcher(
+            self._run_batch,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            name="sentiment-batcher",
+        )
+
+    def _run_batch(self, messages: List[str]) -> List[Dict[str, Any]]:
+        # batch_size makes the pipeline run one forward pass per batch instead
+        # of iterating over the inputs one at a time.
+        return list(self.analyzer(messages, batch_size=len(messages)))
+
+    def __call__(self, inputs, **kwargs):
+        if isinstance(inputs, str) and not kwargs:
+            return [self.batcher.submit(inputs)]
+        return self.analyzer(inputs, **kwargs)
+
+    def load(self):
+        load = getattr(self.analyzer, "load", None)
+        return load() if load is not None else self.analyzer
@@ -1,79 +1,414 @@
+import asyncio
+import importlib.util
 import os
-from typing import Dict, Any
+import threading
+import time
+from collections.abc import Mapping
+from typing import Dict, Any, Iterator, List, Optional
 import joblib
+import numpy as np
+
+from .xai_service import SHAP_MODE, get_tree_explainer, invalidate_explainers
+from .tree_engine import INFERENCE_ENGINE, get_compiled_model
+from .micro_batcher import BatchedSentimentAnalyzer
+from .sentiment_backends import SENTIMENT_BACKEND, build_sentiment_pipeline
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-MODELS_DIR = os.path.join(BASE_DIR, "models")
+MODELS_DIR = os.getenv("SDP_MODELS_DIR", os.path.join(BASE_DIR, "models"))
+
+# "lazy": load each model on first use (default)
+# "warmup": like lazy, but load everything on a background thread at startup
+# "eager": load everything before create_app returns
+MODEL_LOADING = os.getenv("SDP_MODEL_LOADING", "lazy").strip().lower()
+# Same choices for the sentiment pipeline and Gemini client; defaults to MODEL_LOADING.
+NLP_LOADING = os.getenv("SDP_NLP_LOADING", MODEL_LOADING).strip().lower()
+
+# joblib mmap_mode (e.g. "r") for uncompressed artifacts. NumPy arrays that
+# the estimators keep as-is are then mapped from the page cache and shared
+# by every worker; arrays that sklearn/xgboost copy into their own buffers
+# (tree nodes, boosters) are not. Loading in the gunicorn master before fork
+# (see gunicorn.conf.py) is what shares those.
+MODEL_MMAP_MODE = os.getenv("SDP_MODEL_MMAP", "").strip() or None
+
+# Micro-batch concurrent /api/chat sentiment calls into one pipeline call.
+SENTIMENT_BATCHING = os.getenv("SDP_SENTIMENT_BATCHING", "0") == "1"
+SENTIMENT_MAX_BATCH = int(os.getenv("SDP_SENTIMENT_MAX_BATCH", "16"))
+SENTIMENT_MAX_WAIT_MS = float(os.getenv("SDP_SENTIMENT_MAX_WAIT_MS", "5"))
+
+# Poll MODELS_DIR every N seconds and hot-swap artifacts whose file changed (0 = off).
+MODEL_WATCH_SECONDS = float(os.getenv("SDP_MODEL_WATCH_SECONDS", "0"))
+
+MODEL_FILES = {
+    "diabetes": "xgb_model.pkl",
+    "hypertension": "hypertension_rf_calibrated.pkl",
+    "stroke": "stroke_xgb.pkl",
+    # Heart disease can be added later
+    "heart": None,
+}
+
+
+def _file_version(path: str) -> Optional[str]:
+    """Version tag of a model file; changes whenever the file is replaced."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
 
 
-def _safe_load_model(path: str):
-    if not os.path.exists(path):
+def _safe_load_model(path: str, mmap_mode: Optional[str] = MODEL_MMAP_MODE):
+    version = _file_version(path)
+    if version is None:
         print(f"[ERROR] Model file NOT FOUND: {path}")
         return None
-    model = joblib.load(path)
+    model = joblib.load(path, mmap_mode=mmap_mode)
     try:
         setattr(model, "_sdp_model_path", path)
+        # Keys the prediction result cache and is reported with every prediction.
+        setattr(model, "_sdp_model_version", version)
     except Exception:
         pass
     print(f"[INFO] Loaded model from {path}")
     return model
 
 
-def load_disease_models() -> Dict[str, Any]:
+class LazyModelRegistry(Mapping):
     """
-    Load trained ML models into memory at startup.
+    Read-only {disease: model} mapping that loads each model on first access.
+
+    Loading is thread-safe and happens once per disease; the model's SHAP
+    explainer is built right after it loads. Missing model files map to None,
+    as before.
+
+    reload() (and the watcher, with watch_seconds > 0) loads changed model
+    files in the background, validates and warms them, then swaps them in
+    with a single assignment. Requests that already hold the old model finish
+    on it.
     """
-    models = {
-        "diabetes": _safe_load_model(
-            os.path.join(MODELS_DIR, "xgb_model.pkl")
-        ),
-        "hypertension": _safe_load_model(
-            os.path.join(MODELS_DIR, "hypertension_rf_calibrated.pkl")
-        ),
-        "stroke": _safe_load_model(
-            os.path.join(MODELS_DIR, "stroke_xgb.pkl")
-        ),
-        # Heart disease can be added later
-        "heart": None,
-    }
 
-    for k, v in models.items():
-        if v is None:
-            print(f"[WARN] Model for '{k}' is None")
+    def __init__(
+        self,
+        model_files: Dict[str, Optional[str]],
+        models_dir: str = MODELS_DIR,
+        mmap_mode: Optional[str] = MODEL_MMAP_MODE,
+        watch_seconds: float = MODEL_WATCH_SECONDS,
+    ):
+        self.model_files = dict(model_files)
+        self.models_dir = models_dir
+        self.mmap_mode = mmap_mode
+        self.watch_seconds = watch_seconds
+        self._models: Dict[str, Any] = {}
+        self._locks = {disease: threading.Lock() for disease in self.model_files}
+        self._reload_lock = threading.Lock()
+        # {disease: file version that failed to load}; not retried until the file changes.
+        self._rejected: Dict[str, str] = {}
+        self._watcher_lock = threading.Lock()
+        self._watcher_pid: Optional[int] = None
+
+    def _load(self, disease: str) -> Any:
+        filename = self.model_files[disease]
+        if filename is None:
+            return None
+
+        model = _safe_load_model(os.path.join(self.models_dir, filename), mmap_mode=self.mmap_mode)
+        if model is None:
+            print(f"[WARN] Model for '{disease}' is None")
+            return None
+
+        features = getattr(model, "feature_names_in_", None)
+        if features is not None:
+            print(f"[OK] Model '{disease}' ready with features:", features)
         else:
-            features = getattr(v, "feature_names_in_", None)
-            if features is not None:
-                print(f"[OK] Model '{k}' ready with features:", features)
-            else:
-                print(f"[OK] Model '{k}' ready")
+            print(f"[OK] Model '{disease}' ready")
 
-    return models
+        # A freshly loaded model must never be explained with a previous model's trees.
+        invalidate_explainers(model)
+        self._warm(model)
+        return model
 
+    def _warm(self, model: Any) -> None:
+        get_tree_explainer(model)
+        if INFERENCE_ENGINE == "compiled":
+            get_compiled_model(model)
 
-def load_nlp_models() -> Dict[str, Any]:
-    from transformers import pipeline
-    import os
+    def _validate(self, disease: str, model: Any) -> None:
+        """Raise ValueError unless model takes this disease's features and scores a row."""
+        from .prediction_service import get_feature_schema
 
-    sentiment_analyzer = pipeline("sentiment-analysis")
-    
-    # Use Gemini for advice generation (same as chatbot) - use free tier friendly model
+        # Checks feature_names_in_ against the disease's feature specs.
+        schema = get_feature_schema(disease, model)
+        proba = model.predict_proba(np.zeros((1, len(schema.columns))))
+        if np.shape(proba) != (1, 2):
+            raise ValueError(f"predict_proba returned shape {np.shape(proba)}, expected (1, 2)")
+
+    def __getitem__(self, disease: str) -> Any:
+        if self.watch_seconds > 0 and self._watcher_pid != os.getpid():
+            self._start_watcher()
+        if disease in self._models:
+            return self._models[disease]
+        return self._get(disease)
+
+    def _get(self, disease: str) -> Any:
+        if disease not in self.model_files:
+            raise KeyError(disease)
+
+        with self._locks[disease]:
+            if disease not in self._models:
+                self._models[disease] = self._load(disease)
+        return self._models[disease]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.model_files)
+
+    def __len__(self) -> int:
+        return len(self.model_files)
+
+    def is_loaded(self, disease: str) -> bool:
+        return disease in self._models
+
+    def load_all(self) -> None:
+        for disease in self.model_files:
+            self._get(disease)
+
+    def versions(self) -> Dict[str, Optional[str]]:
+        """Version of each loaded model (None for diseases without one)."""
+        return {
+            disease: getattr(model, "_sdp_model_version", None)
+            for disease, model in list(self._models.items())
+        }
+
+    def reload(self, disease: Optional[str] = None, force: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Load, validate, warm and swap in model files that changed on disk.
+
+        Models not loaded yet are left alone (they load the current file on
+        first use) unless force is set. Returns {disease: {"status", "version"}}
+        with status one of reloaded, unchanged, not_loaded, unavailable,
+        missing or failed (the old model stays in place).
+        """
+        if disease is not None and disease not in self.model_files:
+            raise ValueError(f"Unknown disease: {disease}")
+        diseases = [disease] if disease is not None else list(self.model_files)
+        with self._reload_lock:
+            return {name: self._reload_one(name, force) for name in diseases}
+
+    def _reload_one(self, disease: str, force: bool) -> Dict[str, Any]:
+        current = self._models.get(disease)
+        current_version = getattr(current, "_sdp_model_version", None)
+
+        filename = self.model_files[disease]
+        if filename is None:
+            return {"status": "unavailable", "version": None}
+        if disease not in self._models and not force:
+            return {"status": "not_loaded", "version": None}
+
+        path = os.path.join(self.models_dir, filename)
+        version = _file_version(path)
+        if version is None:
+            return {"status": "missing", "version": current_version}
+        if version == current_version and not force:
+            return {"status": "unchanged", "version": version}
+        if self._rejected.get(disease) == version and not force:
+            return {"status": "failed", "version": current_version, "error": "rejected earlier"}
+
+        model = None
+        try:
+            model = _safe_load_model(path, mmap_mode=self.mmap_mode)
+            if model is None or _file_version(path) != version:
+                # Half-written file: try again on the next poll.
+                raise ValueError("model file changed while loading")
+            self._validate(disease, model)
+            self._warm(model)
+        except Exception as e:
+            print(f"[ERROR] Reload of '{disease}' from {path} failed, keeping {current_version}: {e}")
+            if model is not None:
+                self._rejected[disease] = version
+            return {"status": "failed", "version": current_version, "error": str(e)}
+
+        self._models[disease] = model
+        print(f"[INFO] Model '{disease}' swapped: {current_version} -> {version}")
+
+        if SHAP_MODE == "process":
+            # Fresh SHAP workers preload the new file.
+            from .shap_pool import shap_pool
+
+            shap_pool.reset()
+        return {"status": "reloaded", "version": version}
+
+    def _start_watcher(self) -> None:
+        with self._watcher_lock:
+            if self._watcher_pid == os.getpid():
+                return
+            # Threads and held locks don't survive fork; start over in each process.
+            self._reload_lock = threading.Lock()
+            self._watcher_pid = os.getpid()
+            thread = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+            thread.start()
+        print(f"[INFO] Watching {self.models_dir} for model changes every {self.watch_seconds:g}s")
+
+    def _watch(self) -> None:
+        while True:
+            time.sleep(self.watch_seconds)
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"[WARN] Model watcher failed: {e}")
+
+
+def _warm_in_background(name: str, fn) -> threading.Thread:
+    def _run():
+        try:
+            fn()
+            print(f"[INFO] Warmup finished: {name}")
+        except Exception as e:
+            print(f"[WARN] Warmup failed for {name}: {e}")
+
+    thread = threading.Thread(target=_run, name=f"warmup-{name}", daemon=True)
+    thread.start()
+    return thread
+
+
+def load_disease_models(mode: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Return the disease models as a lazily loading mapping.
+
+    mode (default SDP_MODEL_LOADING) controls when the joblib artifacts are
+    actually read: on first use ("lazy"), on a background thread right away
+    ("warmup"), or before returning ("eager").
+    """
+    mode = (mode or MODEL_LOADING).lower()
+    models = LazyModelRegistry(MODEL_FILES)
+
+    if mode == "eager":
+        models.load_all()
+    elif mode == "warmup":
+        _warm_in_background("disease-models", models.load_all)
+
+    return models  # type: ignore[return-value]
+
+
+class LazySentimentPipeline:
+    """
+    Callable stand-in for the HuggingFace sentiment pipeline.
+
+    transformers (and torch) are imported and the pipeline is built on the
+    first call, or by load(), using the inference backend (default
+    SDP_SENTIMENT_BACKEND) from sentiment_backends.
+    """
+
+    def __init__(self, task: str = "sentiment-analysis", backend: str = SENTIMENT_BACKEND):
+        self.task = task
+        self.backend = backend
+        self._pipeline = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._pipeline is not None
+
+    def load(self):
+        if self._pipeline is None:
+            with self._lock:
+                if self._pipeline is None:
+                    self._pipeline = build_sentiment_pipeline(self.backend)
+                    print(f"[INFO] Sentiment pipeline loaded ({self.backend})")
+        return self._pipeline
+
+    def __call__(self, inputs, **kwargs) -> List[Dict[str, Any]]:
+        return self.load()(inputs, **kwargs)
+
+
+class LazyGeminiModel:
+    """
+    Gemini GenerativeModel that imports and configures google.generativeai on
+    the first generate_content call.
+    """
+
+    def __init__(self, model_name: str, api_key: str):
+        self.model_name = model_name
+        self._api_key = api_key
+        self._model = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import google.generativeai as genai
+
+                    genai.configure(api_key=self._api_key)
+                    self._model = genai.GenerativeModel(self.model_name)
+                    print(f"[INFO] Gemini AI ({self.model_name}) initialized for advice generation")
+        return self._model
+
+    def generate_content(self, *args, **kwargs):
+        return self.load().generate_content(*args, **kwargs)
+
+    async def generate_content_async(self, *args, **kwargs):
+        # load() is a one-off import and configure; later calls return at once.
+        return await self.load().generate_content_async(*args, **kwargs)
+
+
+async def generate_content_async(generator: Any, prompt: str) -> Any:
+    """
+    Await generator's reply to prompt without holding a thread: Gemini models
+    (and LazyGeminiModel) have generate_content_async. Generators without it
+    are called on the event loop's default executor.
+    """
+    method = getattr(generator, "generate_content_async", None)
+    if method is not None:
+        return await method(prompt)
+    return await asyncio.get_running_loop().run_in_executor(None, generator.generate_content, prompt)
+
+
+def _module_available(name: str) -> bool:
+    """True if name is importable, without importing it."""
     try:
-        import google.generativeai as genai
-        GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "").strip()
-        
-        if GEMINI_API_KEY:
-            genai.configure(api_key=GEMINI_API_KEY)
-            # Use gemini-2.5-flash (available and performant)
-            advice_generator = genai.GenerativeModel("gemini-2.5-flash")
-            print("[INFO] Gemini AI (2.5-flash) initialized for advice generation")
-        else:
-            advice_generator = None
-            print("[WARN] GEMINI_API_KEY not set. Using static advice.")
-    except Exception as e:
-        print(f"[WARN] Could not load Gemini for advice: {e}")
+        return importlib.util.find_spec(name) is not None
+    except ImportError:
+        return False
+
+
+def load_nlp_models(mode: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Return the NLP models. Like load_disease_models, heavy imports are
+    deferred until first use unless mode (default SDP_NLP_LOADING) is
+    "eager" (or "warmup").
+    """
+    mode = (mode or NLP_LOADING).lower()
+    sentiment_analyzer = LazySentimentPipeline("sentiment-analysis")
+
+    # Use Gemini for advice generation (same as chatbot) - use free tier friendly model
+    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "").strip()
+    if not GEMINI_API_KEY:
+        advice_generator = None
+        print("[WARN] GEMINI_API_KEY not set. Using static advice.")
+    elif not _module_available("google.generativeai"):
         advice_generator = None
+        print("[WARN] google-generativeai not installed. Using static advice.")
+    else:
+        # Use gemini-2.5-flash (available and performant)
+        advice_generator = LazyGeminiModel("gemini-2.5-flash", GEMINI_API_KEY)
+
+    if mode == "eager":
+        sentiment_analyzer.load()
+        if advice_generator is not None:
+            try:
+                advice_generator.load()
+            except Exception as e:
+                print(f"[WARN] Could not load Gemini for advice: {e}")
+                advice_generator = None
+    elif mode == "warmup":
+        _warm_in_background("sentiment-pipeline", sentiment_analyzer.load)
+
+    if SENTIMENT_BATCHING:
+        sentiment_analyzer = BatchedSentimentAnalyzer(
+            sentiment_analyzer,
+            max_batch_size=SENTIMENT_MAX_BATCH,
+            max_wait_ms=SENTIMENT_MAX_WAIT_MS,
+        )
 
-    print("[INFO] NLP models loaded")
+    print("[INFO] NLP models ready")
 
     return {
         "sentiment_analyzer": sentiment_analyzer,
@@ -1,12 +1,19 @@
 from __future__ import annotations
 
-from typing import Dict, Any, List, Optional
+from concurrent.futures import Executor
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+import asyncio
 import os
 import random
 import logging
+import threading
+import time
 
 # Import cache service
 from .cache_service import chatbot_cache
+from .metrics_service import metrics
+from .model_loader import generate_content_async
+from .llm_guard import LLMUnavailable, llm_guard
 
 # -----------------------------------------------------------------------------
 # Configuration & Initialization
@@ -17,38 +24,48 @@ BOT_NAME = "MannMitra"
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-# Optional Gemini import
-try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
-    genai = None  # type: ignore
-    logger.warning(
-        "[WARN] google-generativeai not installed. "
-        "MannMitra will use fallback responses only."
-    )
-
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "").strip()
 
-if GEMINI_AVAILABLE and GEMINI_API_KEY:
-    try:
-        genai.configure(api_key=GEMINI_API_KEY)
-        # Use gemini-2.5-flash (available and performant)
-        gemini_model = genai.GenerativeModel("gemini-2.5-flash")
-        logger.info("[INFO] Gemini AI (2.5-flash) initialized for MannMitra")
-    except Exception as e:  # pragma: no cover - defensive
-        gemini_model = None
-        logger.error(f"[ERROR] Failed to initialize Gemini AI: {e}")
-else:
-    gemini_model = None
-    if GEMINI_AVAILABLE:
-        logger.warning(
-            "[WARN] GEMINI_API_KEY not set. "
-            "MannMitra will use fallback responses only."
-        )
-    else:
-        logger.info("[INFO] Running without Gemini AI. Fallback only.")
+# Gemini is imported and configured on first use, not at import time:
+# google.generativeai is slow to import and many workers never chat.
+_gemini_lock = threading.Lock()
+_gemini_initialized = False
+_gemini_model: Any = None
+
+
+def _get_gemini_model() -> Any:
+    """Return the Gemini model, initializing it on first call (None if unavailable)."""
+    global _gemini_initialized, _gemini_model
+    if _gemini_initialized:
+        return _gemini_model
+
+    with _gemini_lock:
+        if _gemini_initialized:
+            return _gemini_model
+
+        if not GEMINI_API_KEY:
+            logger.warning(
+                "[WARN] GEMINI_API_KEY not set. "
+                "MannMitra will use fallback responses only."
+            )
+        else:
+            try:
+                import google.generativeai as genai
+
+                genai.configure(api_key=GEMINI_API_KEY)
+                # Use gemini-2.5-flash (available and performant)
+                _gemini_model = genai.GenerativeModel("gemini-2.5-flash")
+                logger.info("[INFO] Gemini AI (2.5-flash) initialized for MannMitra")
+            except ImportError:
+                logger.warning(
+                    "[WARN] google-generativeai not installed. "
+                    "MannMitra will use fallback responses only."
+                )
+            except Exception as e:  # pragma: no cover - defensive
+                logger.error(f"[ERROR] Failed to initialize Gemini AI: {e}")
+
+        _gemini_initialized = True
+        return _gemini_model
 
 
 # -----------------------------------------------------------------------------
@@ -125,6 +142,14 @@ def _is_potential_crisis(text: str) -> bool:
     return any(kw in text_lower for kw in crisis_keywords)
 
 
+CRISIS_GUIDANCE = (
+    "I’m really glad you shared this with me. "
+    "I’m not a crisis service, but if you feel in immediate danger "
+    "or overwhelmed, please consider contacting local emergency "
+    "services, a trusted person, or a professional helpline in your area."
+)
+
+
 def _build_gemini_prompt(message: str, sentiment: str) -> str:
     """
     Build a structured prompt for Gemini tailored for MannMitra.
@@ -158,7 +183,7 @@ Now respond as {BOT_NAME}.
 # Core response generation
 # -----------------------------------------------------------------------------
 
-def generate_ai_response(message: str, sentiment: str) -> str:
+def generate_ai_response(message: str, sentiment: str, generator: Any = None) -> str:
     """
     Generate a supportive response using Gemini AI if available, otherwise use
     a rule-based fallback.
@@ -169,48 +194,89 @@ def generate_ai_response(message: str, sentiment: str) -> str:
         User's input text.
     sentiment : str
         Sentiment label from the sentiment analyzer.
+    generator : Any, optional
+        Object with a Gemini-style ``generate_content(prompt)`` method.
+        Defaults to the module's Gemini model.
 
     Returns
     -------
     str
         The chatbot's reply text.
     """
-    if not gemini_model:
+    generator = generator if generator is not None else _get_gemini_model()
+    if not generator:
         # Fallback to rule-based responses
         return generate_fallback_response(message, sentiment)
 
+    def _call(prompt: str) -> Any:
+        with metrics.timer("chat", "", "llm"):
+            return generator.generate_content(prompt)
+
+    def _generate() -> str:
+        prompt = _build_gemini_prompt(message, sentiment)
+        response = llm_guard.call(lambda: _call(prompt))
+        return _finish_reply(message, response)
+
     try:
+        # Cache first; concurrent misses on the same key share one Gemini call.
+        # Replies to crisis language are never served to merely similar messages.
+        return chatbot_cache.get_or_generate(
+            sentiment, message, _generate, similar=not _is_potential_crisis(message)
+        )
+
+    except LLMUnavailable as e:
+        logger.info(f"[INFO] Gemini call skipped ({e.reason}); using fallback reply")
+        return generate_fallback_response(message, sentiment)
+    except Exception as e:  # pragma: no cover - defensive
+        logger.error(f"[ERROR] Gemini AI failed: {e}")
+        return generate_fallback_response(message, sentiment)
+
+
+async def generate_ai_response_async(message: str, sentiment: str, generator: Any = None) -> str:
+    """
+    generate_ai_response for asyncio callers: the Gemini call is awaited
+    (``generate_content_async``) instead of holding a thread.
+    """
+    if generator is None:
+        # The first call may import and configure google.generativeai.
+        generator = await asyncio.get_running_loop().run_in_executor(None, _get_gemini_model)
+    if not generator:
+        return generate_fallback_response(message, sentiment)
+
+    async def _call(prompt: str) -> Any:
+        with metrics.timer("chat", "", "llm"):
+            return await generate_content_async(generator, prompt)
+
+    async def _generate() -> str:
         prompt = _build_gemini_prompt(message, sentiment)
-        
-        # Try cache first
-        cached = chatbot_cache.get(sentiment, message)
-        if cached:
-            logger.info("[CACHE HIT] Chatbot response")
-            return cached
-        
-        response = gemini_model.generate_content(prompt)
-        text = (response.text or "").strip()
-        if not text:
-            raise ValueError("Empty response from Gemini")
-
-        # Optional extra safety: append crisis guidance if needed
-        if _is_potential_crisis(message):
-            text += (
-                "\n\nI’m really glad you shared this with me. "
-                "I’m not a crisis service, but if you feel in immediate danger "
-                "or overwhelmed, please consider contacting local emergency "
-                "services, a trusted person, or a professional helpline in your area."
-            )
-        # Cache the response
-        chatbot_cache.set(sentiment, message, text)
-        logger.info("[CACHE MISS] Generated chatbot response")
-        return text
+        response = await llm_guard.call_async(lambda: _call(prompt))
+        return _finish_reply(message, response)
+
+    try:
+        return await chatbot_cache.get_or_generate_async(
+            sentiment, message, _generate, similar=not _is_potential_crisis(message)
+        )
 
+    except LLMUnavailable as e:
+        logger.info(f"[INFO] Gemini call skipped ({e.reason}); using fallback reply")
+        return generate_fallback_response(message, sentiment)
     except Exception as e:  # pragma: no cover - defensive
         logger.error(f"[ERROR] Gemini AI failed: {e}")
         return generate_fallback_response(message, sentiment)
 
 
+def _finish_reply(message: str, response: Any) -> str:
+    text = (response.text or "").strip()
+    if not text:
+        raise ValueError("Empty response from Gemini")
+
+    # Optional extra safety: append crisis guidance if needed
+    if _is_potential_crisis(message):
+        text += "\n\n" + CRISIS_GUIDANCE
+    logger.info("[CACHE MISS] Generated chatbot response")
+    return text
+
+
 def generate_fallback_response(message: str, sentiment: str) -> str:
     """
     Rule-based fallback responses when Gemini AI is unavailable.
@@ -303,13 +369,49 @@ def get_llm_status() -> Dict[str, Any]:
     Used by a lightweight status endpoint so the frontend can verify whether
     the chatbot is using Gemini or fallback responses.
     """
+    gemini_model = _get_gemini_model()
     return {
         "provider": "gemini" if gemini_model else "fallback",
         "gemini_enabled": bool(gemini_model),
         "model": getattr(gemini_model, "model_name", None) if gemini_model else None,
+        # Circuit breaker / rate limiter in front of Gemini (shared with advice generation).
+        "guard": llm_guard.get_stats(),
     }
 
 
+def _stream_gemini(generator: Any, prompt: str) -> Iterator[str]:
+    """
+    Yield the text of each chunk of a Gemini-style streaming response.
+
+    The call is admitted by llm_guard (raising LLMUnavailable before the
+    first chunk) and its outcome feeds the circuit breaker. There is no
+    per-call deadline: chunks reach the client as they arrive.
+    """
+    llm_guard.acquire()
+    started = time.perf_counter()
+    try:
+        for chunk in generator.generate_content(prompt, stream=True):
+            text = getattr(chunk, "text", None)
+            if text:
+                yield text
+    except GeneratorExit:
+        llm_guard.release()
+        raise
+    except Exception as e:
+        llm_guard.record_failure(e)
+        raise
+    llm_guard.record_success(time.perf_counter() - started)
+
+
+def _activities_text(activities: List[str]) -> str:
+    if not activities:
+        return ""
+    text = "\n\nHere are a few gentle ideas that might help a little:\n"
+    for activity in activities:
+        text += f"• {activity}\n"
+    return text
+
+
 # -----------------------------------------------------------------------------
 # Public API
 # -----------------------------------------------------------------------------
@@ -341,23 +443,49 @@ def analyze_and_respond(message: str, nlp_models: Dict[str, Any]) -> Dict[str, A
         }
     """
     sentiment_analyzer = nlp_models["sentiment_analyzer"]
+    started = time.perf_counter()
+
+    with metrics.timer("chat", "", "sentiment"):
+        result = sentiment_analyzer(message)[0]
+    sentiment_label: str = result.get("label", "NEUTRAL")
+    sentiment_score: float = float(result.get("score", 0.0))
+
+    # Generate AI-powered response (cache lookup, then Gemini or fallback)
+    with metrics.timer("chat", "", "response"):
+        reply = generate_ai_response(message, sentiment_label)
+
+    metrics.observe("chat", "", "total", time.perf_counter() - started)
+    return _chat_result(sentiment_label, sentiment_score, reply)
+
+
+async def analyze_and_respond_async(
+    message: str, nlp_models: Dict[str, Any], executor: Optional[Executor] = None
+) -> Dict[str, Any]:
+    """
+    analyze_and_respond for asyncio servers (see asgi.py): sentiment analysis
+    runs on executor and the Gemini call is awaited. Same return value.
+    """
+    sentiment_analyzer = nlp_models["sentiment_analyzer"]
+    started = time.perf_counter()
 
-    result = sentiment_analyzer(message)[0]
+    with metrics.timer("chat", "", "sentiment"):
+        result = (await asyncio.get_running_loop().run_in_executor(executor, sentiment_analyzer, message))[0]
     sentiment_label: str = result.get("label", "NEUTRAL")
     sentiment_score: float = float(result.get("score", 0.0))
 
-    # Generate AI-powered response
-    reply = generate_ai_response(message, sentiment_label)
+    with metrics.timer("chat", "", "response"):
+        reply = await generate_ai_response_async(message, sentiment_label)
 
+    metrics.observe("chat", "", "total", time.perf_counter() - started)
+    return _chat_result(sentiment_label, sentiment_score, reply)
+
+
+def _chat_result(sentiment_label: str, sentiment_score: float, reply: str) -> Dict[str, Any]:
     # Mood-lifting activities for negative sentiment
     activities: List[str] = []
     if sentiment_label.lower() == "negative":
         activities = get_mood_lifting_activities(sentiment_label)
-        if activities:
-            activities_text = "\n\nHere are a few gentle ideas that might help a little:\n"
-            for i, activity in enumerate(activities, 1):
-                activities_text += f"• {activity}\n"
-            reply += activities_text
+        reply += _activities_text(activities)
 
     return {
         "bot_name": BOT_NAME,
@@ -368,3 +496,98 @@ def analyze_and_respond(message: str, nlp_models: Dict[str, Any]) -> Dict[str, A
         "bot_reply": reply,
         "suggested_activities": activities,
     }
+
+
+def analyze_and_respond_stream(
+    message: str, nlp_models: Dict[str, Any], generator: Any = None
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Streaming variant of analyze_and_respond, yielding (event, data) pairs:
+
+        ("sentiment", {"label": str, "score": float})     first
+        ("crisis", {"guidance": str})                     only for crisis language
+        ("chunk", {"text": str})                          reply text, in order
+        ("done", <analyze_and_respond's return value>)    last
+
+    Gemini replies are streamed as they are generated and the complete text is
+    written to chatbot_cache afterwards; a cached reply (or the fallback reply)
+    arrives as a single chunk. Joined, the chunks equal the "bot_reply" of
+    the "done" event.
+
+    generator defaults to the module's Gemini model; it must accept
+    ``generate_content(prompt, stream=True)`` and return an iterable of chunks
+    with a ``text`` attribute.
+    """
+    sentiment_analyzer = nlp_models["sentiment_analyzer"]
+    started = time.perf_counter()
+
+    with metrics.timer("chat", "", "sentiment"):
+        result = sentiment_analyzer(message)[0]
+    sentiment_label: str = result.get("label", "NEUTRAL")
+    sentiment_score: float = float(result.get("score", 0.0))
+    yield "sentiment", {"label": sentiment_label, "score": sentiment_score}
+
+    crisis = _is_potential_crisis(message)
+    if crisis:
+        yield "crisis", {"guidance": CRISIS_GUIDANCE}
+
+    generator = generator if generator is not None else _get_gemini_model()
+    reply = chatbot_cache.get(sentiment_label, message, similar=not crisis) if generator else None
+
+    if reply is not None or not generator:
+        if reply is None:
+            reply = generate_fallback_response(message, sentiment_label)
+        metrics.observe("chat", "", "first_chunk", time.perf_counter() - started)
+        yield "chunk", {"text": reply}
+    else:
+        parts: List[str] = []
+        llm_started = time.perf_counter()
+        stream = _stream_gemini(generator, _build_gemini_prompt(message, sentiment_label))
+        try:
+            for text in stream:
+                if not parts:
+                    text = text.lstrip()
+                    metrics.observe("chat", "", "first_chunk", time.perf_counter() - started)
+                parts.append(text)
+                yield "chunk", {"text": text}
+            metrics.observe("chat", "", "llm", time.perf_counter() - llm_started)
+            if not "".join(parts).strip():
+                raise ValueError("Empty response from Gemini")
+        except Exception as e:
+            if isinstance(e, LLMUnavailable):
+                logger.info(f"[INFO] Gemini call skipped ({e.reason}); using fallback reply")
+            else:
+                logger.error(f"[ERROR] Gemini AI streaming failed: {e}")
+            if not parts:
+                parts = [generate_fallback_response(message, sentiment_label)]
+                yield "chunk", {"text": parts[0]}
+            # A partial reply is not cached.
+            reply = "".join(parts)
+        else:
+            if crisis:
+                parts.append("\n\n" + CRISIS_GUIDANCE)
+                yield "chunk", {"text": parts[-1]}
+            reply = "".join(parts)
+            chatbot_cache.set(sentiment_label, message, reply.strip(), similar=not crisis)
+            logger.info("[CACHE MISS] Streamed chatbot response")
+        finally:
+            stream.close()
+
+    activities: List[str] = []
+    if sentiment_label.lower() == "negative":
+        activities = get_mood_lifting_activities(sentiment_label)
+        activities_text = _activities_text(activities)
+        if activities_text:
+            reply += activities_text
+            yield "chunk", {"text": activities_text}
+
+    metrics.observe("chat", "", "total", time.perf_counter() - started)
+    yield "done", {
+        "bot_name": BOT_NAME,
+        "sentiment": {
+            "label": sentiment_label,
+            "score": sentiment_score,
+        },
+        "bot_reply": reply,
+        "suggested_activities": activities,
+    }
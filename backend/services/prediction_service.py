@@ -1,8 +1,41 @@
-from typing import Dict, Any, List
+import asyncio
+import math
+import os
+import threading
+import time
+import warnings
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Dict, Any, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
 import pandas as pd
 
-from .xai_service import explain_with_shap
-from .cache_service import advice_cache
+from .xai_service import HeuristicExplanation, explain_with_shap, explain_batch_with_shap
+from .cache_service import advice_cache, model_version, prediction_cache
+from .advice_service import ADVICE_MODE, deferred_advice
+from .tree_engine import predict_proba
+from .metrics_service import metrics
+from .model_loader import generate_content_async
+from .llm_guard import LLMUnavailable, llm_guard
+
+# Rows are encoded straight into NumPy arrays in the model's column order, so
+# sklearn's feature-name check has nothing to compare against.
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+SUPPORTED_DISEASES = ("diabetes", "hypertension", "stroke")
+
+DISEASE_NAMES = {
+    "diabetes": "Type 2 Diabetes",
+    "hypertension": "Hypertension",
+    "stroke": "Stroke Risk",
+}
+
+# (High, Moderate) lower bounds on the risk score for each disease.
+RISK_THRESHOLDS = {
+    "stroke": (0.6, 0.4),
+    "hypertension": (0.67, 0.33),
+    "diabetes": (0.7, 0.4),
+}
+RISK_LEVELS = ("Low", "Moderate", "High")
 
 
 # =========================
@@ -14,94 +47,344 @@ def _require_fields(payload: Dict[str, Any], fields: List[str]) -> None:
         raise ValueError(f"Missing required fields: {', '.join(missing)}")
 
 
+def _risk_label(disease: str, risk_score: float) -> str:
+    high, moderate = RISK_THRESHOLDS[disease]
+    if risk_score >= high:
+        return "High"
+    if risk_score >= moderate:
+        return "Moderate"
+    return "Low"
+
+
+def _risk_levels(disease: str, risk_scores: np.ndarray) -> np.ndarray:
+    """Index into RISK_LEVELS for each score (0 Low, 1 Moderate, 2 High)."""
+    high, moderate = RISK_THRESHOLDS[disease]
+    return (risk_scores >= moderate).astype(np.int8) + (risk_scores >= high)
+
+
+def _risk_labels(disease: str, risk_scores: np.ndarray) -> np.ndarray:
+    """Vectorized _risk_label for an array of scores."""
+    return np.asarray(RISK_LEVELS)[_risk_levels(disease, risk_scores)]
+
+
+def _static_advice(disease_name: str, risk_label: str) -> str:
+    advice_map = {
+        "High": (
+            f"Your {disease_name} risk is high. "
+            "Please consult a healthcare professional as soon as possible. "
+            "Immediate lifestyle changes and medical evaluation are advised."
+        ),
+        "Moderate": (
+            f"You have moderate {disease_name} risk. "
+            "Regular exercise, dietary improvements, stress management, "
+            "and routine checkups are strongly recommended."
+        ),
+        "Low": (
+            f"Your {disease_name} risk is currently low. "
+            "Maintain a healthy lifestyle and continue regular health screenings."
+        ),
+    }
+    return advice_map[risk_label]
+
+
 # =========================
 # FEATURE EXTRACTION
 # =========================
-def get_disease_features(disease: str, payload: Dict[str, Any]) -> pd.DataFrame:
+class FeatureSpec(NamedTuple):
+    column: str  # model column name
+    field: str  # request payload field
+    kind: type  # float or int
+    domain: Optional[Tuple[float, float, float]] = None  # (low, high, step) of typical inputs
+
+
+FEATURE_SPECS: Dict[str, Tuple[FeatureSpec, ...]] = {
+    # DIABETES (XGBoost) - BRFSS features
+    "diabetes": (
+        FeatureSpec("Age", "age", float, (18, 80, 1)),  # years, as the API receives it (adult BRFSS respondents)
+        FeatureSpec("BMI", "bmi", float, (15, 50, 1)),
+        FeatureSpec("HighBP", "highbp", int, (0, 1, 1)),
+        FeatureSpec("HighChol", "highchol", int, (0, 1, 1)),
+        FeatureSpec("GenHlth", "genhlth", int, (1, 5, 1)),
+        FeatureSpec("DiffWalk", "diffwalk", int, (0, 1, 1)),
+    ),
+    # HYPERTENSION (BRFSS RF) - 🔥 EXACT features used in hypertension_BRFFS.ipynb
+    "hypertension": (
+        FeatureSpec("age", "age", float, (25, 80, 1)),
+        FeatureSpec("sex", "sex", int, (0, 1, 1)),
+        FeatureSpec("trestbps", "trestbps", float, (90, 200, 5)),
+        FeatureSpec("chol", "chol", float, (120, 400, 10)),
+        FeatureSpec("fbs", "fbs", int, (0, 1, 1)),
+        FeatureSpec("restecg", "restecg", int, (0, 2, 1)),
+        FeatureSpec("exang", "exang", int, (0, 1, 1)),
+        FeatureSpec("slope", "slope", int, (0, 2, 1)),
+    ),
+    # STROKE (XGBoost) - 🔥 EXACT features used in stroke model
+    "stroke": (
+        FeatureSpec("age", "age", float, (1, 90, 1)),
+        FeatureSpec("hypertension", "hypertension", int, (0, 1, 1)),
+        FeatureSpec("heart_disease", "heart_disease", int, (0, 1, 1)),
+        FeatureSpec("avg_glucose_level", "avg_glucose_level", float, (55, 280, 5)),
+        FeatureSpec("bmi", "bmi", float, (15, 50, 1)),
+        FeatureSpec("smoking_status", "smoking_status", int, (0, 3, 1)),
+        FeatureSpec("ever_married", "ever_married", int, (0, 1, 1)),
+    ),
+}
+
+
+class FeatureSchema:
     """
-    Extract features EXACTLY as the model was trained.
+    A disease's features compiled into the model's column order.
+
+    Payloads are validated and written straight into a preallocated NumPy
+    row, so the hot path never builds a pandas DataFrame.
     """
 
-    # -------------------------
-    # DIABETES (XGBoost) - BRFSS features
-    # -------------------------
-    if disease == "diabetes":
-        _require_fields(
-            payload,
-            ["age", "bmi", "highbp", "highchol", "genhlth", "diffwalk"]
-        )
+    __slots__ = ("disease", "specs", "columns", "fields", "dtype")
 
-        features = {
-            "Age": float(payload["age"]),
-            "BMI": float(payload["bmi"]),
-            "HighBP": int(payload["highbp"]),
-            "HighChol": int(payload["highchol"]),
-            "GenHlth": int(payload["genhlth"]),
-            "DiffWalk": int(payload["diffwalk"]),
-        }
+    def __init__(self, disease: str, specs: Sequence[FeatureSpec], dtype=np.float64):
+        self.disease = disease
+        self.specs = tuple(specs)
+        self.columns = [spec.column for spec in self.specs]
+        self.fields = [spec.field for spec in self.specs]
+        self.dtype = dtype
 
-    # -------------------------
-    # HYPERTENSION (BRFSS RF)
-    # -------------------------
-    elif disease == "hypertension":
-        # 🔥 EXACT features used in hypertension_BRFFS.ipynb
-        _require_fields(
-            payload,
-            [
-                "age",
-                "sex",
-                "trestbps",
-                "chol",
-                "fbs",
-                "restecg",
-                "exang",
-                "slope",
-            ],
-        )
+    def _write(self, payload: Dict[str, Any], out: np.ndarray) -> None:
+        _require_fields(payload, self.fields)
+        for j, spec in enumerate(self.specs):
+            try:
+                value = spec.kind(payload[spec.field])
+            except (TypeError, ValueError, OverflowError):
+                raise ValueError(
+                    f"Field '{spec.field}' must be {'an integer' if spec.kind is int else 'a number'}"
+                )
+            if not math.isfinite(value):
+                raise ValueError(f"Field '{spec.field}' must be a finite number")
+            out[j] = value
+
+    def encode(self, payload: Dict[str, Any]) -> np.ndarray:
+        """Encode one payload as a (1, n_features) matrix."""
+        row = np.empty((1, len(self.specs)), dtype=self.dtype)
+        self._write(payload, row[0])
+        return row
+
+    def encode_many(
+        self, payloads: List[Dict[str, Any]]
+    ) -> Tuple[np.ndarray, List[int], Dict[int, str]]:
+        """
+        Encode many payloads into one matrix.
+
+        Returns the matrix (one row per valid payload), the positions of the
+        valid payloads in the input list, and an error message per invalid
+        position.
+        """
+        matrix = np.empty((len(payloads), len(self.specs)), dtype=self.dtype)
+        positions: List[int] = []
+        errors: Dict[int, str] = {}
+
+        for i, payload in enumerate(payloads):
+            try:
+                self._write(payload, matrix[len(positions)])
+                positions.append(i)
+            except (KeyError, ValueError, TypeError) as e:
+                errors[i] = str(e)
+
+        return matrix[: len(positions)], positions, errors
+
+    def encode_frame(self, frame: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, Dict[int, str]]:
+        """
+        Vectorized encode_many for a DataFrame of rows.
+
+        Each feature is read from the column named like its payload field, or
+        else like its model column. Values are coerced the way encode() does
+        (int features are truncated). Returns the matrix of valid rows, their
+        positions in frame, and an error message per invalid position.
+        Raises ValueError if a feature column is missing altogether.
+        """
+        sources = [
+            spec.field if spec.field in frame.columns else spec.column
+            for spec in self.specs
+        ]
+        missing = [spec.field for spec, src in zip(self.specs, sources) if src not in frame.columns]
+        if missing:
+            raise ValueError(f"Missing required fields: {', '.join(missing)}")
+
+        matrix = np.empty((len(frame), len(self.specs)), dtype=self.dtype)
+        invalid = np.zeros((len(frame), len(self.specs)), dtype=bool)
+        for j, (spec, src) in enumerate(zip(self.specs, sources)):
+            column = pd.to_numeric(frame[src], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            invalid[:, j] = ~np.isfinite(column)
+            matrix[:, j] = np.trunc(column) if spec.kind is int else column
+
+        bad_rows = invalid.any(axis=1)
+        errors: Dict[int, str] = {}
+        for i in np.flatnonzero(bad_rows):
+            spec = self.specs[int(np.argmax(invalid[i]))]
+            errors[int(i)] = (
+                f"Field '{spec.field}' must be {'an integer' if spec.kind is int else 'a number'}"
+            )
+
+        positions = np.flatnonzero(~bad_rows)
+        return matrix[positions], positions, errors
+
+    def to_record(self, row: np.ndarray) -> Dict[str, Any]:
+        """Map an encoded row back to {column: value} with the original types."""
+        return {spec.column: spec.kind(row[j]) for j, spec in enumerate(self.specs)}
+
+    def sample(self, n_rows: int, seed: int = 0) -> np.ndarray:
+        """
+        n_rows encoded rows drawn uniformly from each feature's domain grid
+        (low..high in steps), e.g. to enumerate likely advice cache keys.
+        """
+        rng = np.random.default_rng(seed)
+        matrix = np.empty((n_rows, len(self.specs)), dtype=self.dtype)
+        for j, spec in enumerate(self.specs):
+            if spec.domain is None:
+                raise ValueError(f"Feature '{spec.column}' has no sampling domain")
+            low, high, step = spec.domain
+            matrix[:, j] = low + step * rng.integers(0, int(round((high - low) / step)) + 1, size=n_rows)
+        return matrix
+
+
+_schema_lock = threading.Lock()
+_compiled_schemas: Dict[Tuple[str, Tuple[str, ...]], FeatureSchema] = {}
+
+
+def get_feature_schema(disease: str, model: Any = None) -> FeatureSchema:
+    """
+    Return the feature schema for disease, ordered like model.feature_names_in_.
+
+    Schemas are compiled once per (disease, column order) and cached. Raises
+    ValueError if the model was trained on different features.
+    """
+    specs = FEATURE_SPECS.get(disease)
+    if specs is None:
+        raise ValueError(f"Unsupported disease type: {disease}")
+
+    model_features = getattr(model, "feature_names_in_", None)
+    order = tuple(model_features) if model_features is not None else tuple(s.column for s in specs)
 
-        features = {
-            "age": float(payload["age"]),
-            "sex": int(payload["sex"]),
-            "trestbps": float(payload["trestbps"]),
-            "chol": float(payload["chol"]),
-            "fbs": int(payload["fbs"]),
-            "restecg": int(payload["restecg"]),
-            "exang": int(payload["exang"]),
-            "slope": int(payload["slope"]),
-        }
+    key = (disease, order)
+    schema = _compiled_schemas.get(key)
+    if schema is not None:
+        return schema
 
     # -------------------------
-    # STROKE (XGBoost)
+    # HARD SAFETY CHECK
     # -------------------------
-    elif disease == "stroke":
-        # 🔥 EXACT features used in stroke model
-        _require_fields(
-            payload,
-            [
-                "age",
-                "hypertension",
-                "heart_disease",
-                "avg_glucose_level",
-                "bmi",
-                "smoking_status",
-                "ever_married",
-            ],
+    by_column = {spec.column: spec for spec in specs}
+    if set(order) != set(by_column):
+        raise ValueError(
+            f"Feature mismatch!\n"
+            f"Input: {set(by_column)}\n"
+            f"Model: {set(order)}"
         )
 
-        features = {
-            "age": float(payload["age"]),
-            "hypertension": int(payload["hypertension"]),
-            "heart_disease": int(payload["heart_disease"]),
-            "avg_glucose_level": float(payload["avg_glucose_level"]),
-            "bmi": float(payload["bmi"]),
-            "smoking_status": int(payload["smoking_status"]),
-            "ever_married": int(payload["ever_married"]),
-        }
+    with _schema_lock:
+        schema = _compiled_schemas.setdefault(
+            key, FeatureSchema(disease, [by_column[column] for column in order])
+        )
+    return schema
 
-    else:
-        raise ValueError(f"Unsupported disease type: {disease}")
 
-    return pd.DataFrame([features])
+def get_disease_features(disease: str, payload: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Extract features EXACTLY as the model was trained.
+
+    Convenience wrapper for callers that want a DataFrame; the prediction path
+    uses get_feature_schema(...).encode directly.
+    """
+    schema = get_feature_schema(disease)
+    return pd.DataFrame(schema.encode(payload), columns=schema.columns).astype(
+        {spec.column: spec.kind for spec in schema.specs}
+    )
+
+
+# =========================
+# ADVICE GENERATION
+# =========================
+def _build_advice_prompt(
+    disease_name: str, risk_label: str, risk_score: float, explanation: List[Dict[str, Any]]
+) -> str:
+    feature_labels = {
+        "age": "Age", "sex": "Sex", "bmi": "BMI", "glucose": "Fasting Glucose",
+        "trestbps": "Resting BP", "chol": "Cholesterol", "fbs": "Fasting Blood Sugar",
+        "restecg": "Resting ECG", "exang": "Exercise Angina", "slope": "ST Slope",
+        "hypertension": "Hypertension", "heart_disease": "Heart Disease",
+        "avg_glucose_level": "Avg Glucose", "smoking_status": "Smoking Status",
+        "ever_married": "Ever Married"
+    }
+    factors_list = [
+        f"{feature_labels.get(e['feature'], e['feature'])}: {e['value']:.1f}"
+        for e in explanation[:3]
+    ]
+    factors_text = ', '.join(factors_list)
+
+    return (
+        f"You are a medical advisor. A patient has {disease_name} with a {risk_label} risk level "
+        f"(risk score: {risk_score:.1%}). Key contributing factors are: {factors_text}. "
+        f"Provide 3-4 sentences of professional, actionable lifestyle and preventive health advice. "
+        f"Be empathetic, practical, and non-alarming. Focus on diet, exercise, stress management, and when to consult a doctor."
+    )
+
+
+def _advice_from_response(response: Any) -> Optional[str]:
+    print(f"[DEBUG] API response received: {response}")
+    advice_text = response.text.strip() if response and hasattr(response, 'text') else None
+    print(f"[DEBUG] Extracted text: {advice_text[:80] if advice_text else 'NONE'}...")
+
+    # Only use generated text if it's substantial
+    if advice_text and len(advice_text) >= 30:
+        print(f"[SUCCESS] Generated AI advice ({len(advice_text)} chars)")
+        return advice_text
+
+    print(f"[WARN] Generated text too short ({len(advice_text) if advice_text else 0} chars), using fallback")
+    return None
+
+
+def _log_advice_error(e: Exception) -> None:
+    error_msg = str(e)
+    print(f"[ERROR] Gemini API error: {type(e).__name__}: {error_msg[:100]}")
+    if "not found" not in error_msg and "not supported" not in error_msg:
+        # Model errors other than "not available" are worth a second log line
+        print(f"[WARN] Gemini advice generation failed: {e}")
+
+
+def _generate_llm_advice(advice_generator, disease: str, risk_label: str, advice_prompt: str) -> Optional[str]:
+    """Call the advice generator once; None means "use the static advice"."""
+    def _call():
+        with metrics.timer("predict", disease, "llm"):
+            return advice_generator.generate_content(advice_prompt)
+
+    try:
+        print(f"[DEBUG] Calling Gemini API for {disease} ({risk_label})")
+        response = llm_guard.call(_call)
+        return _advice_from_response(response)
+    except LLMUnavailable as e:
+        print(f"[INFO] Gemini call skipped ({e.reason}); using static advice")
+        return None
+    except Exception as e:
+        _log_advice_error(e)
+        return None
+
+
+async def _generate_llm_advice_async(
+    advice_generator, disease: str, risk_label: str, advice_prompt: str
+) -> Optional[str]:
+    """_generate_llm_advice, awaiting the Gemini call instead of blocking a thread."""
+    async def _call():
+        with metrics.timer("predict", disease, "llm"):
+            return await generate_content_async(advice_generator, advice_prompt)
+
+    try:
+        print(f"[DEBUG] Calling Gemini API for {disease} ({risk_label})")
+        response = await llm_guard.call_async(_call)
+        return _advice_from_response(response)
+    except LLMUnavailable as e:
+        print(f"[INFO] Gemini call skipped ({e.reason}); using static advice")
+        return None
+    except Exception as e:
+        _log_advice_error(e)
+        return None
 
 
 # =========================
@@ -112,157 +395,463 @@ def predict_disease_risk(
     payload: Dict[str, Any],
     models: Dict[str, Any],
     advice_generator=None,
+    advice_mode: Optional[str] = None,
 ) -> Dict[str, Any]:
+    """
+    Score one patient, explain the score and attach preventive advice.
+
+    advice_mode "inline" (default: SDP_ADVICE_MODE) waits for the LLM advice.
+    "deferred" returns the static advice at once plus an "advice_token" for
+    /api/advice/<token> while the LLM advice is generated in the background.
+    """
+    advice_mode = _check_advice_mode(advice_mode)
+    started = time.perf_counter()
+    model, schema, features, risk_score, risk_label, explanation = _score_patient(disease, payload, models)
+    disease_name = DISEASE_NAMES[disease]
+
+    # -------------------------
+    # Gemini AI ADVICE (with caching)
+    # -------------------------
+    def _generate() -> Optional[str]:
+        return _generate_llm_advice(
+            advice_generator,
+            disease,
+            risk_label,
+            _build_advice_prompt(disease_name, risk_label, risk_score, explanation),
+        )
+
+    # "advice" is cache lookup plus (inline) generation; "llm" is the Gemini call alone.
+    advice_token = None
+    with metrics.timer("predict", disease, "advice"):
+        if advice_generator is not None and advice_mode == "inline":
+            # Concurrent misses on the same cache key share one Gemini call.
+            advice_text = advice_cache.get_or_generate(disease, risk_label, explanation, _generate)
+        else:
+            advice_text = advice_cache.get(disease, risk_label, explanation)
+            if advice_text is None and advice_generator is not None:
+                # Deferred: generation (and caching) happens on the advice executor.
+                advice_token = deferred_advice.submit(
+                    lambda: advice_cache.get_or_generate(disease, risk_label, explanation, _generate),
+                    fallback=_static_advice(disease_name, risk_label),
+                )
+
+    result = _prediction_result(
+        disease, model, schema, features, risk_score, risk_label, explanation, advice_text
+    )
+    if advice_mode == "deferred":
+        result["advice_status"] = "pending" if advice_token else "ready"
+        result["advice_token"] = advice_token
+    metrics.observe("predict", disease, "total", time.perf_counter() - started)
+    return result
+
 
+async def predict_disease_risk_async(
+    disease: str,
+    payload: Dict[str, Any],
+    models: Dict[str, Any],
+    advice_generator=None,
+    advice_mode: Optional[str] = None,
+    executor: Optional[Executor] = None,
+) -> Dict[str, Any]:
+    """
+    predict_disease_risk for asyncio servers (see asgi.py).
+
+    Feature encoding, scoring and SHAP run on executor; inline LLM advice is
+    awaited on the event loop, so waiting on Gemini doesn't hold a thread.
+    Deferred advice mode already returns without waiting and simply runs
+    predict_disease_risk on executor.
+    """
+    advice_mode = _check_advice_mode(advice_mode)
+    loop = asyncio.get_running_loop()
+    if advice_generator is None or advice_mode == "deferred":
+        return await loop.run_in_executor(
+            executor, predict_disease_risk, disease, payload, models, advice_generator, advice_mode
+        )
+
+    started = time.perf_counter()
+    model, schema, features, risk_score, risk_label, explanation = await loop.run_in_executor(
+        executor, _score_patient, disease, payload, models
+    )
+    disease_name = DISEASE_NAMES[disease]
+
+    async def _generate() -> Optional[str]:
+        return await _generate_llm_advice_async(
+            advice_generator,
+            disease,
+            risk_label,
+            _build_advice_prompt(disease_name, risk_label, risk_score, explanation),
+        )
+
+    with metrics.timer("predict", disease, "advice"):
+        advice_text = await advice_cache.get_or_generate_async(disease, risk_label, explanation, _generate)
+
+    result = _prediction_result(
+        disease, model, schema, features, risk_score, risk_label, explanation, advice_text
+    )
+    metrics.observe("predict", disease, "total", time.perf_counter() - started)
+    return result
+
+
+def _check_advice_mode(advice_mode: Optional[str]) -> str:
+    advice_mode = (advice_mode or ADVICE_MODE).lower()
+    if advice_mode not in ("inline", "deferred"):
+        raise ValueError("advice_mode must be 'inline' or 'deferred'")
+    return advice_mode
+
+
+def _score_patient(disease: str, payload: Dict[str, Any], models: Dict[str, Any]):
+    """Model, schema, encoded features, risk score, risk label and SHAP explanation for payload."""
     model = models.get(disease)
     if model is None:
         raise RuntimeError(f"Model for '{disease}' not loaded")
 
-    # Build input
-    input_df = get_disease_features(disease, payload)
+    # Build input (validated and in the model's column order)
+    with metrics.timer("predict", disease, "features"):
+        schema = get_feature_schema(disease, model)
+        features = schema.encode(payload)
 
-    # -------------------------
-    # HARD SAFETY CHECK
-    # -------------------------
-    model_features = getattr(model, "feature_names_in_", None)
-    if model_features is not None:
-        if set(input_df.columns) != set(model_features):
-            raise ValueError(
-                f"Feature mismatch!\n"
-                f"Input: {set(input_df.columns)}\n"
-                f"Model: {set(model_features)}"
-            )
-        # Reorder input to match model's feature order
-        input_df = input_df[model_features]
+    # Identical inputs to the same model version skip scoring and SHAP.
+    cached = prediction_cache.get(disease, model, features)
+    if cached is not None:
+        risk_score, risk_label, explanation = cached
+        return model, schema, features, risk_score, risk_label, explanation
 
     # -------------------------
     # PREDICTION
     # -------------------------
-    risk_score = float(model.predict_proba(input_df)[0][1])
+    with metrics.timer("predict", disease, "predict"):
+        risk_score = float(predict_proba(model, features)[0][1])
     if disease == "hypertension":
         risk_score = 1.0 - risk_score
 
-    # Disease-specific thresholds
-    if disease == "stroke":
-        # Stroke uses different thresholds
-        if risk_score >= 0.6:
-            risk_label = "High"
-        elif risk_score >= 0.4:
-            risk_label = "Moderate"
-        else:
-            risk_label = "Low"
-    elif disease == "hypertension":
-        if risk_score >= 0.67:
-            risk_label = "High"
-        elif risk_score >= 0.33:
-            risk_label = "Moderate"
-        else:
-            risk_label = "Low"
-    else:
-        # Default thresholds for diabetes
-        if risk_score >= 0.7:
-            risk_label = "High"
-        elif risk_score >= 0.4:
-            risk_label = "Moderate"
-        else:
-            risk_label = "Low"
+    risk_label = _risk_label(disease, risk_score)
 
     # -------------------------
     # SHAP EXPLANATION
     # -------------------------
-    explanation = explain_with_shap(model, input_df, top_k=5)
+    with metrics.timer("predict", disease, "explain"):
+        explanation = explain_with_shap(model, features, top_k=5, feature_names=schema.columns)
 
-    disease_name = {
-        "diabetes": "Type 2 Diabetes",
-        "hypertension": "Hypertension",
-        "stroke": "Stroke Risk",
-    }[disease]
+    # A heuristic fallback (SHAP timed out or failed) is served once, not cached.
+    if not isinstance(explanation, HeuristicExplanation):
+        prediction_cache.set(disease, model, features, risk_score, risk_label, explanation)
+    return model, schema, features, risk_score, risk_label, explanation
 
-    # -------------------------
-    # Gemini AI ADVICE (with caching)
-    # -------------------------
-    advice_text = None
-    
-    # Try to get from cache first
-    cached_advice = advice_cache.get(disease, risk_label, explanation)
-    if cached_advice:
-        advice_text = cached_advice
-        print(f"[CACHE HIT] Using cached advice for {disease} ({risk_label} risk)")
-    elif advice_generator is not None:
-        feature_labels = {
-            "age": "Age", "sex": "Sex", "bmi": "BMI", "glucose": "Fasting Glucose",
-            "trestbps": "Resting BP", "chol": "Cholesterol", "fbs": "Fasting Blood Sugar",
-            "restecg": "Resting ECG", "exang": "Exercise Angina", "slope": "ST Slope",
-            "hypertension": "Hypertension", "heart_disease": "Heart Disease",
-            "avg_glucose_level": "Avg Glucose", "smoking_status": "Smoking Status",
-            "ever_married": "Ever Married"
-        }
-        factors_list = [
-            f"{feature_labels.get(e['feature'], e['feature'])}: {e['value']:.1f}"
-            for e in explanation[:3]
-        ]
-        factors_text = ', '.join(factors_list)
-        
-        advice_prompt = (
-            f"You are a medical advisor. A patient has {disease_name} with a {risk_label} risk level "
-            f"(risk score: {risk_score:.1%}). Key contributing factors are: {factors_text}. "
-            f"Provide 3-4 sentences of professional, actionable lifestyle and preventive health advice. "
-            f"Be empathetic, practical, and non-alarming. Focus on diet, exercise, stress management, and when to consult a doctor."
-        )
 
-        try:
-            print(f"[DEBUG] Calling Gemini API for {disease} ({risk_label})")
-            response = advice_generator.generate_content(advice_prompt)
-            print(f"[DEBUG] API response received: {response}")
-            advice_text = response.text.strip() if response and hasattr(response, 'text') else None
-            print(f"[DEBUG] Extracted text: {advice_text[:80] if advice_text else 'NONE'}...")
-            
-            # Only use generated text if it's substantial
-            if advice_text and len(advice_text) >= 30:
-                # Store in cache for future requests
-                advice_cache.set(disease, risk_label, explanation, advice_text)
-                print(f"[SUCCESS] Generated and cached AI advice ({len(advice_text)} chars)")
-            else:
-                print(f"[WARN] Generated text too short ({len(advice_text) if advice_text else 0} chars), using fallback")
-                advice_text = None
-            
-        except Exception as e:
-            error_msg = str(e)
-            print(f"[ERROR] Gemini API error: {type(e).__name__}: {error_msg[:100]}")
-            if "not found" in error_msg or "not supported" in error_msg:
-                # Model not available, use fallback silently
-                advice_text = None
-            else:
-                # Other errors, log them
-                print(f"[WARN] Gemini advice generation failed: {e}")
-                advice_text = None
-    
+def _prediction_result(disease: str, model: Any, schema: "FeatureSchema", features: np.ndarray,
+                       risk_score: float, risk_label: str, explanation: List[Dict[str, Any]],
+                       advice_text: Optional[str]) -> Dict[str, Any]:
+    disease_name = DISEASE_NAMES[disease]
     # Fallback to static advice if cache miss AND Gemini not available/failed
     if advice_text is None:
-        advice_map = {
-            "High": (
-                f"Your {disease_name} risk is high. "
-                "Please consult a healthcare professional as soon as possible. "
-                "Immediate lifestyle changes and medical evaluation are advised."
-            ),
-            "Moderate": (
-                f"You have moderate {disease_name} risk. "
-                "Regular exercise, dietary improvements, stress management, "
-                "and routine checkups are strongly recommended."
-            ),
-            "Low": (
-                f"Your {disease_name} risk is currently low. "
-                "Maintain a healthy lifestyle and continue regular health screenings."
-            ),
-        }
-        advice_text = advice_map[risk_label]
+        advice_text = _static_advice(disease_name, risk_label)
 
     return {
         "disease": disease,
         "disease_name": disease_name,
+        "model_version": model_version(model),
         "risk_score": risk_score,
         "risk_label": risk_label,
         "explanation": explanation,
         "advice": advice_text,
-        "input_features": input_df.to_dict(orient="records")[0],
+        "input_features": schema.to_record(features[0]),
+    }
+
+
+# =========================
+# BATCH PREDICTION
+# =========================
+def score_features(
+    disease: str,
+    model: Any,
+    features: np.ndarray,
+    explain: bool = True,
+    top_k: int = 5,
+    feature_names: Optional[Sequence[str]] = None,
+) -> Tuple[np.ndarray, np.ndarray, List[List[Dict[str, Any]]]]:
+    """
+    Score an encoded feature matrix with one predict_proba (and one SHAP pass
+    if explain). Returns risk scores, risk labels and per-row explanations
+    (empty lists when explain is False).
+    """
+    risk_scores = predict_proba(model, features)[:, 1].astype(float)
+    if disease == "hypertension":
+        risk_scores = 1.0 - risk_scores
+    risk_labels = _risk_labels(disease, risk_scores)
+
+    explanations = (
+        explain_batch_with_shap(model, features, top_k=top_k, feature_names=feature_names)
+        if explain
+        else [[] for _ in range(len(risk_scores))]
+    )
+    return risk_scores, risk_labels, explanations
+
+
+def predict_disease_risk_batch(
+    records: List[Dict[str, Any]],
+    models: Dict[str, Any],
+    default_disease: str = "diabetes",
+    explain: bool = True,
+    top_k: int = 5,
+) -> List[Dict[str, Any]]:
+    """
+    Score many (possibly mixed-disease) records with one predict_proba and one
+    SHAP pass per disease.
+
+    Results come back in input order. A record that fails validation gets
+    {"index": i, "error": "..."} instead of a prediction. Advice is always the
+    static advice: batch scoring never calls the LLM.
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(records)
+    groups: Dict[str, List[int]] = {}
+
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            results[i] = {"index": i, "error": "Record must be a JSON object"}
+            continue
+        disease = str(record.get("disease", default_disease)).lower()
+        if disease not in SUPPORTED_DISEASES:
+            results[i] = {
+                "index": i,
+                "error": "Unsupported disease type. Use: diabetes, hypertension, or stroke",
+            }
+        elif models.get(disease) is None:
+            results[i] = {"index": i, "error": f"Model for '{disease}' not loaded"}
+        else:
+            groups.setdefault(disease, []).append(i)
+
+    for disease, indices in groups.items():
+        model = models[disease]
+        schema = get_feature_schema(disease, model)
+        features, positions, errors = schema.encode_many([records[i] for i in indices])
+        for pos, message in errors.items():
+            results[indices[pos]] = {"index": indices[pos], "error": message}
+        if not positions:
+            continue
+
+        risk_scores, risk_labels, explanations = score_features(
+            disease, model, features, explain=explain, top_k=top_k, feature_names=schema.columns
+        )
+        disease_name = DISEASE_NAMES[disease]
+        version = model_version(model)
+
+        for row, pos in enumerate(positions):
+            index = indices[pos]
+            risk_label = str(risk_labels[row])
+            results[index] = {
+                "index": index,
+                "disease": disease,
+                "disease_name": disease_name,
+                "model_version": version,
+                "risk_score": float(risk_scores[row]),
+                "risk_label": risk_label,
+                "explanation": explanations[row],
+                "advice": _static_advice(disease_name, risk_label),
+                "input_features": schema.to_record(features[row]),
+            }
+
+    return results  # type: ignore[return-value]
+
+
+# =========================
+# WHAT-IF SWEEPS
+# =========================
+MAX_SWEEP_POINTS = int(os.getenv("SDP_MAX_SWEEP_POINTS", "40000"))
+
+
+def _sweep_values(schema: FeatureSchema, axis: Dict[str, Any]) -> Tuple[int, np.ndarray]:
+    """Column index and grid values for one sweep axis."""
+    if not isinstance(axis, dict):
+        raise ValueError("Each sweep axis must be an object")
+    field = axis.get("feature")
+    if field not in schema.fields:
+        raise ValueError(f"Sweep feature must be one of: {', '.join(schema.fields)}")
+    column = schema.fields.index(field)
+    spec = schema.specs[column]
+
+    if "values" in axis:
+        try:
+            values = np.asarray(axis["values"], dtype=np.float64).ravel()
+        except (TypeError, ValueError):
+            raise ValueError(f"Sweep values for '{field}' must be numbers")
+    else:
+        try:
+            start, stop = float(axis["start"]), float(axis["stop"])
+            steps = int(axis.get("steps", 50))
+        except KeyError as e:
+            raise ValueError(f"Sweep axis '{field}' needs 'values' or 'start' and 'stop' (missing {e})")
+        except (TypeError, ValueError):
+            raise ValueError(f"Sweep range for '{field}' must be numbers")
+        if not 1 <= steps <= MAX_SWEEP_POINTS:
+            raise ValueError(f"'steps' must be between 1 and {MAX_SWEEP_POINTS}")
+        values = np.linspace(start, stop, steps)
+
+    if values.size == 0 or not np.isfinite(values).all():
+        raise ValueError(f"Sweep values for '{field}' must be finite numbers")
+    if spec.kind is int:
+        # Same truncation as encode(); collapse the duplicates it creates.
+        values = np.unique(np.trunc(values))
+    return column, values
+
+
+def sweep_disease_risk(
+    disease: str,
+    payload: Dict[str, Any],
+    sweep: List[Dict[str, Any]],
+    models: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    Risk over a 1D or 2D grid of feature values around a base payload.
+
+    Each sweep axis is {"feature": field, "start": a, "stop": b, "steps": n}
+    or {"feature": field, "values": [...]}. The whole grid (plus the base
+    point) is encoded as one matrix and scored with a single predict_proba
+    call; no SHAP or advice. Scores come back as a list (1D) or nested
+    lists indexed [i][j] (2D), labels as indices into "risk_levels".
+    """
+    if disease not in SUPPORTED_DISEASES:
+        raise ValueError("Unsupported disease type. Use: diabetes, hypertension, or stroke")
+    if not isinstance(sweep, list) or not 1 <= len(sweep) <= 2:
+        raise ValueError("'sweep' must be a list of one or two axes")
+
+    model = models.get(disease)
+    if model is None:
+        raise RuntimeError(f"Model for '{disease}' not loaded")
+
+    schema = get_feature_schema(disease, model)
+    axes = [_sweep_values(schema, axis) for axis in sweep]
+    if len(axes) == 2 and axes[0][0] == axes[1][0]:
+        raise ValueError("The two sweep axes must use different features")
+
+    shape = tuple(len(values) for _, values in axes)
+    n_points = int(np.prod(shape))
+    if n_points > MAX_SWEEP_POINTS:
+        raise ValueError(f"Sweep grid too large ({n_points} points, max {MAX_SWEEP_POINTS})")
+
+    # Row 0 is the base payload, rows 1.. the grid in C order.
+    base = schema.encode(payload)
+    matrix = np.repeat(base, n_points + 1, axis=0)
+    grids = np.meshgrid(*(values for _, values in axes), indexing="ij")
+    for (column, _), grid in zip(axes, grids):
+        matrix[1:, column] = grid.ravel()
+
+    with metrics.timer("sweep", disease, "predict"):
+        risk_scores, _, _ = score_features(disease, model, matrix, explain=False)
+    levels = _risk_levels(disease, risk_scores)
+
+    return {
+        "disease": disease,
+        "model_version": model_version(model),
+        "base": {"risk_score": float(risk_scores[0]), "risk_label": RISK_LEVELS[levels[0]]},
+        "axes": [
+            {
+                "feature": schema.fields[column],
+                "values": (values.astype(int) if schema.specs[column].kind is int else values).tolist(),
+            }
+            for column, values in axes
+        ],
+        "shape": list(shape),
+        "risk_levels": list(RISK_LEVELS),
+        "risk_scores": np.round(risk_scores[1:], 4).reshape(shape).tolist(),
+        "risk_labels": levels[1:].reshape(shape).tolist(),
     }
+
+
+# =========================
+# MULTI-DISEASE ASSESSMENT
+# =========================
+# Other names a unified patient profile may use for a model's payload field.
+# Only fields with the same meaning and units are aliased.
+FIELD_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "highbp": ("hypertension", "high_blood_pressure"),
+    "hypertension": ("highbp", "high_blood_pressure"),
+}
+
+ASSESS_WORKERS = int(os.getenv("SDP_ASSESS_WORKERS", "8"))
+_assess_executor: Optional[ThreadPoolExecutor] = None
+_assess_lock = threading.Lock()
+
+
+def _get_assess_executor() -> ThreadPoolExecutor:
+    global _assess_executor
+    if _assess_executor is None:
+        with _assess_lock:
+            if _assess_executor is None:
+                _assess_executor = ThreadPoolExecutor(
+                    max_workers=ASSESS_WORKERS, thread_name_prefix="assess"
+                )
+    return _assess_executor
+
+
+def map_profile(disease: str, profile: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Build disease's /api/predict payload from a unified profile.
+
+    Each field is taken from the profile under its own name or one of its
+    FIELD_ALIASES. Returns the payload and the fields that could not be found.
+    """
+    payload: Dict[str, Any] = {"disease": disease}
+    missing: List[str] = []
+    for spec in FEATURE_SPECS[disease]:
+        for name in (spec.field,) + FIELD_ALIASES.get(spec.field, ()):
+            if profile.get(name) is not None:
+                payload[spec.field] = profile[name]
+                break
+        else:
+            missing.append(spec.field)
+    return payload, missing
+
+
+def assess_patient(
+    profile: Dict[str, Any],
+    models: Dict[str, Any],
+    advice_generator=None,
+    advice_mode: Optional[str] = None,
+    diseases: Optional[Iterable[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Score one patient profile for several diseases concurrently.
+
+    Without diseases, every supported disease whose fields are all present in
+    the profile (and whose model is loaded) is scored. Explicitly requested
+    diseases that cannot be scored are reported under "errors"; the others
+    under "skipped". Each disease runs the full predict_disease_risk path
+    (result cache, SHAP, advice) on its own thread, so latency tracks the
+    slowest disease rather than the sum.
+    """
+    requested = diseases is not None
+    targets = [str(d).lower() for d in diseases] if requested else list(SUPPORTED_DISEASES)
+
+    payloads: Dict[str, Dict[str, Any]] = {}
+    skipped: Dict[str, str] = {}
+    for disease in dict.fromkeys(targets):
+        if disease not in SUPPORTED_DISEASES:
+            reason = "Unsupported disease type. Use: diabetes, hypertension, or stroke"
+        elif models.get(disease) is None:
+            reason = f"Model for '{disease}' not loaded"
+        else:
+            payload, missing = map_profile(disease, profile)
+            if not missing:
+                payloads[disease] = payload
+                continue
+            reason = f"Missing required fields: {', '.join(missing)}"
+        skipped[disease] = reason
+
+    def _run(disease: str) -> Dict[str, Any]:
+        return predict_disease_risk(disease, payloads[disease], models, advice_generator, advice_mode)
+
+    # The first disease runs on the request thread, the rest on the pool.
+    order = list(payloads)
+    futures = {d: _get_assess_executor().submit(_run, d) for d in order[1:]}
+    results: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    for disease in order:
+        try:
+            results[disease] = _run(disease) if disease == order[0] else futures[disease].result()
+        except (KeyError, ValueError) as e:
+            errors[disease] = str(e)
+
+    if requested:
+        errors.update(skipped)
+        skipped = {}
+    return {"results": results, "errors": errors, "skipped": skipped}
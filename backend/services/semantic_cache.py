@@ -0,0 +1,261 @@
+"""
+Semantic tier of the chatbot response cache.
+
+Each message is embedded with a small sentence encoder (mean-pooled
+MiniLM on the transformers/torch stack the sentiment pipeline already
+uses), and replies are kept per sentiment label next to their unit-norm
+vectors in a float32 NumPy matrix. A lookup is one exact top-1 cosine
+search (a matrix-vector product); the reply is served when the best
+similarity reaches SDP_SEMANTIC_THRESHOLD. At a few thousand 384-d rows
+per label that costs well under a millisecond, so no approximate index
+is needed.
+
+Each label holds at most SDP_SEMANTIC_MAX_ENTRIES rows: expired rows are
+overwritten first, then the least recently used one. The index lives in
+the worker process; the exact tier in front of it (ChatbotResponseCache)
+can still be the shared SQLite store.
+
+Enable with SDP_CHAT_SEMANTIC_CACHE=1. Check the threshold with
+benchmarks/eval_semantic_cache.py.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .sentiment_backends import SENTIMENT_THREADS, pin_threads
+
+SEMANTIC_CACHE = os.getenv("SDP_CHAT_SEMANTIC_CACHE", "0") == "1"
+SEMANTIC_MODEL = os.getenv("SDP_SEMANTIC_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+SEMANTIC_THRESHOLD = float(os.getenv("SDP_SEMANTIC_THRESHOLD", "0.9"))
+SEMANTIC_MAX_ENTRIES = int(os.getenv("SDP_SEMANTIC_MAX_ENTRIES", "2000"))  # per sentiment label
+
+Encoder = Callable[[List[str]], np.ndarray]
+
+
+def normalize_message(message: str) -> str:
+    """Lowercased, whitespace-collapsed message: the exact-match key text."""
+    return " ".join(message.lower().split())
+
+
+class SentenceEncoder:
+    """
+    Mean-pooled, L2-normalized sentence embeddings from a HuggingFace
+    encoder. transformers and torch are imported on the first call.
+    Recent embeddings are memoized, so a lookup followed by a store of the
+    same message encodes it once.
+    """
+
+    def __init__(self, model_name: str = SEMANTIC_MODEL, num_threads: Optional[int] = SENTIMENT_THREADS,
+                 max_length: int = 128, memo_size: int = 256):
+        self.model_name = model_name
+        self.num_threads = num_threads
+        self.max_length = max_length
+        self.memo_size = memo_size
+        self._model = None
+        self._tokenizer = None
+        self._lock = threading.Lock()
+        self._memo: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+    def load(self) -> Tuple[Any, Any]:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from transformers import AutoModel, AutoTokenizer
+
+                    pin_threads(self.num_threads)
+                    self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+                    model = AutoModel.from_pretrained(self.model_name)
+                    model.eval()
+                    self._model = model
+                    print(f"[INFO] Sentence encoder loaded ({self.model_name})")
+        return self._tokenizer, self._model
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        import torch
+
+        tokenizer, model = self.load()
+        batch = tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="pt")
+        with torch.inference_mode():
+            hidden = model(**batch).last_hidden_state
+        mask = batch["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        vectors = pooled.numpy().astype(np.float32)
+        vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        with self._lock:
+            cached = [self._memo.get(t) for t in texts]
+        missing = [t for t, v in zip(texts, cached) if v is None]
+        if missing:
+            fresh = dict(zip(missing, self._encode(missing)))
+            with self._lock:
+                for text, vector in fresh.items():
+                    self._memo[text] = vector
+                    self._memo.move_to_end(text)
+                while len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+            cached = [v if v is not None else fresh[t] for t, v in zip(texts, cached)]
+        return np.stack(cached)
+
+
+class _LabelIndex:
+    """Unit vectors and replies for one sentiment label, in preallocated rows."""
+
+    def __init__(self, dim: int, max_entries: int):
+        self.max_entries = max_entries
+        self.vectors = np.zeros((min(64, max_entries), dim), dtype=np.float32)
+        self.created = np.zeros(len(self.vectors))
+        self.last_used = np.zeros(len(self.vectors))
+        self.texts: List[Optional[str]] = [None] * len(self.vectors)
+        self.replies: List[Optional[str]] = [None] * len(self.vectors)
+        self.size = 0
+
+    def search(self, vector: np.ndarray, expired_before: float) -> Tuple[int, float]:
+        """Row and cosine similarity of the best live match, or (-1, -1.0)."""
+        if self.size == 0:
+            return -1, -1.0
+        scores = self.vectors[:self.size] @ vector
+        scores[self.created[:self.size] < expired_before] = -1.0
+        row = int(np.argmax(scores))
+        score = float(scores[row])
+        return (row, score) if score > -1.0 else (-1, -1.0)
+
+    def _grow(self) -> None:
+        capacity = min(self.max_entries, len(self.vectors) * 2)
+        extra = capacity - len(self.vectors)
+        self.vectors = np.vstack([self.vectors, np.zeros((extra, self.vectors.shape[1]), dtype=np.float32)])
+        self.created = np.concatenate([self.created, np.zeros(extra)])
+        self.last_used = np.concatenate([self.last_used, np.zeros(extra)])
+        self.texts += [None] * extra
+        self.replies += [None] * extra
+
+    def slot_for_new(self, expired_before: float) -> Tuple[int, bool]:
+        """Row to write a new entry to, and whether it evicts a live entry."""
+        if self.size < self.max_entries:
+            if self.size == len(self.vectors):
+                self._grow()
+            self.size += 1
+            return self.size - 1, False
+        # Full: reuse an expired row if there is one, else the least recently used.
+        live = self.created[:self.size] >= expired_before
+        row = int(np.argmin(np.where(live, self.last_used[:self.size], -np.inf)))
+        return row, bool(live[row])
+
+    def write(self, row: int, vector: np.ndarray, text: str, reply: str, now: float) -> None:
+        self.vectors[row] = vector
+        self.created[row] = now
+        self.last_used[row] = now
+        self.texts[row] = text
+        self.replies[row] = reply
+
+
+class SemanticResponseCache:
+    """
+    Nearest-neighbour reply cache, one index per sentiment label.
+
+    lookup() returns the reply stored for the most similar earlier message
+    with the same label if its cosine similarity is at least threshold;
+    store() adds a message (or replaces a near-identical one). If the
+    encoder cannot be loaded the tier turns itself off and lookups miss;
+    if encoding one message fails, only that call skips the tier.
+    """
+
+    def __init__(self, encoder: Optional[Encoder] = None, threshold: float = SEMANTIC_THRESHOLD,
+                 max_entries: int = SEMANTIC_MAX_ENTRIES, ttl_seconds: float = 240 * 60.0,
+                 enabled: bool = True):
+        self.encoder = encoder or SentenceEncoder()
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self._indexes: Dict[str, _LabelIndex] = {}
+        self.hit_count = 0
+        self.miss_count = 0
+        self.eviction_count = 0
+        self.error_count = 0
+        self._hit_similarity_total = 0.0
+
+    def _embed(self, message: str) -> Optional[np.ndarray]:
+        if not self.enabled:
+            return None
+        load = getattr(self.encoder, "load", None)
+        try:
+            if load is not None:
+                load()
+        except Exception as e:
+            # No model (or no transformers/torch): it won't load on a later call either.
+            print(f"[WARN] Sentence encoder unavailable, semantic chat cache disabled: {e}")
+            self.enabled = False
+            return None
+        try:
+            return self.encoder([normalize_message(message)])[0]
+        except Exception as e:
+            # A failure for this message only; skip the tier for this call.
+            print(f"[WARN] Sentence encoder failed, skipping the semantic chat cache: {e}")
+            with self.lock:
+                self.error_count += 1
+            return None
+
+    def lookup(self, label: str, message: str) -> Optional[str]:
+        vector = self._embed(message)
+        if vector is None:
+            return None
+        now = time.time()
+        with self.lock:
+            index = self._indexes.get(label)
+            row, score = index.search(vector, now - self.ttl_seconds) if index is not None else (-1, -1.0)
+            if row < 0 or score < self.threshold:
+                self.miss_count += 1
+                return None
+            index.last_used[row] = now
+            self.hit_count += 1
+            self._hit_similarity_total += score
+            return index.replies[row]
+
+    def store(self, label: str, message: str, reply: str) -> None:
+        vector = self._embed(message)
+        if vector is None:
+            return
+        now = time.time()
+        expired_before = now - self.ttl_seconds
+        with self.lock:
+            index = self._indexes.get(label)
+            if index is None:
+                index = self._indexes[label] = _LabelIndex(len(vector), self.max_entries)
+            row, score = index.search(vector, expired_before)
+            if row < 0 or score < 0.999:
+                row, evicted = index.slot_for_new(expired_before)
+                if evicted:
+                    self.eviction_count += 1
+            index.write(row, vector, normalize_message(message), reply, now)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            hits, misses = self.hit_count, self.miss_count
+            return {
+                "semantic_enabled": self.enabled,
+                "semantic_hit_count": hits,
+                "semantic_miss_count": misses,
+                "semantic_mean_hit_similarity": round(self._hit_similarity_total / hits, 4) if hits else 0.0,
+                "semantic_size": sum(index.size for index in self._indexes.values()),
+                "semantic_evictions": self.eviction_count,
+                "semantic_errors": self.error_count,
+                "semantic_threshold": self.threshold,
+                "semantic_max_entries": self.max_entries,
+            }
+
+    def clear(self) -> None:
+        with self.lock:
+            self._indexes.clear()
+            self.hit_count = 0
+            self.miss_count = 0
+            self.eviction_count = 0
+            self.error_count = 0
+            self._hit_similarity_total = 0.0
@@ -0,0 +1,258 @@
+"""
+CPU inference backends for the sentiment pipeline.
+
+- "fp32": the stock transformers pipeline in eager PyTorch (default)
+- "int8": the same model with torch dynamic int8 quantization of its Linear layers
+- "onnx": the model exported once to ONNX and run with onnxruntime
+
+Every backend returns a callable with the pipeline's contract:
+analyzer(text_or_texts, batch_size=None) -> [{"label": ..., "score": ...}, ...].
+Non-fp32 backends are checked against fp32 on PARITY_SAMPLES when they load
+and fall back to fp32 if labels disagree too often.
+"""
+
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SENTIMENT_BACKENDS = ("fp32", "int8", "onnx")
+SENTIMENT_BACKEND = os.getenv("SDP_SENTIMENT_BACKEND", "fp32").strip().lower()
+# Same model pipeline("sentiment-analysis") picks by default, pinned so every
+# backend quantizes/exports the weights fp32 serves.
+SENTIMENT_MODEL = os.getenv(
+    "SDP_SENTIMENT_MODEL", "distilbert/distilbert-base-uncased-finetuned-sst-2-english"
+)
+# Intra-op threads per worker process; unset keeps the library default (all cores).
+_threads = os.getenv("SDP_SENTIMENT_THREADS", "").strip()
+SENTIMENT_THREADS = int(_threads) if _threads else None
+SENTIMENT_ONNX_DIR = os.getenv("SDP_SENTIMENT_ONNX_DIR", os.path.join(BASE_DIR, "models", "sentiment_onnx"))
+SENTIMENT_PARITY = os.getenv("SDP_SENTIMENT_PARITY", "1") == "1"
+SENTIMENT_PARITY_MIN_AGREEMENT = float(os.getenv("SDP_SENTIMENT_PARITY_MIN_AGREEMENT", "0.95"))
+
+# Fixed sample set for the parity check, in the register of /api/chat.
+PARITY_SAMPLES = (
+    "I feel really anxious about my exams tomorrow",
+    "Today was a great day, I finally finished my project",
+    "I can't sleep and everything feels heavy",
+    "My friends surprised me with dinner, I'm so grateful",
+    "Nothing I do ever seems to matter",
+    "I went for a run this morning and feel refreshed",
+    "I'm tired of pretending that I'm okay",
+    "Thanks for listening, talking helped a lot",
+    "I'm stressed about money and my rent is due",
+    "I got the job offer I was hoping for!",
+    "I feel lonely even when I'm around people",
+    "The weather is nice and I spent time in the park",
+    "I keep making mistakes at work and my boss is angry",
+    "I'm proud of myself for asking for help",
+    "I don't know how to stop overthinking everything",
+    "My exam results came back better than expected",
+    "I had an argument with my parents again",
+    "Meditation has been helping me stay calm",
+    "I feel like a burden to everyone around me",
+    "I'm excited to visit my family this weekend",
+    "My heart races whenever I have to speak in class",
+    "I finally cleaned my room and it feels good",
+    "I haven't eaten properly in days",
+    "Just checking in, nothing special today",
+)
+
+
+def pin_threads(num_threads: Optional[int]) -> None:
+    """Pin torch intra-op threads (and a single inter-op thread) for this process."""
+    if not num_threads:
+        return
+    import torch
+
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only allowed before the first parallel op; intra-op pinning still applies.
+        pass
+
+
+def _load_fp32(model_name: str, num_threads: Optional[int]) -> Callable:
+    from transformers import pipeline
+
+    pin_threads(num_threads)
+    return pipeline("sentiment-analysis", model=model_name)
+
+
+def _load_int8(model_name: str, num_threads: Optional[int]) -> Callable:
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+
+    try:
+        from torch.ao.quantization import quantize_dynamic
+    except ImportError:  # torch < 1.10
+        from torch.quantization import quantize_dynamic
+
+    pin_threads(num_threads)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+    model = quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer)
+
+
+class OnnxSentimentPipeline:
+    """
+    Sentiment classifier on an onnxruntime session, called like the
+    transformers pipeline. Each call (or batch_size chunk) is one padded
+    forward pass.
+    """
+
+    def __init__(self, session, tokenizer, id2label: Dict[int, str], max_length: int = 512):
+        self.session = session
+        self.tokenizer = tokenizer
+        self.id2label = id2label
+        self.max_length = max_length
+        self.input_names = [i.name for i in session.get_inputs()]
+
+    def _run(self, texts: List[str]) -> List[Dict[str, Any]]:
+        encoded = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+        )
+        feeds = {name: encoded[name].astype(np.int64) for name in self.input_names}
+        logits = self.session.run(None, feeds)[0]
+        logits = logits - logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+        best = probs.argmax(axis=1)
+        return [
+            {"label": self.id2label[int(i)], "score": float(probs[row, i])}
+            for row, i in enumerate(best)
+        ]
+
+    def __call__(self, inputs, batch_size: Optional[int] = None, **kwargs) -> List[Dict[str, Any]]:
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        step = batch_size or len(texts) or 1
+        results: List[Dict[str, Any]] = []
+        for start in range(0, len(texts), step):
+            results.extend(self._run(texts[start:start + step]))
+        return results
+
+
+def _export_onnx(model_name: str, export_dir: str) -> str:
+    """Export model_name to export_dir/model.onnx (with tokenizer/config) once."""
+    path = os.path.join(export_dir, "model.onnx")
+    if os.path.exists(path):
+        return path
+
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    print(f"[INFO] Exporting sentiment model {model_name} to ONNX: {path}")
+    os.makedirs(export_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+
+    sample = dict(tokenizer(["export sample"], return_tensors="pt"))
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in sample}
+    dynamic_axes["logits"] = {0: "batch"}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample,),
+            tmp_path,
+            input_names=list(sample),
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    tokenizer.save_pretrained(export_dir)
+    model.config.save_pretrained(export_dir)
+    # Workers sharing the directory only ever see a complete graph.
+    os.replace(tmp_path, path)
+    return path
+
+
+def _load_onnx(model_name: str, num_threads: Optional[int], export_dir: str = SENTIMENT_ONNX_DIR) -> Callable:
+    import onnxruntime as ort
+    from transformers import AutoConfig, AutoTokenizer
+
+    path = _export_onnx(model_name, export_dir)
+    options = ort.SessionOptions()
+    if num_threads:
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+    config = AutoConfig.from_pretrained(export_dir)
+    tokenizer = AutoTokenizer.from_pretrained(export_dir)
+    id2label = {int(k): v for k, v in config.id2label.items()}
+    return OnnxSentimentPipeline(session, tokenizer, id2label)
+
+
+_LOADERS = {"fp32": _load_fp32, "int8": _load_int8, "onnx": _load_onnx}
+
+
+def check_parity(candidate: Callable, reference: Callable, samples=PARITY_SAMPLES) -> Dict[str, Any]:
+    """Compare candidate against reference on samples: label agreement and score drift."""
+    expected = reference(list(samples))
+    actual = candidate(list(samples))
+    agree = [e["label"] == a["label"] for e, a in zip(expected, actual)]
+    drift = [abs(e["score"] - a["score"]) for e, a in zip(expected, actual)]
+    return {
+        "samples": len(agree),
+        "label_agreement": sum(agree) / len(agree) if agree else 1.0,
+        "max_score_diff": max(drift) if drift else 0.0,
+        "mismatches": [s for s, ok in zip(samples, agree) if not ok],
+    }
+
+
+def build_sentiment_pipeline(
+    backend: str = SENTIMENT_BACKEND,
+    model_name: str = SENTIMENT_MODEL,
+    num_threads: Optional[int] = SENTIMENT_THREADS,
+    parity: bool = SENTIMENT_PARITY,
+    min_agreement: float = SENTIMENT_PARITY_MIN_AGREEMENT,
+) -> Callable:
+    """
+    Build the sentiment analyzer for backend. Unknown backends, missing
+    optional dependencies, load errors and failed parity checks all fall back
+    to fp32 with a warning.
+    """
+    backend = backend.strip().lower()
+    if backend not in _LOADERS:
+        print(f"[WARN] Unknown sentiment backend '{backend}', using fp32")
+        backend = "fp32"
+    if backend == "fp32":
+        return _load_fp32(model_name, num_threads)
+
+    try:
+        candidate = _LOADERS[backend](model_name, num_threads)
+    except ImportError as e:
+        print(f"[WARN] Sentiment backend '{backend}' unavailable ({e}), using fp32")
+        return _load_fp32(model_name, num_threads)
+    except Exception as e:
+        print(f"[ERROR] Could not load sentiment backend '{backend}': {e}. Using fp32")
+        return _load_fp32(model_name, num_threads)
+
+    if not parity:
+        print(f"[INFO] Sentiment backend '{backend}' loaded (parity check skipped)")
+        return candidate
+
+    reference = _load_fp32(model_name, num_threads)
+    result = check_parity(candidate, reference)
+    if result["label_agreement"] < min_agreement:
+        print(
+            f"[WARN] Sentiment backend '{backend}' failed parity "
+            f"({result['label_agreement']:.1%} < {min_agreement:.1%}, "
+            f"mismatches: {result['mismatches']}). Using fp32"
+        )
+        return reference
+
+    print(
+        f"[INFO] Sentiment backend '{backend}' passed parity: "
+        f"{result['label_agreement']:.1%} label agreement, "
+        f"max score diff {result['max_score_diff']:.4f}"
+    )
+    return candidate
@@ -0,0 +1,247 @@
+"""
+Out-of-process SHAP explanations (SDP_SHAP_MODE=process).
+
+TreeExplainer.shap_values holds the GIL for most of its work, so under
+concurrent /api/predict traffic explanations serialize on the request
+threads. In process mode they run in a pool of warm worker processes
+instead: each worker loads every model file under MODELS_DIR and builds its
+explainer once, and a request only ships the model path/version, the
+encoded feature row and the feature names.
+
+If an explanation takes longer than SDP_SHAP_TIMEOUT_MS the request gets
+the heuristic explanation (a HeuristicExplanation, so callers can tell it
+from SHAP); when every worker is still busy with timed-out jobs the pool is
+restarted. Until the pool has finished starting, and for
+models that were not loaded from a file, explanations run inline as before.
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .cache_service import is_newer_version
+from .xai_service import _explain_inline, _heuristic_explanation, get_tree_explainer
+
+# Every web worker (WEB_CONCURRENCY, exported by gunicorn.conf.py) has its own
+# pool, so by default they split the cores between them.
+WEB_WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+SHAP_WORKERS = int(os.getenv("SDP_SHAP_WORKERS", "0")) or max(1, (os.cpu_count() or 1) // WEB_WORKERS)
+SHAP_TIMEOUT_MS = float(os.getenv("SDP_SHAP_TIMEOUT_MS", "2000"))
+
+# Worker-side state: {model path: loaded model}, and {model path: caller
+# version the file on disk could not provide}, so requests for it fail fast.
+_worker_models: Dict[str, Any] = {}
+_worker_unavailable: Dict[str, Optional[str]] = {}
+
+
+class ModelVersionMismatch(RuntimeError):
+    """The worker has no copy of the model version the caller is using."""
+
+
+def _default_model_paths() -> List[str]:
+    from .model_loader import MODEL_FILES, MODELS_DIR
+
+    paths = [os.path.join(MODELS_DIR, name) for name in MODEL_FILES.values() if name]
+    return [path for path in paths if os.path.exists(path)]
+
+
+def _load_worker_model(path: str) -> Any:
+    from .model_loader import _safe_load_model
+
+    # Map the arrays the estimators keep as-is from the page cache, shared by
+    # every SHAP worker on the host instead of copied into each.
+    model = _safe_load_model(path, mmap_mode="r")
+    if model is not None:
+        get_tree_explainer(model)
+        _worker_models[path] = model
+    return model
+
+
+def _init_worker(model_paths: Sequence[str]) -> None:
+    # Workers are processes of their own; keep BLAS/OpenMP from oversubscribing the cores.
+    try:
+        from threadpoolctl import threadpool_limits
+
+        threadpool_limits(1)
+    except ImportError:
+        pass
+    for path in model_paths:
+        try:
+            _load_worker_model(path)
+        except Exception as e:
+            print(f"[WARN] SHAP worker could not load {path}: {e}")
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _explain_in_worker(path: str, version: Optional[str], row: np.ndarray,
+                       feature_names: List[str], top_k: int) -> List[Dict]:
+    model = _worker_models.get(path)
+    current = getattr(model, "_sdp_model_version", None)
+    if model is None or current != version:
+        # Reload only for a caller newer than this worker's copy, and only once
+        # per version: a caller still on a replaced model must not make every
+        # request load the file again.
+        if (model is None or is_newer_version(version, current)) and _worker_unavailable.get(path) != version:
+            model = _load_worker_model(path)
+            current = getattr(model, "_sdp_model_version", None)
+        if model is None or current != version:
+            _worker_unavailable[path] = version
+            raise ModelVersionMismatch(f"{path}: worker has version {current}, caller has {version}")
+    return _explain_inline(model, row, top_k, feature_names)
+
+
+class ShapProcessPool:
+    """
+    Pool of worker processes that explain single rows with SHAP.
+
+    explain() returns None when the pool can't serve the request (not started
+    yet, or the model has no file path); the caller then explains inline.
+    """
+
+    def __init__(self, max_workers: int = SHAP_WORKERS, timeout_ms: float = SHAP_TIMEOUT_MS):
+        self.max_workers = max(1, max_workers)
+        self.timeout_s = max(0.0, timeout_ms) / 1000.0
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self.submitted = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.inline = 0
+        self.version_mismatches = 0
+        self.resets = 0
+        # Timed-out jobs still running in a worker; cancel() can't stop them.
+        self._abandoned: set = set()
+
+    def start(self, model_paths: Optional[Sequence[str]] = None) -> None:
+        """Start the workers (once per process); they preload model_paths."""
+        if self._executor is not None and self._pid == os.getpid():
+            return
+        with self.lock:
+            if self._executor is not None and self._pid == os.getpid():
+                return
+            if model_paths is None:
+                model_paths = _default_model_paths()
+            # spawn, not fork: the parent is a threaded web worker.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(list(model_paths),),
+            )
+            self._pid = os.getpid()
+            self.ready.clear()
+            print(f"[INFO] Starting {self.max_workers} SHAP worker processes ({len(model_paths)} models)")
+            for _ in range(self.max_workers):
+                self._executor.submit(_ping).add_done_callback(self._on_ping)
+
+    def _on_ping(self, future) -> None:
+        if not future.cancelled() and future.exception() is None:
+            self.ready.set()
+
+    def explain(self, model: Any, matrix: np.ndarray, feature_names: List[str],
+                top_k: int) -> Optional[List[Dict]]:
+        path = getattr(model, "_sdp_model_path", None)
+        if path is None:
+            return None
+
+        self.start()
+        if not self.ready.is_set():
+            with self.lock:
+                self.inline += 1
+            return None
+
+        executor = self._executor
+        try:
+            with self.lock:
+                self.submitted += 1
+            future = executor.submit(
+                _explain_in_worker, path, getattr(model, "_sdp_model_version", None),
+                np.ascontiguousarray(matrix[:1], dtype=np.float64), list(feature_names), top_k,
+            )
+            return future.result(timeout=self.timeout_s)
+        except FutureTimeoutError:
+            self._abandon(executor, future)
+            print(f"[WARN] SHAP worker timed out after {self.timeout_s * 1000:.0f}ms; using heuristic explanation")
+            # Marked as heuristic, so it isn't mistaken for (or cached as) SHAP.
+            return _heuristic_explanation(matrix, top_k=top_k, feature_names=feature_names)
+        except ModelVersionMismatch:
+            # The parent still uses a model the workers don't have (or the
+            # reverse, until the parent reloads); explain it inline.
+            with self.lock:
+                self.version_mismatches += 1
+            return None
+        except BrokenProcessPool as e:
+            print(f"[WARN] SHAP worker pool broke ({e}); restarting it")
+            self.reset(executor)
+        except Exception as e:
+            print(f"[WARN] SHAP worker failed: {e}")
+        with self.lock:
+            self.errors += 1
+        return None
+
+    def _abandon(self, executor: ProcessPoolExecutor, future) -> None:
+        """
+        Count a timed-out job. A queued job is cancelled; a running one keeps
+        its worker busy until it finishes, so once every worker is stuck on
+        abandoned jobs the pool is replaced.
+        """
+        cancelled = future.cancel()
+        with self.lock:
+            self.timeouts += 1
+            if cancelled or executor is not self._executor:
+                return
+            self._abandoned.add(future)
+            backlog = len(self._abandoned)
+        future.add_done_callback(self._abandoned.discard)
+        if backlog >= self.max_workers:
+            print(f"[WARN] {backlog} timed-out SHAP jobs still running; restarting the worker pool")
+            self.reset(executor, terminate=True)
+
+    def reset(self, executor: Optional[ProcessPoolExecutor] = None, terminate: bool = False) -> None:
+        """
+        Stop the workers (only if executor is still the current pool, when
+        given); the next explain() starts fresh ones. terminate kills workers
+        that are busy instead of letting them finish.
+        """
+        with self.lock:
+            if executor is not None and executor is not self._executor:
+                return
+            executor, self._executor = self._executor, None
+            self._abandoned = set()
+            self.ready.clear()
+            self.resets += 1
+        if executor is None or self._pid != os.getpid():
+            return
+        processes = list((getattr(executor, "_processes", None) or {}).values()) if terminate else []
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "running": self._executor is not None and self._pid == os.getpid(),
+                "ready": self.ready.is_set(),
+                "submitted": self.submitted,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "inline": self.inline,
+                "version_mismatches": self.version_mismatches,
+                "abandoned": len(self._abandoned),
+                "resets": self.resets,
+                "max_workers": self.max_workers,
+            }
+
+
+# Global instance
+shap_pool = ShapProcessPool()
@@ -0,0 +1,334 @@
+"""
+Optional NumPy inference engine for the tree-ensemble models.
+
+For a single row, sklearn's RandomForest.predict_proba (behind
+CalibratedClassifierCV) and XGBClassifier.predict_proba spend most of their
+time in Python-level validation and dispatch, not in tree traversal. This
+module flattens the loaded ensembles once into contiguous node arrays and
+scores rows by walking every tree at once with vectorized gathers.
+
+Supported: sklearn RandomForest/ExtraTrees/DecisionTree classifiers,
+XGBoost binary:logistic gbtree models, and CalibratedClassifierCV (sigmoid
+or isotonic) around either. Each compiled model is checked against the
+original predict_proba on probe rows and is only used if every probability
+matches to within PARITY_TOLERANCE.
+
+Enable with SDP_INFERENCE_ENGINE=compiled. The engine is meant for the
+single-row hot path: for large batches the libraries' native traversal wins,
+so inputs above SDP_COMPILED_MAX_ROWS rows still go to predict_proba.
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .cache_service import is_newer_version, model_version
+
+INFERENCE_ENGINE = os.getenv("SDP_INFERENCE_ENGINE", "sklearn").strip().lower()  # "sklearn" or "compiled"
+
+COMPILED_MAX_ROWS = int(os.getenv("SDP_COMPILED_MAX_ROWS", "64"))
+
+PARITY_TOLERANCE = 1e-6
+
+
+class _FlatTrees:
+    """
+    Every tree of an ensemble in one set of node arrays.
+
+    Leaves point back at themselves, so after max_depth steps each row sits
+    on its leaf in every tree without any per-row branching.
+    """
+
+    __slots__ = ("feature", "threshold", "left", "right", "default_left", "roots", "depth", "strict", "dtype")
+
+    def __init__(self, feature, threshold, left, right, default_left, roots, depth, strict, dtype):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.roots = roots
+        self.depth = depth
+        self.strict = strict  # XGBoost goes left on x < t, sklearn on x <= t
+        self.dtype = dtype  # precision the original library compares in
+
+    def leaves(self, X: np.ndarray) -> np.ndarray:
+        """Return the (n_rows, n_trees) global leaf index reached by each row."""
+        X = np.asarray(X).astype(self.dtype)
+        if self.dtype == np.float32 and not self.strict:
+            # sklearn compares float32 features against float64 thresholds.
+            X = X.astype(np.float64)
+
+        idx = np.tile(self.roots, (X.shape[0], 1))
+        rows = np.arange(X.shape[0])[:, None]
+
+        for _ in range(self.depth):
+            x = X[rows, self.feature[idx]]
+            thr = self.threshold[idx]
+            go_left = x < thr if self.strict else x <= thr
+            if self.default_left is not None:
+                go_left = np.where(np.isnan(x), self.default_left[idx], go_left)
+            idx = np.where(go_left, self.left[idx], self.right[idx])
+
+        return idx
+
+
+def _stack_trees(trees: List[Dict[str, np.ndarray]], strict: bool, dtype, threshold_dtype) -> Tuple[_FlatTrees, int]:
+    """Concatenate per-tree arrays (local child indices, -1 for leaves)."""
+    offsets = np.cumsum([0] + [len(t["left"]) for t in trees])
+    features, thresholds, lefts, rights, defaults = [], [], [], [], []
+    depth = 0
+
+    for t, offset in zip(trees, offsets[:-1]):
+        n = len(t["left"])
+        local = np.arange(n)
+        is_leaf = t["left"] < 0
+        lefts.append(np.where(is_leaf, local, t["left"]) + offset)
+        rights.append(np.where(is_leaf, local, t["right"]) + offset)
+        features.append(np.where(is_leaf, 0, t["feature"]))
+        thresholds.append(np.where(is_leaf, 0.0, t["threshold"]))
+        defaults.append(t.get("default_left", np.zeros(n, dtype=bool)))
+        depth = max(depth, _tree_depth(t["left"], t["right"]))
+
+    flat = _FlatTrees(
+        feature=np.concatenate(features).astype(np.intp),
+        threshold=np.concatenate(thresholds).astype(threshold_dtype),
+        left=np.concatenate(lefts).astype(np.intp),
+        right=np.concatenate(rights).astype(np.intp),
+        default_left=np.concatenate(defaults).astype(bool) if strict else None,
+        roots=offsets[:-1].astype(np.intp),
+        depth=depth,
+        strict=strict,
+        dtype=dtype,
+    )
+    return flat, int(offsets[-1])
+
+
+def _tree_depth(left: np.ndarray, right: np.ndarray) -> int:
+    depth = np.zeros(len(left), dtype=np.intp)
+    for node in range(len(left)):  # children always come after their parent
+        if left[node] >= 0:
+            depth[left[node]] = depth[node] + 1
+            depth[right[node]] = depth[node] + 1
+    return int(depth.max())
+
+
+class _SklearnForest:
+    """Mean of per-tree leaf class distributions, as in RandomForest.predict_proba."""
+
+    def __init__(self, estimators: List[Any]):
+        trees, values = [], []
+        for est in estimators:
+            tree = est.tree_
+            trees.append({
+                "left": tree.children_left,
+                "right": tree.children_right,
+                "feature": tree.feature,
+                "threshold": tree.threshold,
+            })
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+
+        self.trees, _ = _stack_trees(trees, strict=False, dtype=np.float32, threshold_dtype=np.float64)
+        self.leaf_proba = np.concatenate(values)
+
+    def positive_scores(self, X: np.ndarray) -> np.ndarray:
+        proba = self.leaf_proba[self.trees.leaves(X)].mean(axis=1)
+        return proba[:, 1]
+
+    def thresholds(self) -> Tuple[np.ndarray, np.ndarray]:
+        return self.trees.feature, self.trees.threshold
+
+
+class _XGBoostTrees:
+    """Sum of leaf weights plus base margin through the logistic link."""
+
+    def __init__(self, booster: Any):
+        model = json.loads(bytes(booster.save_raw("json")))
+        learner = model["learner"]
+        if learner["objective"]["name"] != "binary:logistic":
+            raise ValueError(f"unsupported objective {learner['objective']['name']}")
+        if learner["gradient_booster"]["name"] != "gbtree":
+            raise ValueError("only gbtree boosters are supported")
+
+        raw_trees = learner["gradient_booster"]["model"]["trees"]
+        best_iteration = booster.attr("best_iteration")
+        if best_iteration is not None:
+            raw_trees = raw_trees[: int(best_iteration) + 1]
+
+        trees, leaf_values = [], []
+        for t in raw_trees:
+            if any(t.get("split_type", [])):
+                raise ValueError("categorical splits are not supported")
+            left = np.asarray(t["left_children"], dtype=np.intp)
+            conditions = np.asarray(t["split_conditions"], dtype=np.float32)
+            trees.append({
+                "left": left,
+                "right": np.asarray(t["right_children"], dtype=np.intp),
+                "feature": np.asarray(t["split_indices"], dtype=np.intp),
+                "threshold": conditions,
+                "default_left": np.asarray(t["default_left"], dtype=bool),
+            })
+            # For leaves, split_conditions holds the leaf weight.
+            leaf_values.append(np.where(left < 0, conditions, 0.0).astype(np.float32))
+
+        self.trees, _ = _stack_trees(trees, strict=True, dtype=np.float32, threshold_dtype=np.float32)
+        self.leaf_value = np.concatenate(leaf_values)
+
+        base_score = float(str(learner["learner_model_param"]["base_score"]).strip("[]"))
+        self.base_margin = float(np.log(base_score / (1.0 - base_score)))
+
+    def positive_scores(self, X: np.ndarray) -> np.ndarray:
+        margin = self.leaf_value[self.trees.leaves(X)].sum(axis=1, dtype=np.float64) + self.base_margin
+        return 1.0 / (1.0 + np.exp(-margin))
+
+    def thresholds(self) -> Tuple[np.ndarray, np.ndarray]:
+        return self.trees.feature, self.trees.threshold
+
+
+def _compile_estimator(estimator: Any):
+    estimators = getattr(estimator, "estimators_", None)
+    if estimators is not None and all(hasattr(e, "tree_") for e in estimators):
+        return _SklearnForest(list(estimators))
+    if hasattr(estimator, "tree_"):
+        return _SklearnForest([estimator])
+    if hasattr(estimator, "get_booster"):
+        return _XGBoostTrees(estimator.get_booster())
+    raise ValueError(f"unsupported estimator {type(estimator).__name__}")
+
+
+class CompiledModel:
+    """
+    predict_proba for a binary tree-ensemble classifier, optionally behind
+    CalibratedClassifierCV, computed from flattened node arrays.
+    """
+
+    def __init__(self, model: Any):
+        self.n_features = int(getattr(model, "n_features_in_", 0)) or None
+        self.parts: List[Tuple[Any, Optional[Any]]] = []
+
+        calibrated = getattr(model, "calibrated_classifiers_", None)
+        if calibrated is not None:
+            for cc in calibrated:
+                if len(cc.calibrators) != 1:
+                    raise ValueError("only binary calibrated classifiers are supported")
+                self.parts.append((_compile_estimator(cc.estimator), cc.calibrators[0]))
+        else:
+            self.parts.append((_compile_estimator(model), None))
+
+        classes = getattr(model, "classes_", None)
+        if classes is not None and len(classes) != 2:
+            raise ValueError("only binary classifiers are supported")
+
+    @staticmethod
+    def _calibrate(calibrator: Any, scores: np.ndarray) -> np.ndarray:
+        a, b = getattr(calibrator, "a_", None), getattr(calibrator, "b_", None)
+        if a is not None and b is not None:
+            # _SigmoidCalibration.predict
+            return 1.0 / (1.0 + np.exp(a * scores + b))
+        return np.asarray(calibrator.predict(scores), dtype=np.float64)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        positive = np.zeros(X.shape[0], dtype=np.float64)
+        for trees, calibrator in self.parts:
+            scores = trees.positive_scores(X)
+            if calibrator is not None:
+                scores = self._calibrate(calibrator, scores)
+                # Same clean-up as sklearn's _CalibratedClassifier.predict_proba
+                scores[(scores > 1.0) & (scores <= 1.0 + 1e-5)] = 1.0
+            positive += scores
+        positive /= len(self.parts)
+
+        return np.column_stack([1.0 - positive, positive])
+
+    def probe_rows(self, n_rows: int = 512, seed: int = 0) -> np.ndarray:
+        """Rows that exercise both sides of the trees' split thresholds."""
+        features, thresholds = [], []
+        for trees, _ in self.parts:
+            f, t = trees.thresholds()
+            features.append(f)
+            thresholds.append(np.asarray(t, dtype=np.float64))
+        features = np.concatenate(features)
+        thresholds = np.concatenate(thresholds)
+
+        n_features = self.n_features or int(features.max()) + 1
+        rng = np.random.default_rng(seed)
+        X = np.zeros((n_rows, n_features))
+        for j in range(n_features):
+            cuts = thresholds[features == j]
+            if len(cuts) == 0:
+                continue
+            low, high = cuts.min() - 1.0, cuts.max() + 1.0
+            column = rng.uniform(low, high, size=n_rows)
+            # A quarter of the rows sit exactly on a split threshold.
+            on_split = rng.random(n_rows) < 0.25
+            column[on_split] = rng.choice(cuts, size=int(on_split.sum()))
+            X[:, j] = column
+        return X
+
+
+def compile_model(model: Any, check_parity: bool = True) -> Optional[CompiledModel]:
+    """
+    Compile model, or return None if it is unsupported or fails the parity
+    check against model.predict_proba.
+    """
+    try:
+        compiled = CompiledModel(model)
+    except Exception as e:
+        print(f"[WARN] Compiled inference unavailable for {type(model).__name__}: {e}")
+        return None
+
+    if check_parity:
+        X = compiled.probe_rows()
+        error = float(np.max(np.abs(compiled.predict_proba(X) - model.predict_proba(X))))
+        if not error <= PARITY_TOLERANCE:
+            print(f"[WARN] Compiled inference disabled for {type(model).__name__}: parity error {error:.2e}")
+            return None
+
+    return compiled
+
+
+# Compiled models are cached per loaded model, like SHAP explainers: keyed by
+# model path (or id) and tied to the model object they were compiled from. An
+# entry is never replaced by one for an older model version, so requests still
+# running on a swapped-out model don't evict (and recompile over) its
+# replacement.
+_compiled_lock = threading.Lock()
+_compiled: Dict[Any, Tuple[Any, Optional[CompiledModel]]] = {}
+
+
+def get_compiled_model(model: Any) -> Optional[CompiledModel]:
+    path = getattr(model, "_sdp_model_path", None)
+    key = path if path is not None else id(model)
+
+    entry = _compiled.get(key)
+    if entry is not None and entry[0] is model:
+        return entry[1]
+
+    with _compiled_lock:
+        entry = _compiled.get(key)
+        if entry is not None and entry[0] is model:
+            return entry[1]
+
+        compiled = compile_model(model)
+        if entry is None or not is_newer_version(model_version(entry[0]), model_version(model)):
+            _compiled[key] = (model, compiled)
+        return compiled
+
+
+def predict_proba(model: Any, X: np.ndarray) -> np.ndarray:
+    """model.predict_proba(X), through the compiled engine when it is enabled."""
+    if INFERENCE_ENGINE == "compiled" and len(X) <= COMPILED_MAX_ROWS:
+        compiled = get_compiled_model(model)
+        if compiled is not None:
+            return compiled.predict_proba(X)
+    return model.predict_proba(X)
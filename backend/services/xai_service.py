@@ -1,8 +1,15 @@
-from typing import List, Dict, Any
+import os
+import threading
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Union
 
 import numpy as np
 import pandas as pd
-import shap
+
+from .cache_service import is_newer_version, model_version
+
+# "inline": explain on the request thread (default)
+# "process": explain in a pool of warm worker processes (see shap_pool.py)
+SHAP_MODE = os.getenv("SDP_SHAP_MODE", "inline").strip().lower()
 
 
 def _safe_scalar(value: Any) -> float:
@@ -47,16 +54,100 @@ def _unwrap_for_tree_explainer(model: Any) -> Any:
     return model
 
 
-def _heuristic_explanation(input_df: pd.DataFrame, top_k: int) -> List[Dict]:
+# Building a TreeExplainer walks and re-encodes every tree in the ensemble, so
+# explainers are built once per loaded model and reused across requests.
+# Entries are keyed by the model file path (or object id) and remember the
+# model object they were built for, so a reloaded model never reuses a stale
+# one. An entry is never replaced by one for an older model version, so
+# requests still running on a swapped-out model don't evict its replacement.
+_explainer_lock = threading.Lock()
+_explainers: Dict[Any, Tuple[Any, Optional[Any]]] = {}
+
+
+def _explainer_key(model: Any) -> Any:
+    path = getattr(model, "_sdp_model_path", None)
+    return path if path is not None else id(model)
+
+
+def get_tree_explainer(model: Any) -> Optional[Any]:
+    """Return the cached TreeExplainer for model, building it on first use.
+
+    Returns None when SHAP cannot explain the model; that outcome is cached
+    too, so unsupported models don't pay for a failed build on every request.
+    """
+    key = _explainer_key(model)
+    entry = _explainers.get(key)
+    if entry is not None and entry[0] is model:
+        return entry[1]
+
+    with _explainer_lock:
+        entry = _explainers.get(key)
+        if entry is not None and entry[0] is model:
+            return entry[1]
+
+        try:
+            # Imported on first use: shap is slow to import and not needed at startup.
+            import shap
+
+            explainer = shap.TreeExplainer(_unwrap_for_tree_explainer(model))
+        except Exception as e:
+            print(f"[WARN] SHAP TreeExplainer unavailable for {key}: {e}")
+            explainer = None
+
+        if entry is None or not is_newer_version(model_version(entry[0]), model_version(model)):
+            _explainers[key] = (model, explainer)
+        return explainer
+
+
+def warm_explainers(models: Dict[str, Any]) -> None:
+    """Build explainers for every loaded model ahead of the first request."""
+    for model in models.values():
+        if model is not None:
+            get_tree_explainer(model)
+
+
+def invalidate_explainers(model: Any = None) -> None:
+    """Drop the cached explainer for model, or every explainer if model is None."""
+    with _explainer_lock:
+        if model is None:
+            _explainers.clear()
+        else:
+            _explainers.pop(_explainer_key(model), None)
+
+
+def _as_matrix(
+    features: Union[pd.DataFrame, np.ndarray], feature_names: Optional[Sequence[str]]
+) -> Tuple[np.ndarray, List[str]]:
+    """Return features as a 2D float array plus its column names."""
+    if isinstance(features, pd.DataFrame):
+        return features.to_numpy(dtype=float), list(features.columns)
+
+    matrix = np.asarray(features, dtype=float)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    if feature_names is None:
+        feature_names = [f"f{i}" for i in range(matrix.shape[1])]
+    return matrix, list(feature_names)
+
+
+class HeuristicExplanation(list):
+    """Contributions from _heuristic_explanation: the shape of a SHAP explanation, but not SHAP."""
+
+
+def _heuristic_explanation(
+    features: Union[pd.DataFrame, np.ndarray],
+    top_k: int,
+    feature_names: Optional[Sequence[str]] = None,
+) -> "HeuristicExplanation":
     """Fallback explanation when SHAP cannot be computed.
 
     Returns a stable, frontend-friendly structure without crashing the API.
     """
-    feature_names = list(input_df.columns)
+    matrix, feature_names = _as_matrix(features, feature_names)
     if not feature_names:
-        return []
+        return HeuristicExplanation()
 
-    values = [_safe_scalar(input_df.iloc[0, i]) for i in range(len(feature_names))]
+    values = [_safe_scalar(v) for v in matrix[0]]
     contributions: List[Dict] = []
 
     # Simple direction+importance proxy in [-1, 1]
@@ -72,12 +163,20 @@ def _heuristic_explanation(input_df: pd.DataFrame, top_k: int) -> List[Dict]:
         )
 
     contributions = sorted(contributions, key=lambda x: abs(x["shap_value"]), reverse=True)[:top_k]
-    return contributions
+    return HeuristicExplanation(contributions)
 
 
-def explain_with_shap(model, input_df: pd.DataFrame, top_k: int = 3) -> List[Dict]:
+def explain_with_shap(
+    model,
+    features: Union[pd.DataFrame, np.ndarray],
+    top_k: int = 3,
+    feature_names: Optional[Sequence[str]] = None,
+) -> List[Dict]:
     """
-    Generate SHAP explanation for a single-row input_df.
+    Generate SHAP explanation for a single row.
+
+    features is either a one-row DataFrame or a (1, n_features) NumPy array
+    whose column names are given by feature_names.
 
     Returns a list of top_k feature contributions:
     [
@@ -85,18 +184,33 @@ def explain_with_shap(model, input_df: pd.DataFrame, top_k: int = 3) -> List[Dic
       ...
     ]
     """
+    matrix, feature_names = _as_matrix(features, feature_names)
+
     if model is None:
-        return _heuristic_explanation(input_df, top_k=top_k)
+        return _heuristic_explanation(matrix, top_k=top_k, feature_names=feature_names)
+
+    if SHAP_MODE == "process":
+        from .shap_pool import shap_pool
+
+        contributions = shap_pool.explain(model, matrix, feature_names, top_k)
+        if contributions is not None:
+            return contributions
 
+    return _explain_inline(model, matrix, top_k, feature_names)
+
+
+def _explain_inline(model, matrix: np.ndarray, top_k: int, feature_names: List[str]) -> List[Dict]:
+    """SHAP for one row of matrix, computed on the calling thread."""
     # For tree-based models (RandomForest/XGBoost) we can use TreeExplainer.
-    # Some wrappers (e.g. CalibratedClassifierCV) are not supported; unwrap if possible.
-    model_for_shap = _unwrap_for_tree_explainer(model)
+    # Some wrappers (e.g. CalibratedClassifierCV) are unwrapped when the explainer is built.
+    explainer = get_tree_explainer(model)
+    if explainer is None:
+        return _heuristic_explanation(matrix, top_k=top_k, feature_names=feature_names)
 
     try:
-        explainer = shap.TreeExplainer(model_for_shap)
-        shap_values = explainer.shap_values(input_df)
+        shap_values = explainer.shap_values(matrix)
     except Exception:
-        return _heuristic_explanation(input_df, top_k=top_k)
+        return _heuristic_explanation(matrix, top_k=top_k, feature_names=feature_names)
 
     # Handle different SHAP output formats for binary classifiers
     if isinstance(shap_values, list) and len(shap_values) > 1:
@@ -117,12 +231,10 @@ def explain_with_shap(model, input_df: pd.DataFrame, top_k: int = 3) -> List[Dic
         # Fallback
         shap_row = shap_values[0] if hasattr(shap_values, '__getitem__') else shap_values
 
-    feature_names = input_df.columns
-
     contributions = [
         {
             "feature": feature_names[i],
-            "value": _safe_scalar(input_df.iloc[0, i]),
+            "value": _safe_scalar(matrix[0, i]),
             "shap_value": _safe_scalar(shap_row[i]),
         }
         for i in range(len(feature_names))
@@ -131,3 +243,72 @@ def explain_with_shap(model, input_df: pd.DataFrame, top_k: int = 3) -> List[Dic
     # Sort by absolute SHAP value, pick top_k
     contributions = sorted(contributions, key=lambda x: abs(x["shap_value"]), reverse=True)[:top_k]
     return contributions
+
+
+def _shap_matrix(shap_values: Any, n_rows: int) -> Optional[np.ndarray]:
+    """Normalize SHAP output to a (n_rows, n_features) positive-class matrix."""
+    if isinstance(shap_values, list) and len(shap_values) > 1:
+        # Format: [class0_array, class1_array]
+        shap_values = shap_values[1]
+    values = np.asarray(shap_values, dtype=float)
+    if values.ndim == 3 and values.shape[2] == 2:
+        # Format: (n_samples, n_features, n_classes)
+        values = values[:, :, 1]
+    if values.ndim != 2 or values.shape[0] != n_rows:
+        return None
+    return values
+
+
+def _top_k_contributions(
+    feature_names: List[str], values: np.ndarray, shap_matrix: np.ndarray, top_k: int
+) -> List[List[Dict]]:
+    shap_matrix = np.nan_to_num(shap_matrix, nan=0.0, posinf=0.0, neginf=0.0)
+    values = np.nan_to_num(values, nan=0.0, posinf=0.0, neginf=0.0)
+    # Stable sort so ties keep column order, as in explain_with_shap.
+    order = np.argsort(-np.abs(shap_matrix), axis=1, kind="stable")[:, :top_k]
+
+    return [
+        [
+            {
+                "feature": feature_names[j],
+                "value": float(values[row, j]),
+                "shap_value": float(shap_matrix[row, j]),
+            }
+            for j in order[row]
+        ]
+        for row in range(order.shape[0])
+    ]
+
+
+def explain_batch_with_shap(
+    model,
+    features: Union[pd.DataFrame, np.ndarray],
+    top_k: int = 3,
+    feature_names: Optional[Sequence[str]] = None,
+) -> List[List[Dict]]:
+    """
+    Generate SHAP explanations for every row of features in a single pass.
+
+    Returns one top_k contribution list per row, in the same format as
+    explain_with_shap.
+    """
+    matrix, feature_names = _as_matrix(features, feature_names)
+    n_rows = matrix.shape[0]
+    if n_rows == 0:
+        return []
+
+    shap_matrix = None
+    explainer = get_tree_explainer(model) if model is not None else None
+    if explainer is not None:
+        try:
+            shap_matrix = _shap_matrix(explainer.shap_values(matrix), n_rows)
+        except Exception:
+            shap_matrix = None
+
+    if shap_matrix is None:
+        return [
+            _heuristic_explanation(matrix[row : row + 1], top_k=top_k, feature_names=feature_names)
+            for row in range(n_rows)
+        ]
+
+    return _top_k_contributions(feature_names, matrix, shap_matrix, top_k)
@@ -0,0 +1,93 @@
+"""/api/chat/stream (Server-Sent Events) against a streaming stub LLM."""
+
+import json
+import time
+
+import pytest
+from flask import Flask
+
+from benchmarks.common import StubGenerator
+from routes.chat_routes import chat_bp
+from services import nlp_service
+from services.cache_service import chatbot_cache
+from services.llm_guard import HALF_OPEN, OPEN, llm_guard
+
+MESSAGE = "Today was a really good day with friends"
+
+
+def _positive(message, **kwargs):
+    # POSITIVE: no activity suggestions are appended as an extra chunk.
+    return [{"label": "POSITIVE", "score": 0.9}]
+
+
+def _events(chunks):
+    """(event, data) pairs from an iterable of SSE byte chunks."""
+    events = []
+    for block in b"".join(chunks).decode().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        if "event" in lines:
+            events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def client(monkeypatch):
+    app = Flask(__name__)
+    app.config["NLP_MODELS"] = {"sentiment_analyzer": _positive, "advice_generator": None}
+    app.register_blueprint(chat_bp, url_prefix="/api")
+    chatbot_cache.clear()
+    llm_guard.reset()
+    yield app.test_client()
+    chatbot_cache.clear()
+    llm_guard.reset()
+
+
+def _use_generator(monkeypatch, generator):
+    monkeypatch.setattr(nlp_service, "_gemini_initialized", True)
+    monkeypatch.setattr(nlp_service, "_gemini_model", generator)
+
+
+def test_stream_then_replay_from_cache(client, monkeypatch):
+    generator = StubGenerator(latency_s=0.05, chunks=4)
+    _use_generator(monkeypatch, generator)
+
+    response = client.post("/api/chat/stream", json={"message": MESSAGE})
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    events = _events([response.data])
+
+    names = [name for name, _ in events]
+    assert names == ["sentiment"] + ["chunk"] * 4 + ["done"]
+    done = events[-1][1]
+    assert "".join(data["text"] for name, data in events if name == "chunk") == done["response"]
+    assert done["response"] == generator.text
+    assert generator.calls == 1
+
+    replay = _events([client.post("/api/chat/stream", json={"message": MESSAGE}).data])
+    assert [name for name, _ in replay] == ["sentiment", "chunk", "done"]
+    assert replay[-1][1] == done
+    assert generator.calls == 1
+
+
+def test_disconnect_mid_stream_releases_the_probe(client, monkeypatch):
+    generator = StubGenerator(latency_s=1.0, chunks=8)
+    _use_generator(monkeypatch, generator)
+
+    # Circuit open and cooled down: the next call is the half-open probe.
+    llm_guard.state = OPEN
+    llm_guard.opened_at = time.monotonic() - llm_guard.breaker_cooldown_s - 1.0
+    released = []
+    release = llm_guard.release
+    monkeypatch.setattr(llm_guard, "release", lambda: released.append(True) or release())
+
+    response = client.post("/api/chat/stream", json={"message": MESSAGE}, buffered=False)
+    chunks = iter(response.response)
+    received = []
+    while not any(name == "chunk" for name, _ in _events(received)):
+        received.append(next(chunks))
+    assert llm_guard.state == HALF_OPEN
+    response.close()  # the client goes away
+
+    assert released == [True]
+    assert llm_guard.get_stats()["failures"] == 0
+    assert llm_guard.acquire() is True  # the probe slot is free again
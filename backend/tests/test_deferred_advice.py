@@ -0,0 +1,87 @@
+"""Deferred advice (advice_mode "deferred" and /api/advice/<token>) against a slow stub LLM."""
+
+import time
+
+import pytest
+from flask import Flask
+
+from benchmarks.common import StubGenerator, synthetic_payloads, train_synthetic_models
+from routes.predict_routes import predict_bp
+from services.advice_service import DeferredAdviceJobs, deferred_advice
+from services.cache_service import SQLiteCacheBackend, advice_cache, prediction_cache
+from services.prediction_service import DISEASE_NAMES, _static_advice
+from services.xai_service import warm_explainers
+
+LATENCY_S = 2.0
+
+
+@pytest.fixture(scope="module")
+def models():
+    models = train_synthetic_models(n_rows=500, n_estimators=20)
+    # Keep explainer builds out of the timed request.
+    warm_explainers(models)
+    return models
+
+
+@pytest.fixture
+def job_store(tmp_path, monkeypatch):
+    store = SQLiteCacheBackend(str(tmp_path / "jobs.sqlite3"), "advice_jobs")
+    monkeypatch.setattr(deferred_advice, "_store", store)
+    return store
+
+
+@pytest.fixture
+def client(models, job_store):
+    generator = StubGenerator(latency_s=LATENCY_S)
+    app = Flask(__name__)
+    app.config["DISEASE_MODELS"] = models
+    app.config["ADVICE_GENERATOR"] = generator
+    app.register_blueprint(predict_bp, url_prefix="/api")
+    advice_cache.clear()
+    prediction_cache.clear()
+    yield app.test_client(), generator
+    advice_cache.clear()
+    prediction_cache.clear()
+
+
+def test_predict_returns_before_advice_is_generated(client, job_store):
+    client, generator = client
+    payload = dict(synthetic_payloads("stroke", 1, seed=11)[0], advice_mode="deferred")
+
+    start = time.perf_counter()
+    response = client.post("/api/predict", json=payload)
+    elapsed = time.perf_counter() - start
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert elapsed < LATENCY_S
+    assert body["advice_status"] == "pending"
+    assert body["advice_token"]
+    assert body["advice"] == _static_advice(DISEASE_NAMES["stroke"], body["risk_label"])
+
+    token = body["advice_token"]
+    pending = client.get(f"/api/advice/{token}")
+    assert pending.status_code == 202
+    assert pending.get_json() == {"status": "pending", "advice": body["advice"]}
+
+    # Another worker sees the same job through the shared store, and its long poll ends with it.
+    other_worker = DeferredAdviceJobs(store=SQLiteCacheBackend(job_store.path, "advice_jobs"))
+    assert other_worker.status(token)["status"] == "pending"
+    assert other_worker.status(token, wait_seconds=5)["status"] == "ready"
+
+    ready = client.get(f"/api/advice/{token}")
+    assert ready.status_code == 200
+    status = ready.get_json()
+    assert status["status"] == "ready"
+    assert status["advice"] != body["advice"]
+    assert generator.calls == 1
+
+    assert advice_cache.get("stroke", body["risk_label"], body["explanation"]) == status["advice"]
+    assert other_worker.status(token) == status
+
+
+def test_advice_token_errors(client):
+    client, _ = client
+    assert client.get("/api/advice/unknown-token").status_code == 404
+    for wait in ("nan", "inf", "-inf", "soon"):
+        assert client.get(f"/api/advice/unknown-token?wait={wait}").status_code == 400
@@ -0,0 +1,62 @@
+"""Single-flight coalescing of concurrent cache misses (services.cache_service)."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import StubGenerator
+from services.cache_service import AdviceCache, InMemoryCacheBackend, SingleFlight
+
+CLIENTS = 16
+
+
+def _run_together(clients: int, fn):
+    """Call fn() from clients threads released at the same moment; returns results or exceptions."""
+    barrier = threading.Barrier(clients)
+
+    def _call():
+        barrier.wait()
+        try:
+            return fn()
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        return list(pool.map(lambda _: _call(), range(clients)))
+
+
+def test_concurrent_misses_share_one_generator_call():
+    cache = AdviceCache(backend=InMemoryCacheBackend())
+    generator = StubGenerator(latency_s=0.2)
+    explanation = [{"feature": "BMI", "value": 31.0}, {"feature": "Age", "value": 50.0}]
+
+    results = _run_together(
+        CLIENTS,
+        lambda: cache.get_or_generate(
+            "diabetes", "High", explanation, lambda: generator.generate_content("prompt").text
+        ),
+    )
+
+    assert generator.calls == 1
+    assert results == [generator.text] * CLIENTS
+    assert cache.get("diabetes", "High", explanation) == generator.text
+
+
+def test_leader_error_reaches_every_waiter_and_key_recovers():
+    flight = SingleFlight()
+
+    def _fail():
+        # Hold the flight open until every other caller is waiting on it.
+        deadline = time.monotonic() + 5.0
+        while flight.shared_count < CLIENTS - 1 and time.monotonic() < deadline:
+            time.sleep(0.005)
+        raise RuntimeError("upstream down")
+
+    results = _run_together(CLIENTS, lambda: flight.do("key", _fail))
+
+    assert flight.shared_count == CLIENTS - 1
+    assert all(isinstance(r, RuntimeError) and str(r) == "upstream down" for r in results)
+
+    # The failed flight is gone: the next call runs its own fn.
+    assert flight.do("key", lambda: "recovered") == "recovered"
+    assert flight._flights == {}
@@ -0,0 +1,56 @@
+"""Compiled tree inference (services.tree_engine) against the libraries' predict_proba."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.common import synthetic_frame, train_synthetic_models
+from services import tree_engine
+from services.tree_engine import PARITY_TOLERANCE, compile_model, get_compiled_model
+
+
+@pytest.fixture(scope="module")
+def models():
+    return train_synthetic_models(n_rows=1000, n_estimators=50)
+
+
+@pytest.mark.parametrize("disease", ["diabetes", "hypertension"])  # XGBoost, calibrated RandomForest
+def test_compiled_matches_predict_proba(models, disease):
+    model = models[disease]
+    compiled = compile_model(model)
+    assert compiled is not None
+
+    rows = np.vstack([
+        compiled.probe_rows(),
+        synthetic_frame(disease, 256, seed=5).to_numpy(dtype=np.float64),
+    ])
+    expected = model.predict_proba(pd.DataFrame(rows, columns=model.feature_names_in_))
+    error = np.max(np.abs(compiled.predict_proba(rows) - expected))
+    assert error <= PARITY_TOLERANCE
+
+
+class _Versioned:
+    """A loaded model as model_loader tags it, around a real estimator."""
+
+    def __init__(self, model, version):
+        self._model = model
+        self._sdp_model_path = "/models/stroke_xgb.pkl"
+        self._sdp_model_version = version
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+def test_older_model_does_not_replace_newer_entry(models, monkeypatch):
+    monkeypatch.setattr(tree_engine, "_compiled", {})
+    calls = []
+    monkeypatch.setattr(tree_engine, "compile_model", lambda model: calls.append(model) or object())
+
+    old = _Versioned(models["stroke"], "10-1")
+    new = _Versioned(models["stroke"], "20-1")
+    compiled_new = get_compiled_model(new)
+    get_compiled_model(old)
+    get_compiled_model(old)
+
+    assert get_compiled_model(new) is compiled_new
+    assert calls == [new, old, old]
@@ -0,0 +1,215 @@
+"""
+Pre-generate advice for the most common advice cache keys, offline.
+
+    python warm_advice.py --top 300 --concurrency 4 --rate-per-min 60
+    python warm_advice.py --disease stroke --input predict_payloads.csv --samples 50000 --dry-run
+
+For each disease, feature rows are sampled from the schema domains in
+prediction_service (or from --input: logged /api/predict payloads or
+training data, with columns named like payload fields or model columns),
+scored and explained with the production model, and reduced to advice cache
+keys (disease, risk label, top-3 SHAP features). The --top most frequent
+keys are generated with the configured Gemini advice generator, with at most
+--concurrency calls in flight and --rate-per-min calls per minute, and
+written to the snapshot (SDP_ADVICE_SNAPSHOT) that create_app loads into
+advice_cache. Entries of the existing snapshot that are still current (same
+prompt and model file versions) are kept instead of generated again.
+"""
+
+import argparse
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from services.advice_snapshot import (
+    SNAPSHOT_PATH,
+    current_entries,
+    factors_to_explanation,
+    model_versions,
+    read_snapshot,
+    write_snapshot,
+)
+from services.cache_service import advice_cache
+from services.llm_guard import LLMGuard, LLMUnavailable
+from services.model_loader import load_disease_models, load_nlp_models
+from services.prediction_service import (
+    DISEASE_NAMES,
+    SUPPORTED_DISEASES,
+    _advice_from_response,
+    _build_advice_prompt,
+    get_feature_schema,
+    score_features,
+)
+
+
+def _entry_key(entry: Dict[str, Any]) -> str:
+    return advice_cache._generate_key(
+        entry["disease"], entry["risk_label"], factors_to_explanation(entry["factors"])
+    )
+
+
+def sample_rows(disease: str, model: Any, samples: int, seed: int, frame: Optional[pd.DataFrame]) -> np.ndarray:
+    schema = get_feature_schema(disease, model)
+    if frame is None:
+        return schema.sample(samples, seed=seed)
+    if len(frame) > samples:
+        frame = frame.sample(n=samples, random_state=seed)
+    matrix, _, errors = schema.encode_frame(frame)
+    if errors:
+        print(f"[WARN] {disease}: {len(errors)} input rows skipped ({next(iter(errors.values()))})")
+    return matrix
+
+
+def common_keys(disease: str, model: Any, rows: np.ndarray, top: int) -> Dict[str, Any]:
+    """The top most frequent advice cache keys among rows, and the share of rows they cover."""
+    schema = get_feature_schema(disease, model)
+    scores, labels, explanations = score_features(
+        disease, model, rows, explain=True, top_k=3, feature_names=schema.columns
+    )
+
+    keys: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    for score, label, explanation in zip(scores, labels, explanations):
+        entry = {
+            "disease": disease,
+            "risk_label": str(label),
+            "factors": [[e["feature"], float(e["value"])] for e in explanation[:3]],
+        }
+        key = _entry_key(entry)
+        found = keys.get(key)
+        if found is None:
+            found = keys[key] = dict(entry, count=0, score_total=0.0)
+        found["count"] += 1
+        found["score_total"] += float(score)
+
+    ranked = sorted(keys.values(), key=lambda e: e["count"], reverse=True)[:top]
+    for entry in ranked:
+        entry["risk_score"] = entry.pop("score_total") / entry["count"]
+    covered = sum(entry["count"] for entry in ranked)
+    return {
+        "entries": ranked,
+        "distinct_keys": len(keys),
+        "coverage": covered / len(rows) if len(rows) else 0.0,
+    }
+
+
+def _generate(generator: Any, guard: LLMGuard, entry: Dict[str, Any]) -> Optional[str]:
+    prompt = _build_advice_prompt(
+        DISEASE_NAMES[entry["disease"]],
+        entry["risk_label"],
+        entry["risk_score"],
+        factors_to_explanation(entry["factors"]),
+    )
+    while True:
+        try:
+            return _advice_from_response(guard.call(lambda: generator.generate_content(prompt)))
+        except LLMUnavailable as e:
+            if e.reason != "rate_limited":
+                print(f"[WARN] Advice for {entry['disease']}/{entry['risk_label']} skipped: {e.reason}")
+                return None
+            # Wait for the next token instead of dropping the key.
+            time.sleep(1.0 / guard.rate_per_s)
+        except Exception as e:
+            print(f"[WARN] Advice for {entry['disease']}/{entry['risk_label']} failed: {e}")
+            return None
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    models = load_disease_models(mode="lazy")
+    versions = model_versions(models.models_dir, models.model_files)
+    frame = pd.read_csv(args.input) if args.input else None
+
+    existing = {_entry_key(e): e for e in current_entries(read_snapshot(args.output), versions)}
+
+    planned: List[Dict[str, Any]] = []
+    summary: Dict[str, Any] = {}
+    for disease in args.diseases:
+        model = models[disease]
+        if model is None:
+            print(f"[WARN] Model for '{disease}' not loaded, skipping")
+            continue
+        try:
+            rows = sample_rows(disease, model, args.samples, args.seed, frame)
+        except ValueError as e:
+            print(f"[WARN] {disease}: {e}, skipping")
+            continue
+        keys = common_keys(disease, model, rows, args.top)
+        summary[disease] = {
+            "rows": len(rows),
+            "distinct_keys": keys["distinct_keys"],
+            "top_keys": len(keys["entries"]),
+            "top_coverage": round(keys["coverage"], 4),
+        }
+        planned += keys["entries"]
+
+    missing = [e for e in planned if _entry_key(e) not in existing]
+    print(f"[INFO] {len(planned)} keys planned, {len(planned) - len(missing)} already in the snapshot")
+    if args.dry_run:
+        return {"diseases": summary, "to_generate": len(missing)}
+
+    generator = load_nlp_models(mode="lazy").get("advice_generator")
+    if missing and generator is None:
+        raise SystemExit("[ERROR] No advice generator configured (set GEMINI_API_KEY)")
+
+    guard = LLMGuard(rate_per_min=args.rate_per_min, burst=args.concurrency)
+    generated = failed = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="warm-advice") as pool:
+        for entry, advice in zip(missing, pool.map(lambda e: _generate(generator, guard, e), missing)):
+            if advice is None:
+                failed += 1
+                continue
+            entry["advice"] = advice
+            existing[_entry_key(entry)] = entry
+            generated += 1
+            if generated % args.log_every == 0:
+                print(f"[INFO] {generated}/{len(missing)} advice entries generated", file=sys.stderr)
+
+    # Keep current entries even if they dropped out of this run's top keys.
+    entries = sorted(existing.values(), key=lambda e: (e["disease"], -e.get("count", 0)))
+    write_snapshot(args.output, entries, versions)
+    return {
+        "diseases": summary,
+        "generated": generated,
+        "failed": failed,
+        "snapshot_entries": len(entries),
+        "seconds": round(time.perf_counter() - start, 1),
+        "output": args.output,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--disease", dest="diseases", action="append", choices=SUPPORTED_DISEASES,
+                        help="repeat for several; default all")
+    parser.add_argument("--input", help="CSV of feature rows to sample instead of the schema domains")
+    parser.add_argument("--samples", type=int, default=20000, help="rows scored per disease")
+    parser.add_argument("--top", type=int, default=300, help="most frequent keys kept per disease")
+    parser.add_argument("--concurrency", type=int, default=4, help="Gemini calls in flight")
+    parser.add_argument("--rate-per-min", type=float, default=60.0, help="Gemini calls per minute")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=SNAPSHOT_PATH)
+    parser.add_argument("--dry-run", action="store_true", help="only report keys and coverage")
+    parser.add_argument("--log-every", type=int, default=25)
+    args = parser.parse_args()
+    args.diseases = args.diseases or list(SUPPORTED_DISEASES)
+
+    result = run(args)
+    for disease, stats in result["diseases"].items():
+        print(
+            f"[OK] {disease}: {stats['top_keys']} of {stats['distinct_keys']} keys cover "
+            f"{stats['top_coverage']:.1%} of {stats['rows']} rows"
+        )
+    if not args.dry_run:
+        print(
+            f"[OK] {result['generated']} generated, {result['failed']} failed, "
+            f"{result['snapshot_entries']} entries in {result['output']}"
+        )
+
+
+if __name__ == "__main__":
+    main()